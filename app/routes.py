@@ -21,6 +21,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import *
 from federated.utils.prediction import PredictionService
 from federated.utils.visualization import create_results_plots
+from federated.utils.metrics_log import read_metrics_log, tail_metrics_log
 
 
 
@@ -52,8 +53,9 @@ def predict():
                 filepath = os.path.join(FLASK_CONFIG['UPLOAD_FOLDER'], filename)
                 file.save(filepath)
                 
-                # Realizar predicciones
-                prediction_service = PredictionService()
+                # Realizar predicciones (con el modelo personal del banco, si se indica)
+                bank = request.form.get('bank', '').strip()
+                prediction_service = PredictionService(client_id=int(bank) if bank.isdigit() else None)
                 results = prediction_service.predict_from_csv(filepath)
                 
                 if results is not None:
@@ -136,3 +138,27 @@ def api_results():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/metrics/tail')
+def api_metrics_tail():
+    """Últimos registros del log de métricas por ronda"""
+    try:
+        n = request.args.get('n', default=50, type=int)
+        run_id = request.args.get('run_id')
+        records, offset = tail_metrics_log(n=n, run_id=run_id)
+        return jsonify({'records': records, 'offset': offset})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/metrics/follow')
+def api_metrics_follow():
+    """Registros nuevos desde un desplazamiento (sondear con el offset devuelto)"""
+    try:
+        offset = request.args.get('offset', default=0, type=int)
+        run_id = request.args.get('run_id')
+        records, offset = read_metrics_log(offset=offset, run_id=run_id)
+        return jsonify({'records': records, 'offset': offset})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
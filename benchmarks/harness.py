@@ -0,0 +1,149 @@
+"""
+Utilidades de medición, baselines y comparación para la suite de benchmarks
+"""
+import os
+import gc
+import json
+import time
+import platform
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def environment_info() -> Dict:
+    """Entorno de ejecución: las comparaciones solo son fiables en el mismo entorno"""
+    import sklearn
+    import pandas as pd
+    import flwr
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'flwr': flwr.__version__,
+    }
+
+
+class BenchmarkRunner:
+    """Ejecuta casos con calentamiento y repeticiones y guarda estadísticos robustos"""
+
+    def __init__(self, repeats: int = 5, warmup: int = 1, min_time: float = 0.0,
+                 name_filter: Optional[str] = None):
+        self.repeats = repeats
+        self.warmup = warmup
+        self.min_time = min_time
+        self.name_filter = name_filter
+        self.results = {}
+
+    def measure(self, name: str, func: Callable[[], object], items: Optional[int] = None,
+                repeats: Optional[int] = None, warmup: Optional[int] = None,
+                setup: Optional[Callable[[], None]] = None) -> Optional[Dict]:
+        """Medir `func`; `items` (filas, parámetros...) permite reportar el throughput"""
+        if self.name_filter and self.name_filter not in name:
+            return None
+        repeats = self.repeats if repeats is None else repeats
+        warmup = self.warmup if warmup is None else warmup
+
+        for _ in range(warmup):
+            if setup:
+                setup()
+            func()
+
+        times = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            # Al menos `repeats` repeticiones y, si se pide, un tiempo mínimo total
+            while len(times) < repeats or sum(times) < self.min_time:
+                if setup:
+                    setup()
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        times = np.asarray(times)
+        q1, median, q3 = np.percentile(times, [25, 50, 75])
+        result = {
+            'median': float(median),
+            'min': float(times.min()),
+            'iqr': float(q3 - q1),
+            'repeats': int(len(times)),
+        }
+        if items:
+            result['items'] = int(items)
+            result['throughput'] = float(items / median)
+        self.results[name] = result
+
+        throughput = f" | {result['throughput']:,.0f} items/s" if items else ""
+        print(f"{name:<60} {median * 1e3:>10.3f} ms (±{result['iqr'] * 1e3:.3f}){throughput}", flush=True)
+        return result
+
+    def report(self) -> Dict:
+        return {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'environment': environment_info(),
+            'results': self.results,
+        }
+
+
+def save_report(report: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Resultados guardados en {path}")
+
+
+def load_report(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_reports(baseline: Dict, current: Dict, threshold: float = 0.2) -> List[Dict]:
+    """Comparar medianas con el baseline
+
+    Un caso es una regresión si su mediana empeora más de `threshold` (relativo)
+    y la diferencia supera además el ruido observado (suma de los IQR).
+    """
+    rows = []
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append({'name': name, 'status': 'nuevo', 'ratio': None})
+            continue
+        ratio = result['median'] / base['median'] if base['median'] > 0 else float('inf')
+        noise = result['iqr'] + base['iqr']
+        difference = result['median'] - base['median']
+        if ratio > 1 + threshold and difference > noise:
+            status = 'REGRESIÓN'
+        elif ratio < 1 / (1 + threshold) and -difference > noise:
+            status = 'mejora'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'status': status, 'ratio': ratio,
+                     'baseline': base['median'], 'current': result['median']})
+
+    if baseline.get('environment') != current.get('environment'):
+        print("Aviso: el entorno difiere del baseline; la comparación es orientativa")
+    for row in rows:
+        if row['ratio'] is None:
+            print(f"{row['name']:<60} {'-':>8}  {row['status']}")
+        else:
+            print(f"{row['name']:<60} {row['ratio']:>7.2f}x  {row['status']}")
+    return rows
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def exit_code(rows: List[Dict]) -> int:
+    """1 si hay alguna regresión (para integrarlo en CI)"""
+    return 1 if any(row['status'] == 'REGRESIÓN' for row in rows) else 0
@@ -0,0 +1,290 @@
+"""
+Suite de benchmarks de las rutas críticas federadas y de servicio
+
+Casos: agregación (clientes x tamaño de parámetros), privacidad diferencial,
+(de)serialización de parámetros, fit/evaluate del cliente por modelo,
+throughput de PredictionService.predict_from_csv y preprocesamiento.
+Todos los datos son sintéticos con semillas fijas.
+
+Uso:
+    python benchmarks/run_benchmarks.py                       # ejecutar y guardar resultados
+    python benchmarks/run_benchmarks.py --save-baseline local # guardar como baseline
+    python benchmarks/run_benchmarks.py --compare local       # marcar regresiones (exit 1)
+    python benchmarks/run_benchmarks.py --quick --filter aggregate
+"""
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+import joblib
+import flwr as fl
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.harness import (BenchmarkRunner, baseline_path, compare_reports, exit_code,
+                                load_report, save_report)
+from config import MODELS, AGGREGATION_STRATEGIES, RESULTS_DIR
+from federated.aggregation.strategies import AggregationStrategy
+from federated.privacy.differential_privacy import DifferentialPrivacy
+from federated.models.base_model import BaseModel
+
+# Secciones de la suite (primer componente del nombre de cada caso)
+SECTIONS = ('aggregate', 'privacy', 'serialization', 'preprocessing', 'client', 'prediction')
+
+CATEGORIES = {
+    'Gender': ['M', 'F'],
+    'Education_Level': ['Uneducated', 'High School', 'College', 'Graduate', 'Post-Graduate', 'Doctorate'],
+    'Marital_Status': ['Single', 'Married', 'Divorced'],
+    'Income_Category': ['Less than $40K', '$40K - $60K', '$60K - $80K', '$80K - $120K', '$120K +'],
+    'Card_Category': ['Blue', 'Silver', 'Gold', 'Platinum'],
+}
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silenciar la salida de los componentes medidos"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def make_raw_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Datos crudos sintéticos con el esquema de CreditScore_test.csv"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'ID': np.arange(1, n_rows + 1),
+        'Customer_Age': rng.integers(26, 74, n_rows),
+        'Dependent_count': rng.integers(0, 6, n_rows),
+        'Months_on_book': rng.integers(13, 57, n_rows),
+        'Total_Relationship_Count': rng.integers(1, 7, n_rows),
+        'Credit_Limit': rng.lognormal(8.5, 0.8, n_rows).round(2),
+        'Total_Trans_Amt': rng.lognormal(8.0, 0.6, n_rows).round(2),
+        'Total_Trans_Ct': rng.integers(10, 140, n_rows),
+    })
+    df['Avg_Open_To_Buy'] = (df['Credit_Limit'] * rng.uniform(0, 1, n_rows)).round(2)
+    for column, values in CATEGORIES.items():
+        df[column] = rng.choice(values, n_rows)
+    score = (600 + 0.8 * (df['Customer_Age'] - 45) + 0.002 * df['Credit_Limit']
+             + 0.5 * df['Total_Trans_Ct'] - 40 + rng.normal(0, 30, n_rows))
+    df['Score'] = score.clip(300, 850).round(0)
+    return df
+
+
+def bench_aggregation(runner: BenchmarkRunner, quick: bool) -> None:
+    rng = np.random.default_rng(0)
+    client_counts = (3, 10) if quick else (3, 10, 100)
+    sizes = (1_000, 100_000) if quick else (1_000, 100_000, 1_000_000)
+    for strategy in AGGREGATION_STRATEGIES:
+        aggregator = AggregationStrategy(strategy)
+        for n_clients in client_counts:
+            for size in sizes:
+                if n_clients * size > 20_000_000:
+                    continue
+                params = [[rng.standard_normal(size - 1), rng.standard_normal(1)] for _ in range(n_clients)]
+                samples = rng.integers(500, 5000, n_clients).tolist()
+                runner.measure(f"aggregate/{strategy}/clients={n_clients}/params={size}",
+                               lambda: aggregator.aggregate(params, samples), items=n_clients * size)
+
+
+def bench_privacy(runner: BenchmarkRunner, quick: bool) -> None:
+    rng = np.random.default_rng(1)
+    sizes = (1_000, 100_000) if quick else (1_000, 100_000, 1_000_000)
+    for technique in ('clipping', 'noising', 'clipping_noising'):
+        dp = DifferentialPrivacy(technique, client_id=0)
+        for size in sizes:
+            params = [rng.standard_normal(size - 1), rng.standard_normal(1)]
+            runner.measure(f"privacy/{technique}/params={size}",
+                           lambda: dp.apply_privacy(params, server_round=1), items=size)
+
+
+def bench_serialization(runner: BenchmarkRunner, quick: bool) -> None:
+    rng = np.random.default_rng(2)
+    sizes = (1_000, 100_000) if quick else (1_000, 100_000, 1_000_000)
+    for size in sizes:
+        params = [rng.standard_normal(size - 1), rng.standard_normal(1)]
+        serialized = fl.common.ndarrays_to_parameters(params)
+        runner.measure(f"serialization/to_parameters/params={size}",
+                       lambda: fl.common.ndarrays_to_parameters(params), items=size)
+        runner.measure(f"serialization/to_ndarrays/params={size}",
+                       lambda: fl.common.parameters_to_ndarrays(serialized), items=size)
+
+
+def prepare_processed_data(quick: bool, workdir: str) -> str:
+    """Datos procesados por banco para los casos de cliente y predicción"""
+    from scripts.preprocess_data import DataPreprocessor
+
+    processed_dir = os.path.join(workdir, 'processed')
+    if not os.path.exists(os.path.join(processed_dir, 'banco0.csv')):
+        raw_path = os.path.join(workdir, 'raw_clients.csv')
+        make_raw_frame(20_000 if quick else 100_000, seed=3).to_csv(raw_path, index=False)
+        with quiet():
+            DataPreprocessor(output_dir=processed_dir).process_dataset(raw_path)
+    return processed_dir
+
+
+def bench_preprocessing(runner: BenchmarkRunner, quick: bool, workdir: str) -> None:
+    from scripts.preprocess_data import DataPreprocessor, FederatedDataPreprocessor
+
+    n_rows = 20_000 if quick else 100_000
+    raw_path = os.path.join(workdir, 'raw.csv')
+    make_raw_frame(n_rows, seed=3).to_csv(raw_path, index=False)
+    centralized_dir = os.path.join(workdir, 'processed_centralized')
+
+    def centralized():
+        with quiet():
+            DataPreprocessor(output_dir=centralized_dir).process_dataset(raw_path)
+
+    runner.measure(f"preprocessing/centralized/rows={n_rows}", centralized, items=n_rows,
+                   repeats=3, warmup=0)
+
+    federated_dir = os.path.join(workdir, 'processed_federated')
+    client_dir = os.path.join(workdir, 'clientes')
+    os.makedirs(client_dir, exist_ok=True)
+    client_files = []
+    raw = pd.read_csv(raw_path)
+    bounds = np.linspace(0, len(raw), 4).astype(int)
+    for i in range(3):
+        path = os.path.join(client_dir, f"banco{i}.csv")
+        raw.iloc[bounds[i]:bounds[i + 1]].to_csv(path, index=False)
+        client_files.append(path)
+
+    def federated():
+        with quiet():
+            FederatedDataPreprocessor(output_dir=federated_dir).process_dataset_federated(client_files)
+
+    runner.measure(f"preprocessing/federated/rows={n_rows}", federated, items=n_rows,
+                   repeats=3, warmup=0)
+
+
+def bench_client(runner: BenchmarkRunner, quick: bool, data_dir: str) -> None:
+    from federated.client import CreditScoringClient
+
+    config = {'server_round': 1}
+    initial = [np.random.default_rng(4).standard_normal(10), np.array([0.0])]
+    for model_type in MODELS:
+        with quiet():
+            client = CreditScoringClient(0, model_type, 'none', data_dir=data_dir)
+            # Parámetros globales realistas: los de una primera ronda
+            parameters = client.fit(initial, config)[0]
+        repeats = 3 if model_type in ('random_forest', 'mlp') else 5
+
+        def fit():
+            with quiet():
+                client.fit(parameters, config)
+
+        def evaluate():
+            with quiet():
+                client.evaluate(parameters, config)
+
+        runner.measure(f"client/fit/{model_type}", fit, items=len(client.X_train),
+                       repeats=repeats, warmup=0)
+        runner.measure(f"client/evaluate/{model_type}", evaluate, items=len(client.X_test),
+                       repeats=repeats)
+
+
+def bench_prediction(runner: BenchmarkRunner, quick: bool, data_dir: str, workdir: str) -> None:
+    from federated.utils.prediction import PredictionService
+
+    train = pd.read_csv(os.path.join(data_dir, 'banco0.csv'))
+    model = BaseModel('ridge')
+    model.fit(train.drop('Score', axis=1).values, train['Score'].values)
+    model_path = os.path.join(workdir, 'modelo_final.pkl')
+    joblib.dump(model, model_path)
+
+    with quiet():
+        service = PredictionService(model_path=model_path,
+                                    preprocessor_path=os.path.join(data_dir, 'preprocessor.pkl'))
+
+    row_counts = (1_000, 10_000, 100_000) if quick else (1_000, 10_000, 100_000, 1_000_000)
+    for n_rows in row_counts:
+        csv_path = os.path.join(workdir, f"predict_{n_rows}.csv")
+        make_raw_frame(n_rows, seed=5).drop('Score', axis=1).to_csv(csv_path, index=False)
+
+        def predict():
+            with quiet():
+                result = service.predict_from_csv(csv_path)
+            if result is None:
+                raise RuntimeError("predict_from_csv falló")
+
+        large = n_rows >= 1_000_000
+        runner.measure(f"prediction/predict_from_csv/rows={n_rows}", predict, items=n_rows,
+                       repeats=1 if large else 3, warmup=0 if large else 1)
+        os.remove(csv_path)
+
+    # Códigos de motivo frente a la predicción sola, por familia de modelo
+    from federated.utils.explanations import explain, top_reasons
+    X_train, y_train = train.drop('Score', axis=1).values, train['Score'].values
+    n_rows = row_counts[-1]
+    X = np.resize(X_train, (n_rows, X_train.shape[1]))
+    for model_type in ('ridge', 'mlp', 'random_forest'):
+        with quiet():
+            model = BaseModel(model_type).fit(X_train, y_train)
+        runner.measure(f"prediction/predict/{model_type}", lambda: model.predict(X),
+                       items=n_rows, repeats=3)
+        runner.measure(f"prediction/reasons/{model_type}",
+                       lambda: top_reasons(explain(model, X)[1], train.columns[:-1]),
+                       items=n_rows, repeats=3)
+
+
+def section_selected(name_filter, section: str) -> bool:
+    """Un filtro que empieza por una sección omite las demás (y su preparación)"""
+    if not name_filter or name_filter.split('/')[0] not in SECTIONS:
+        return True
+    return name_filter.split('/')[0] == section
+
+
+def run_suite(runner: BenchmarkRunner, quick: bool) -> None:
+    selected = lambda section: section_selected(runner.name_filter, section)
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        if selected('aggregate'):
+            bench_aggregation(runner, quick)
+        if selected('privacy'):
+            bench_privacy(runner, quick)
+        if selected('serialization'):
+            bench_serialization(runner, quick)
+        if selected('preprocessing'):
+            bench_preprocessing(runner, quick, workdir)
+        if selected('client'):
+            bench_client(runner, quick, prepare_processed_data(quick, workdir))
+        if selected('prediction'):
+            bench_prediction(runner, quick, prepare_processed_data(quick, workdir), workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas críticas")
+    parser.add_argument('--quick', action='store_true', help="tamaños reducidos")
+    parser.add_argument('--filter', default=None, help="solo casos cuyo nombre contenga el texto")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--save-baseline', metavar='NOMBRE', help="guardar como baseline")
+    parser.add_argument('--compare', metavar='NOMBRE', help="comparar con un baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="empeoramiento relativo que se considera regresión")
+    args = parser.parse_args()
+
+    np.random.seed(0)
+    runner = BenchmarkRunner(repeats=args.repeats, name_filter=args.filter)
+    run_suite(runner, args.quick)
+    report = runner.report()
+    report['quick'] = args.quick
+
+    save_report(report, os.path.join(RESULTS_DIR, 'benchmarks',
+                                     f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    if args.save_baseline:
+        save_report(report, baseline_path(args.save_baseline))
+    if args.compare:
+        baseline = load_report(baseline_path(args.compare))
+        if baseline.get('quick') != args.quick:
+            print("Aviso: el baseline se generó con otro modo (--quick)")
+        return exit_code(compare_reports(baseline, report, args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
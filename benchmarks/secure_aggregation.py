@@ -0,0 +1,98 @@
+"""
+Benchmark del coste de la agregación segura frente al tiempo de una ronda
+
+Mide, para un vector de parámetros del tamaño del MLP y distintos números de
+clientes, el tiempo de generar las máscaras en cada cliente (incluido el acuerdo
+de claves con sus vecinos) y el de desenmascarar el agregado en el servidor con
+un porcentaje de clientes caídos, y los compara con el entrenamiento local del
+MLP en un banco sintético.
+
+Uso: python benchmarks/secure_aggregation.py [n_features] [dropout]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from federated.models.base_model import BaseModel
+from federated.privacy.secure_aggregation import (PairwiseMasker, SecureAggregator, generate_keypair,
+                                                  mask_neighbors)
+from config import SECURE_AGGREGATION_CONFIG
+
+CLIENT_COUNTS = (10, 100, 300)
+
+
+def mlp_parameters(n_features: int, rng: np.random.Generator):
+    """Parámetros con las formas del MLP (100, 50) del proyecto"""
+    sizes = [n_features, 100, 50, 1]
+    coefs = [rng.standard_normal((a, b)) for a, b in zip(sizes[:-1], sizes[1:])]
+    intercepts = [rng.standard_normal(b) for b in sizes[1:]]
+    return coefs + intercepts
+
+
+def time_mlp_fit(n_features: int, n_samples: int = 2000) -> float:
+    """Tiempo de entrenamiento local de referencia (una ronda en un cliente)"""
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((n_samples, n_features))
+    y = X[:, :5].sum(axis=1) + rng.standard_normal(n_samples) * 0.1
+    model = BaseModel('mlp')
+    model.fit(X, y)
+    return model.training_time
+
+
+def run_benchmark(n_features: int = 303, dropout: float = 0.1) -> None:
+    rng = np.random.default_rng(42)
+    fit_time = time_mlp_fit(n_features)
+    size = sum(p.size for p in mlp_parameters(n_features, rng))
+    print(f"Vector de parámetros: {size} valores | vecinos por cliente: "
+          f"{SECURE_AGGREGATION_CONFIG['neighbors']} | entrenamiento MLP de referencia: {fit_time:.3f}s")
+    print(f"{'clientes':>9} {'máscara/cliente (s)':>20} {'servidor (s)':>13} "
+          f"{'% ronda':>8} {'error máx.':>11}")
+
+    for n_clients in CLIENT_COUNTS:
+        participants = list(range(n_clients))
+        updates = {cid: mlp_parameters(n_features, rng) for cid in participants}
+        weights = {cid: int(rng.integers(500, 5000)) for cid in participants}
+        n_dropped = int(round(n_clients * dropout))
+        survivors = participants[n_dropped:]
+        keys = {cid: generate_keypair() for cid in participants}
+
+        def masker(cid):
+            neighbors = mask_neighbors(cid, participants, 1, SECURE_AGGREGATION_CONFIG['neighbors'])
+            return PairwiseMasker(cid, keys[cid][0], {j: keys[j][1] for j in neighbors})
+
+        # Coste en cliente: se mide sobre una muestra y se reporta por cliente
+        sample = survivors[:min(len(survivors), 20)]
+        start = time.perf_counter()
+        payloads = {cid: masker(cid).mask(updates[cid], weights[cid], participants, 1)
+                    for cid in sample}
+        mask_time = (time.perf_counter() - start) / len(sample)
+        for cid in survivors[len(sample):]:
+            payloads[cid] = masker(cid).mask(updates[cid], weights[cid], participants, 1)
+
+        # Fase de recuperación: los supervivientes revelan las semillas de sus vecinos caídos
+        # (coste de los clientes, fuera del tiempo del servidor)
+        aggregator = SecureAggregator()
+        revealed = {(i, j): masker(i).reveal_seed(j, 1)
+                    for i, dropped in aggregator.recovery_requests(participants, survivors, 1).items()
+                    for j in dropped}
+        start = time.perf_counter()
+        aggregate = aggregator.aggregate(
+            [payloads[cid] for cid in survivors], [weights[cid] for cid in survivors],
+            participants, 1, revealed)
+        server_time = time.perf_counter() - start
+
+        total_weight = sum(weights[cid] for cid in survivors)
+        expected = [sum(updates[cid][k] * weights[cid] for cid in survivors) / total_weight
+                    for k in range(len(aggregate))]
+        error = max(float(np.max(np.abs(a - e))) for a, e in zip(aggregate, expected))
+
+        share = 100 * (mask_time + server_time) / (fit_time + mask_time + server_time)
+        print(f"{n_clients:>9} {mask_time:>20.4f} {server_time:>13.4f} {share:>7.1f}% {error:>11.2e}")
+
+
+if __name__ == "__main__":
+    features = int(sys.argv[1]) if len(sys.argv) > 1 else 303
+    dropout_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    run_benchmark(features, dropout_rate)
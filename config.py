@@ -25,19 +25,153 @@ FEDERATED_CONFIG = {
     'min_available_clients': 3,
 }
 
+# Parada temprana por convergencia de las rondas federadas
+EARLY_STOPPING_CONFIG = {
+    'enabled': True,
+    'min_rounds': 2,            # Rondas mínimas antes de evaluar convergencia
+    'patience': 2,              # Rondas sin mejora de la pérdida antes de detener
+    'tolerance': 1e-3,          # Mejora relativa mínima de la pérdida agregada
+    'param_tolerance': 1e-4,    # Cambio relativo mínimo de los parámetros globales
+    # Pérdida absoluta común a todos los experimentos para rounds_to_target (primera
+    # ronda con pérdida <= target_loss). Sin ella, el servidor usa la pérdida de un R²
+    # fijo sobre su conjunto reservado: (1 - target_r2)·Var(y)
+    'target_loss': None,
+    'target_r2': 0.5,
+}
+
 MODELS = [
     'ols',             # Regresión lineal (mínimos cuadrados)
     'ridge',           # Regresión Ridge (L2)
     'lasso',           # Regresión Lasso (L1)
     'bayesian_ridge',  # Sustituto de Naive Bayes para regresión
+    'sgd',             # Regresión lineal entrenada por descenso de gradiente
     'decision_tree',   # Árbol de regresión
     'random_forest',   # Bosque aleatorio
     'knn',             # K-Nearest Neighbors
     'mlp'              # Red neuronal multicapa
 ]
 
-# Estrategias de agregación
-AGGREGATION_STRATEGIES = ['fedavg', 'fedmed']
+# Evaluación centralizada en el servidor sobre un conjunto reservado
+SERVER_EVAL_CONFIG = {
+    'enabled': True,
+    # Conjunto reservado que escribe el preprocesamiento (filas que no van a ningún
+    # banco); si no existe, el servidor no evalúa: nunca lee datos de los clientes
+    'validation_path': os.path.join(PROCESSED_DATA_DIR, 'validacion.csv'),
+    'validation_fraction': 0.1, # Parte de los datos originales reservada para el servidor
+    'eval_every': 1,            # Cada cuántas rondas evalúa el servidor
+    'client_eval_every': 5,     # Cada cuántas rondas evalúan los clientes (1 = siempre)
+}
+
+# Registro en streaming de métricas por ronda (JSONL de solo anexado)
+METRICS_LOG_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(METRICS_DIR, 'rounds.jsonl'),
+    'history_size': 20,         # Rondas que cada cliente conserva en memoria
+}
+
+# Federación de ensambles de árboles (decision_tree, random_forest)
+TREE_FEDERATION_CONFIG = {
+    'trees_per_client': 20,     # Árboles que envía cada cliente por ronda (None = todos)
+    'max_global_trees': 60,     # Tamaño máximo del bosque global (None = sin límite)
+    'seed': 42,
+}
+
+# KNN federado mediante prototipos comprimidos
+KNN_FEDERATION_CONFIG = {
+    'prototypes_per_client': 100,   # Centroides k-means enviados por cliente
+    'max_global_prototypes': None,  # Recompresión en el servidor (None = unión completa)
+    'n_neighbors': 5,
+    'seed': 42,
+    # Privacidad a nivel de prototipo: rango fijo de cada registro antes de promediar
+    'feature_bound': 3.0,           # Características estandarizadas acotadas a [-B, B]
+    'target_range': (300.0, 850.0), # Rango del Score
+}
+
+# Hiperparámetros explorados por el planificador de búsqueda (por modelo)
+SEARCH_SPACE = {
+    'ridge': {'alpha': [0.1, 1.0, 10.0]},
+    'lasso': {'alpha': [0.01, 0.1, 1.0]},
+    'decision_tree': {'max_depth': [None, 8]},
+    'random_forest': {'max_depth': [None, 12]},
+    'mlp': {'hidden_layer_sizes': [[100, 50], [64], [128, 64]], 'alpha': [1e-4, 1e-2]},
+}
+
+# Successive halving: todas las configuraciones empiezan con pocas rondas y solo
+# la mejor fracción (1/eta) por pérdida de validación continúa
+SCHEDULER_CONFIG = {
+    'min_rounds': 2,            # Rondas del primer escalón
+    'max_rounds': FEDERATED_CONFIG['num_rounds'],
+    'eta': 3,                   # Factor de reducción entre escalones
+    'checkpoint_dir': os.path.join(RESULTS_DIR, 'checkpoints'),
+}
+
+# Caché de resultados: clave = datos procesados + configuración + código
+RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'dir': os.path.join(RESULTS_DIR, 'cache'),
+    # Código común a todos los experimentos (patrones relativos a BASE_DIR); el
+    # código de agregación se resume por estrategia
+    'code_paths': [
+        'federated/app.py',
+        'federated/client.py',
+        'federated/server.py',
+        'federated/models/*.py',
+        'federated/privacy/*.py',
+        # strategies.py queda fuera: se resume por estrategia (aggregation_fingerprint)
+        'federated/aggregation/scaffold.py',
+        'federated/aggregation/server_optimizers.py',
+        'federated/aggregation/hierarchical.py',
+        'federated/utils/metrics.py',
+        'federated/utils/early_stopping.py',
+        'federated/utils/precision.py',
+        'federated/utils/client_state.py',
+        'federated/utils/columnar.py',
+    ],
+}
+
+# Estrategias de agregación (fedprox y scaffold solo cambian los modelos entrenados por gradiente)
+AGGREGATION_STRATEGIES = ['fedavg', 'fedmed', 'fedprox', 'scaffold']
+
+# Corrección de la deriva de clientes heterogéneos: FedProx (término proximal) y
+# SCAFFOLD (variables de control). Los modelos por gradiente (sgd, y mlp con estas
+# estrategias) entrenan localmente por SGD a partir del modelo global.
+CLIENT_DRIFT_CONFIG = {
+    'proximal_mu': 0.01,        # Peso del término proximal (mu/2)·||w - w_global||² de FedProx
+    # Paso del SGD local por modelo (sobre el objetivo estandarizado)
+    'learning_rate': {'sgd': 0.01, 'mlp': 0.03},
+    'batch_size': 64,
+    'local_epochs': 1,          # Épocas locales por ronda
+    'seed': 42,                 # Inicialización común y orden de los mini-lotes
+    # Variables de control de cada cliente de SCAFFOLD (persisten entre rondas)
+    'state_dir': os.path.join(RESULTS_DIR, 'client_state', 'scaffold'),
+}
+
+# Optimizador del servidor: el delta agregado de cada ronda se usa como
+# pseudo-gradiente (compatible con fedavg, fedmed y las demás estrategias)
+SERVER_OPTIMIZERS = ['none', 'momentum', 'fedadagrad', 'fedadam', 'fedyogi']
+SERVER_OPTIMIZER_CONFIG = {
+    'optimizer': 'none',        # 'none' reemplaza el modelo global por el agregado
+    # Paso del servidor por optimizador. Los adaptativos avanzan ~η por coordenada
+    # en unidades del parámetro (puntos de Score en los modelos lineales): con η=0.1
+    # no mueven el modelo en las rondas configuradas. Ajustados con sgd; en el MLP
+    # las capas tienen escalas muy distintas y solo momentum mejora a 'none'
+    'learning_rate': {'momentum': 0.5, 'fedadagrad': 10.0, 'fedadam': 2.0, 'fedyogi': 2.0},
+    'momentum': 0.7,            # Momento del servidor (FedAvgM; con 0.9 y η=1 oscila)
+    'beta_1': 0.9,              # Media móvil del pseudo-gradiente (adaptativos)
+    'beta_2': 0.99,             # Media móvil del cuadrado (FedAdam / FedYogi)
+    # Adaptabilidad: del orden de los deltas por ronda de los parámetros; con τ
+    # diminuto el paso es ±η en cualquier coordenada que se mueva
+    'tau': 0.1,
+}
+
+# Agregación jerárquica: agregadores intermedios por grupo de clientes (región,
+# grupo bancario...) envían agregados parciales compactos a la raíz
+HIERARCHICAL_CONFIG = {
+    'enabled': False,
+    'groups': {},               # {'grupo': [ids de cliente]}; el resto se reparte en bloques
+    'group_size': 8,            # Clientes por bloque para los que no tienen grupo asignado
+    'workers': 4,               # Agregadores intermedios ejecutados en paralelo
+}
 
 # Técnicas de privacidad diferencial
 PRIVACY_TECHNIQUES = ['none', 'clipping', 'noising', 'clipping_noising']
@@ -47,7 +181,92 @@ PRIVACY_CONFIG = {
     'clipping_norm': 1.0,
     'noise_multiplier': 0.1,
     'epsilon': 1.0,
-    'delta': 1e-5
+    'delta': 1e-5,
+    'seed': 42              # Semilla base de los flujos de ruido por cliente y ronda
+}
+
+# Agregación segura con máscaras por pares (el servidor solo ve el agregado)
+SECURE_AGGREGATION_CONFIG = {
+    'enabled': False,
+    'precision_bits': 24,       # Bits fraccionarios de la codificación en punto fijo
+    'neighbors': 32,            # Vecinos con máscara por cliente (None: grafo completo)
+    # Claves DH privadas de cada cliente en la ronda (almacenamiento propio del cliente)
+    'key_dir': os.path.join(RESULTS_DIR, 'client_state'),
+}
+
+# Trazas por etapa de cada ronda (Chrome trace / Perfetto); también FEDERATED_TRACING=1
+TRACING_CONFIG = {
+    'enabled': False,
+    'dir': os.path.join(RESULTS_DIR, 'traces'),
+}
+
+# Preprocesamiento en streaming (CSV mayores que la memoria) con salida columnar por banco
+STREAMING_PREPROCESSING_CONFIG = {
+    'chunksize': 100000,        # Filas por bloque leído del CSV
+    'reservoir_size': 100000,   # Muestra por columna para estimar las medianas de imputación
+    'dtype': 'float64',         # Tipo de las columnas binarias
+    'seed': 42,                 # Asignación de filas a bancos por hash y muestreo
+}
+
+# Validación en una pasada con sketches combinables (scripts/validate_data.py)
+VALIDATION_CONFIG = {
+    'chunk_bytes': 64 * 1024 * 1024,    # Tamaño de cada tramo del CSV procesado por un worker
+    'workers': None,                    # Procesos en paralelo (None = núcleos disponibles)
+    'hll_precision': 14,                # 2^14 registros por columna: ~0.8% de error en distintos
+    'tdigest_compression': 200,         # Centroides de cada t-digest (precisión de cuantiles)
+    'max_categories': 1000,             # Por encima, la columna solo se resume con HyperLogLog
+    'quantiles': [0.01, 0.25, 0.5, 0.75, 0.99],
+    'report_dir': os.path.join(RESULTS_DIR, 'validation'),
+}
+
+# Pipeline incremental de scripts/pipeline.py (validación → preprocesamiento → experimentos → publicación)
+PIPELINE_CONFIG = {
+    'raw_file': os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv'),
+    'preprocessing': 'memory',      # 'memory', 'streaming' o 'federated' (modos de preprocess_data.py)
+    'experiment_args': [],          # Argumentos de federated/main.py (p. ej. ['--halving'])
+    'workers': 2,                   # Etapas independientes ejecutadas a la vez
+    'state_dir': os.path.join(RESULTS_DIR, 'pipeline'),
+}
+
+# Precisión de datos, parámetros, ruido y agregación; también FEDERATED_PRECISION=float32
+PRECISION_CONFIG = {
+    'dtype': 'float64',         # 'float32' reduce a la mitad memoria y tamaño de las cargas
+    'compare_float64': True,    # En float32, registrar también el resultado en float64
+}
+
+# Personalización por cliente; también FEDERATED_PERSONALIZATION=1
+# Lineales: interpolación entre el modelo global y el local; MLP: cuerpo global y
+# cabeza propia ajustada por ridge. El estado de cada cliente persiste entre rondas.
+PERSONALIZATION_CONFIG = {
+    'enabled': False,
+    'state_dir': os.path.join(RESULTS_DIR, 'client_state'),
+    'validation_fraction': 0.2, # Parte del entrenamiento local reservada para personalizar
+    'head_alpha': 1.0,          # Regularización de la cabeza hacia la de la ronda anterior
+}
+
+# Exportación del modelo global final de cada experimento (arrays .npy + manifiesto)
+EXPORT_CONFIG = {
+    'enabled': True,
+    'dir': os.path.join(MODELS_DIR, 'experimentos'),
+    # Publicar al exportar solo si el experimento mejora `publish_metric` del modelo servido;
+    # por defecto se publica el mejor del resumen (python federated/models/export.py)
+    'publish': False,
+    'publish_metric': 'loss',
+    'serving_dir': os.path.join(MODELS_DIR, 'modelo_final'),
+}
+
+# Códigos de motivo por predicción: las variables que más bajan el score de cada fila
+EXPLANATION_CONFIG = {
+    'enabled': True,
+    'top_n': 4,                 # Columnas Razon_1..Razon_N del resultado
+    'batch_size': 65536,        # Filas por lote en la pasada conjunta de score y contribuciones
+}
+
+# Perfil de memoria por cliente y ronda (RSS pico y tracemalloc); también FEDERATED_MEMORY_PROFILING=1
+MEMORY_PROFILING_CONFIG = {
+    'enabled': False,
+    'top_allocators': 5,        # Líneas de código con más memoria reservada a reportar
+    'alarm_rss_mb': 2048,       # Aviso si el RSS pico de un proceso supera este valor
 }
 
 # Configuración Flask
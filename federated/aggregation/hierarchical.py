@@ -0,0 +1,107 @@
+"""
+Agregación jerárquica en dos niveles
+
+Los clientes se agrupan (por región, grupo bancario... en
+HIERARCHICAL_CONFIG['groups']; los no asignados en bloques de `group_size`).
+Cada agregador intermedio deserializa solo las cargas de su grupo, las agrega
+con la estrategia del experimento y envía a la raíz un agregado parcial con el
+total de muestras del grupo. Los grupos se procesan en paralelo y la raíz solo
+mantiene un agregado por grupo:
+
+- Promedios (fedavg, fedprox): promedio de los promedios ponderado por muestras
+  (idéntico al promedio plano)
+- fedmed: mediana de las medianas de grupo ponderada por número de clientes
+  (aproximación de la mediana global)
+- Bosques y prototipos KNN: unión por grupo y unión final en la raíz
+"""
+import os
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.aggregation.strategies import AggregationStrategy, is_finite_payload
+from federated.models.tree_ensemble import is_forest_payload
+from federated.models.knn_prototypes import is_prototype_payload
+from federated.utils.tracing import span
+from config import HIERARCHICAL_CONFIG
+
+HIERARCHICAL_ENV = 'FEDERATED_HIERARCHICAL'
+
+# Contribución de un cliente: (id, carga diferida, número de muestras)
+Contribution = Tuple[int, Callable[[], List[np.ndarray]], int]
+
+
+def hierarchical_enabled() -> bool:
+    return HIERARCHICAL_CONFIG['enabled'] or os.environ.get(HIERARCHICAL_ENV) == '1'
+
+
+def weighted_median(stack: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Mediana ponderada elemento a elemento sobre el primer eje"""
+    order = np.argsort(stack, axis=0)
+    values = np.take_along_axis(stack, order, axis=0)
+    cumulative = np.cumsum(weights[order], axis=0)
+    index = np.argmax(cumulative >= cumulative[-1] / 2.0, axis=0)
+    return np.take_along_axis(values, index[np.newaxis], axis=0)[0]
+
+
+class HierarchicalAggregator:
+    """Agregadores intermedios por grupo y agregación final en la raíz"""
+
+    def __init__(self, aggregation: AggregationStrategy, **kwargs):
+        self.aggregation = aggregation
+        self.groups = kwargs.get('groups', HIERARCHICAL_CONFIG['groups']) or {}
+        self.group_size = max(1, kwargs.get('group_size', HIERARCHICAL_CONFIG['group_size']))
+        self.workers = kwargs.get('workers', HIERARCHICAL_CONFIG['workers'])
+        self._group_of = {int(cid): name for name, cids in self.groups.items() for cid in cids}
+
+    def assign(self, client_ids: List[int]) -> Dict[str, List[int]]:
+        """Grupo de cada cliente: el configurado o un bloque de `group_size` por orden de id"""
+        assignment = defaultdict(list)
+        unassigned = sorted(cid for cid in client_ids if cid not in self._group_of)
+        for cid in client_ids:
+            if cid in self._group_of:
+                assignment[self._group_of[cid]].append(cid)
+        for position, cid in enumerate(unassigned):
+            assignment[f"bloque{position // self.group_size}"].append(cid)
+        return dict(assignment)
+
+    def _partial(self, name: str, members: List[Contribution]) -> Optional[Tuple[List[np.ndarray], int, int]]:
+        """Agregado parcial de un grupo: (parámetros, muestras, clientes); None si no queda ninguno"""
+        with span('partial_aggregate', cat='aggregation', group=name, clients=len(members)):
+            # Solo las cargas del grupo se deserializan a la vez
+            parameters_list, num_samples_list = [], []
+            for cid, load, num_samples in members:
+                parameters = load()
+                if not is_finite_payload(parameters):
+                    print(f"Descartada la actualización no finita del cliente {cid} (grupo {name})")
+                    continue
+                parameters_list.append(parameters)
+                num_samples_list.append(num_samples)
+            if not parameters_list:
+                return None
+            partial = self.aggregation.aggregate(parameters_list, num_samples_list)
+        return partial, sum(num_samples_list), len(parameters_list)
+
+    def aggregate(self, contributions: List[Contribution]) -> Tuple[List[np.ndarray], int]:
+        """Agregar por grupos en paralelo y combinar en la raíz; devuelve (parámetros, grupos)"""
+        by_id = {contribution[0]: contribution for contribution in contributions}
+        assignment = self.assign(list(by_id))
+        groups = [(name, [by_id[cid] for cid in cids]) for name, cids in sorted(assignment.items())]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(groups)))) as executor:
+            partials = [partial for partial in executor.map(lambda group: self._partial(*group), groups)
+                        if partial is not None]
+        if not partials:
+            raise ValueError("Ninguna actualización finita que agregar")
+
+        parameters_list = [partial for partial, _, _ in partials]
+        num_samples_list = [num_samples for _, num_samples, _ in partials]
+        with span('root_aggregate', cat='aggregation', groups=len(partials)):
+            dense = not any(is_forest_payload(p) or is_prototype_payload(p) for p in parameters_list)
+            if self.aggregation.strategy == 'fedmed' and dense:
+                weights = np.array([num_clients for _, _, num_clients in partials], dtype=np.float64)
+                return [weighted_median(np.stack(arrays), weights)
+                        for arrays in zip(*parameters_list)], len(partials)
+            return self.aggregation.aggregate(parameters_list, num_samples_list), len(partials)
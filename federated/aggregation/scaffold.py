@@ -0,0 +1,58 @@
+"""
+Cargas y variables de control de SCAFFOLD
+
+El servidor envía [cabecera, modelo..., control del servidor...] y cada cliente
+responde [cabecera, modelo local..., incremento de su control...]. La cabecera
+indica el número de arrays del modelo; un control vacío equivale a ceros
+(primera ronda).
+
+El control del servidor se guarda en el checkpoint (prefijo `ctrl_`) y los de
+los clientes en un directorio junto a él, de modo que una ejecución reanudada
+(también entre escalones de la búsqueda) recupera los suyos.
+"""
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import CLIENT_DRIFT_CONFIG
+
+SCAFFOLD_MAGIC = 7304
+SCAFFOLD_STATE_ENV = 'FEDERATED_SCAFFOLD_STATE_DIR'
+
+
+def control_state_dir(checkpoint_path: Optional[str] = None) -> str:
+    """Directorio de los controles de cliente: junto al checkpoint, el del entorno o el configurado"""
+    if checkpoint_path:
+        return f"{os.path.splitext(checkpoint_path)[0]}_scaffold"
+    return os.environ.get(SCAFFOLD_STATE_ENV) or CLIENT_DRIFT_CONFIG['state_dir']
+
+
+def is_scaffold_payload(parameters: List[np.ndarray]) -> bool:
+    """Indicar si la lista de parámetros es una carga de SCAFFOLD"""
+    return (len(parameters) >= 1 and parameters[0].ndim == 1 and parameters[0].size == 2 and
+            int(parameters[0][0]) == SCAFFOLD_MAGIC)
+
+
+def scaffold_payload(model: List[np.ndarray], control: Optional[List[np.ndarray]]) -> List[np.ndarray]:
+    header = np.array([SCAFFOLD_MAGIC, len(model)], dtype=np.float64)
+    return [header, *model, *(control or [])]
+
+
+def split_scaffold_payload(parameters: List[np.ndarray]) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Separar modelo y control"""
+    num_model = int(parameters[0][1])
+    return list(parameters[1:1 + num_model]), list(parameters[1 + num_model:])
+
+
+def client_control_update(client_control: List[np.ndarray], server_control: List[np.ndarray],
+                          global_params: List[np.ndarray], local_params: List[np.ndarray],
+                          steps: int, learning_rate: float) -> List[np.ndarray]:
+    """Nuevo control del cliente (opción II del artículo)
+
+    c_i+ = c_i - c + (x - y_i) / (K·lr), con x el modelo global de partida, y_i
+    el modelo tras K pasos locales.
+    """
+    scale = 1.0 / (max(steps, 1) * learning_rate)
+    return [ci - c + (x - yi) * scale
+            for ci, c, x, yi in zip(client_control, server_control, global_params, local_params)]
@@ -0,0 +1,116 @@
+"""
+Optimizadores del servidor sobre el modelo agregado
+
+La estrategia de agregación (fedavg, fedmed...) produce el agregado de la ronda;
+el optimizador usa Δ = agregado - global como pseudo-gradiente (Reddi et al.,
+"Adaptive Federated Optimization"):
+
+- momentum:   m = β·m + Δ;                  x += η·m
+- fedadagrad: m = β1·m + (1-β1)·Δ;  v += Δ²;                          x += η·m / (√v + τ)
+- fedadam:    m = β1·m + (1-β1)·Δ;  v = β2·v + (1-β2)·Δ²;             x += η·m / (√v + τ)
+- fedyogi:    m = β1·m + (1-β1)·Δ;  v -= (1-β2)·Δ²·sign(v - Δ²);      x += η·m / (√v + τ)
+
+Con 'none' el modelo global es el agregado. Las cargas no paramétricas
+(árboles, prototipos KNN) no se optimizan.
+"""
+import os
+import numpy as np
+from typing import Dict, List, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import SERVER_OPTIMIZERS, SERVER_OPTIMIZER_CONFIG
+
+SERVER_OPTIMIZER_ENV = 'FEDERATED_SERVER_OPTIMIZER'
+ADAPTIVE_OPTIMIZERS = ('fedadagrad', 'fedadam', 'fedyogi')
+
+
+def server_optimizer_name(name: Optional[str] = None) -> str:
+    """Optimizador indicado, el del entorno o el configurado"""
+    name = name or os.environ.get(SERVER_OPTIMIZER_ENV) or SERVER_OPTIMIZER_CONFIG['optimizer']
+    if name not in SERVER_OPTIMIZERS:
+        raise ValueError(f"Optimizador de servidor no soportado: {name}")
+    return name
+
+
+class ServerOptimizer:
+    """Paso del servidor con estado (momentos) entre rondas"""
+
+    def __init__(self, name: Optional[str] = None, **kwargs):
+        self.name = server_optimizer_name(name)
+        learning_rates = SERVER_OPTIMIZER_CONFIG['learning_rate']
+        self.learning_rate = kwargs.get('learning_rate', learning_rates.get(self.name, 1.0))
+        self.momentum = kwargs.get('momentum', SERVER_OPTIMIZER_CONFIG['momentum'])
+        self.beta_1 = kwargs.get('beta_1', SERVER_OPTIMIZER_CONFIG['beta_1'])
+        self.beta_2 = kwargs.get('beta_2', SERVER_OPTIMIZER_CONFIG['beta_2'])
+        self.tau = kwargs.get('tau', SERVER_OPTIMIZER_CONFIG['tau'])
+        self.m = None
+        self.v = None
+        self.steps = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.name != 'none'
+
+    def _applies(self, current: Optional[List[np.ndarray]], aggregated: List[np.ndarray]) -> bool:
+        """Solo parámetros en coma flotante con la misma forma que el modelo global"""
+        return current is not None and len(current) == len(aggregated) and all(
+            c.shape == a.shape and np.issubdtype(a.dtype, np.floating)
+            for c, a in zip(current, aggregated))
+
+    def step(self, current: Optional[List[np.ndarray]], aggregated: List[np.ndarray]) -> List[np.ndarray]:
+        """Nuevo modelo global a partir del global actual y el agregado de la ronda
+
+        Sin modelo global comparable (primera ronda, cambio de arquitectura o
+        cargas no paramétricas) se adopta el agregado y se reinicia el estado.
+        """
+        if not self.enabled:
+            return aggregated
+        if not self._applies(current, aggregated):
+            self.m = self.v = None
+            self.steps = 0
+            return aggregated
+
+        deltas = [np.asarray(a, dtype=np.float64) - np.asarray(c, dtype=np.float64)
+                  for c, a in zip(current, aggregated)]
+        if self.m is None or len(self.m) != len(deltas) or \
+                any(m.shape != d.shape for m, d in zip(self.m, deltas)):
+            self.m = [np.zeros_like(d) for d in deltas]
+            # v inicial τ² como en el artículo
+            self.v = [np.full_like(d, self.tau ** 2) for d in deltas]
+
+        updates = []
+        for i, delta in enumerate(deltas):
+            if self.name == 'momentum':
+                self.m[i] = self.momentum * self.m[i] + delta
+                updates.append(self.learning_rate * self.m[i])
+                continue
+            self.m[i] = self.beta_1 * self.m[i] + (1 - self.beta_1) * delta
+            squared = delta ** 2
+            if self.name == 'fedadagrad':
+                self.v[i] = self.v[i] + squared
+            elif self.name == 'fedadam':
+                self.v[i] = self.beta_2 * self.v[i] + (1 - self.beta_2) * squared
+            else:
+                self.v[i] = self.v[i] - (1 - self.beta_2) * squared * np.sign(self.v[i] - squared)
+            updates.append(self.learning_rate * self.m[i] / (np.sqrt(self.v[i]) + self.tau))
+        self.steps += 1
+        return [(np.asarray(c, dtype=np.float64) + u).astype(a.dtype)
+                for c, a, u in zip(current, aggregated, updates)]
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Estado para el checkpoint (vacío si no hay momentos)"""
+        if not self.enabled or self.m is None:
+            return {}
+        state = {'name': np.array(self.name), 'steps': np.array(self.steps)}
+        state.update({f"m_{i}": m for i, m in enumerate(self.m)})
+        state.update({f"v_{i}": v for i, v in enumerate(self.v)})
+        return state
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        """Restaurar el estado de un checkpoint del mismo optimizador"""
+        if not state or str(state.get('name')) != self.name:
+            return
+        count = sum(1 for key in state if key.startswith('m_'))
+        self.m = [np.asarray(state[f"m_{i}"], dtype=np.float64) for i in range(count)]
+        self.v = [np.asarray(state[f"v_{i}"], dtype=np.float64) for i in range(count)]
+        self.steps = int(state['steps'])
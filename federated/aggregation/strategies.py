@@ -3,22 +3,59 @@ Estrategias de agregación para aprendizaje federado
 """
 import numpy as np
 from typing import List, Tuple
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.models.tree_ensemble import FOREST_META, is_forest_payload, merge_forest_arrays
+from federated.models.knn_prototypes import is_prototype_payload, merge_prototype_arrays
+from federated.aggregation.scaffold import is_scaffold_payload, split_scaffold_payload
+from federated.utils.tracing import span
+from config import TREE_FEDERATION_CONFIG, KNN_FEDERATION_CONFIG
+
+def is_finite_payload(parameters: List[np.ndarray]) -> bool:
+    """Indicar si una carga no tiene NaN ni infinitos (un cliente divergido no se agrega)"""
+    return all(np.isfinite(p).all() for p in parameters if np.issubdtype(np.asarray(p).dtype, np.floating))
+
 
 class AggregationStrategy:
     """Clase base para estrategias de agregación"""
+
+    # Método que implementa cada estrategia sobre parámetros densos
+    # (FedProx y SCAFFOLD corrigen el entrenamiento local; el servidor promedia)
+    STRATEGY_METHODS = {
+        'fedavg': '_federated_averaging',
+        'fedmed': '_federated_median',
+        'fedprox': '_federated_averaging',
+        'scaffold': '_federated_averaging',
+    }
     
-    def __init__(self, strategy='fedavg'):
+    def __init__(self, strategy='fedavg', **kwargs):
         self.strategy = strategy
+        self.max_global_trees = kwargs.get('max_global_trees', TREE_FEDERATION_CONFIG['max_global_trees'])
+        self.max_global_prototypes = kwargs.get('max_global_prototypes', KNN_FEDERATION_CONFIG['max_global_prototypes'])
+        self.seed = kwargs.get('seed', TREE_FEDERATION_CONFIG['seed'])
+        # Variable de control del servidor de SCAFFOLD (None hasta la primera agregación)
+        self.server_control = None
         
     def aggregate(self, parameters_list: List[List[np.ndarray]], 
                  num_samples_list: List[int]) -> List[np.ndarray]:
         """Agregar parámetros de múltiples clientes"""
-        if self.strategy == 'fedavg':
-            return self._federated_averaging(parameters_list, num_samples_list)
-        elif self.strategy == 'fedmed':
-            return self._federated_median(parameters_list, num_samples_list)
-        else:
+        with span('aggregate', cat='aggregation', strategy=self.strategy, clients=len(parameters_list)):
+            return self._aggregate(parameters_list, num_samples_list)
+
+    def _aggregate(self, parameters_list: List[List[np.ndarray]],
+                   num_samples_list: List[int]) -> List[np.ndarray]:
+        if parameters_list and all(is_forest_payload(p) for p in parameters_list):
+            # Los ensambles de árboles se federan uniendo árboles, no promediando
+            return self._merge_forests(parameters_list, num_samples_list)
+        if parameters_list and all(is_prototype_payload(p) for p in parameters_list):
+            # KNN: índice global sobre la unión de prototipos de los clientes
+            return merge_prototype_arrays(parameters_list, self.max_global_prototypes, self.seed)
+        if parameters_list and all(is_scaffold_payload(p) for p in parameters_list):
+            return self._scaffold(parameters_list, num_samples_list)
+        if self.strategy not in self.STRATEGY_METHODS:
             raise ValueError(f"Estrategia de agregación no soportada: {self.strategy}")
+        return getattr(self, self.STRATEGY_METHODS[self.strategy])(parameters_list, num_samples_list)
     
     def _federated_averaging(self, parameters_list: List[List[np.ndarray]], 
                            num_samples_list: List[int]) -> List[np.ndarray]:
@@ -32,9 +69,10 @@ class AggregationStrategy:
         aggregated_params = []
         
         for param_idx in range(num_params):
-            # Inicializar parámetro agregado con ceros
+            # Inicializar parámetro agregado con ceros (en la precisión de las cargas)
             param_shape = parameters_list[0][param_idx].shape
-            aggregated_param = np.zeros(param_shape)
+            param_dtype = np.result_type(parameters_list[0][param_idx], np.float32)
+            aggregated_param = np.zeros(param_shape, dtype=param_dtype)
             
             # Sumar parámetros ponderados
             for client_idx, client_params in enumerate(parameters_list):
@@ -67,3 +105,50 @@ class AggregationStrategy:
             aggregated_params.append(median_param)
             
         return aggregated_params
+
+    def _scaffold(self, parameters_list: List[List[np.ndarray]],
+                  num_samples_list: List[int]) -> List[np.ndarray]:
+        """SCAFFOLD: promedio de los modelos locales y actualización del control del servidor
+
+        Con paso global 1 el nuevo modelo es el promedio ponderado de los modelos
+        locales; el control avanza con la media de los incrementos de los clientes
+        (todos participan en cada ronda).
+        """
+        models, deltas = zip(*(split_scaffold_payload(p) for p in parameters_list))
+        aggregated = self._federated_averaging(list(models), num_samples_list)
+
+        deltas = [d for d in deltas if len(d) == len(aggregated)]
+        if self.server_control is None or len(self.server_control) != len(aggregated) or \
+                any(c.shape != p.shape for c, p in zip(self.server_control, aggregated)):
+            self.server_control = [np.zeros(p.shape, dtype=np.float64) for p in aggregated]
+        if deltas:
+            for i in range(len(aggregated)):
+                self.server_control[i] += np.mean([d[i] for d in deltas], axis=0)
+        return aggregated
+
+    def _merge_forests(self, parameters_list: List[List[np.ndarray]],
+                       num_samples_list: List[int]) -> List[np.ndarray]:
+        """Unir los árboles de todos los clientes en un bosque global"""
+        tree_counts = [int(params[FOREST_META][1]) for params in parameters_list]
+        total_trees = sum(tree_counts)
+
+        if self.max_global_trees is None or total_trees <= self.max_global_trees:
+            return merge_forest_arrays(parameters_list)
+
+        # Presupuesto global repartido en proporción al número de muestras
+        weights = np.asarray(num_samples_list, dtype=np.float64)
+        quotas = self.max_global_trees * weights / weights.sum()
+        budget = np.minimum(np.floor(quotas).astype(int), tree_counts)
+
+        # Asignar los árboles restantes a los clientes con mayor resto
+        rng = np.random.default_rng(self.seed)
+        remaining = self.max_global_trees - budget.sum()
+        order = np.lexsort((rng.random(len(budget)), -(quotas - budget)))
+        for idx in order:
+            if remaining <= 0:
+                break
+            if budget[idx] < tree_counts[idx]:
+                budget[idx] += 1
+                remaining -= 1
+
+        return merge_forest_arrays(parameters_list, budget.tolist())
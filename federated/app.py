@@ -1,28 +1,90 @@
 import flwr as fl
 import os
+import json
+import time
 
-from config import FEDERATED_CONFIG
+from config import FEDERATED_CONFIG, EXPORT_CONFIG
 from federated.client import create_client_fn
 from federated.server import create_strategy
+from federated.models.utils import save_last_metrics
+from federated.utils.metrics import compute_metrics_global
+from federated.utils.tracing import start_tracing, finish_tracing
+from federated.utils.client_state import ClientStateStore
+from federated.aggregation.scaffold import SCAFFOLD_STATE_ENV, control_state_dir
+from federated.models.export import export_federated_model
+from federated.models.personalization import PERSONALIZATION_MODES, personalization_enabled
+from federated.privacy.differential_privacy import DifferentialPrivacy, PROTOTYPE_RELEASES
+from federated.models.base_model import TREE_MODELS
 
 def start() -> None:
     # Leer parámetros desde variables de entorno
     model_type = os.environ.get("MODEL_TYPE", "ridge")
     aggregation = os.environ.get("AGGREGATION_STRATEGY", "fedavg")
     privacy = os.environ.get("PRIVACY_TECHNIQUE", "none")
+    num_rounds = int(os.environ.get("NUM_ROUNDS", FEDERATED_CONFIG["num_rounds"]))
+    # Hiperparámetros del modelo (JSON) y checkpoints para el planificador de búsqueda
+    model_params = json.loads(os.environ.get("MODEL_PARAMS") or "{}")
+    checkpoint_path = os.environ.get("CHECKPOINT_PATH") or None
+    resume_path = os.environ.get("RESUME_CHECKPOINT") or None
 
     # Crear estrategia federada y función para instanciar clientes
-    strategy = create_strategy(aggregation)
+    run_id = f"{model_type}_{aggregation}_{privacy}_{int(time.time())}"
+    strategy = create_strategy(aggregation, model_type, run_id, model_params,
+                               checkpoint_path, resume_path)
     client_fn = create_client_fn(
         model_type=model_type,
-        privacy_technique=privacy
+        privacy_technique=privacy,
+        model_params=model_params
     )
 
-    # Iniciar simulación federada
+    # El estado personal de un experimento anterior no se mezcla con este
+    personalized = personalization_enabled() and model_type in PERSONALIZATION_MODES
+    if personalized and not resume_path:
+        ClientStateStore(model_type).clear()
+    # SCAFFOLD: los controles de cliente viven junto al checkpoint (el del servidor va
+    # dentro); al reanudar se conservan y solo una ejecución nueva parte de cero
+    if aggregation == 'scaffold':
+        state_dir = control_state_dir(checkpoint_path or resume_path)
+        os.environ[SCAFFOLD_STATE_ENV] = state_dir
+        if not resume_path:
+            ClientStateStore(model_type, state_dir).clear()
+
+    # Iniciar simulación federada (los actores de Ray heredan el directorio de trazas)
+    trace_dir = start_tracing(run_id)
+    start_time = time.time()
+    strategy.metrics_logger.log('run_start', model_type=model_type,
+                                aggregation=aggregation, privacy=privacy,
+                                num_rounds=num_rounds, model_params=model_params,
+                                resumed_from=strategy.round_offset)
     fl.simulation.run_simulation(
         client_fn=client_fn,
         num_clients=FEDERATED_CONFIG["num_clients"],
-        config=fl.server.ServerConfig(num_rounds=FEDERATED_CONFIG["num_rounds"]),
+        config=fl.server.ServerConfig(num_rounds=num_rounds),
         strategy=strategy,
         client_resources={"num_cpus": 1},
     )
+    traces = finish_tracing(trace_dir)
+
+    # Guardar métricas del experimento (incluye la ronda de parada)
+    metrics = strategy.get_summary()
+    if not strategy.server_metrics:
+        # Sin evaluación en servidor se reentrena un modelo centralizado de referencia
+        metrics.update(compute_metrics_global(model_type))
+    metrics['elapsed_time'] = time.time() - start_time
+    metrics['model_params'] = model_params
+    metrics['personalized'] = personalized
+    if traces:
+        metrics.update(traces)
+
+    # Presupuesto de privacidad acumulado en las rondas realmente ejecutadas
+    # Los bosques se envían sin privacidad diferencial (ver CreditScoringClient); los
+    # prototipos KNN publican tres mecanismos gaussianos por ronda
+    dp = DifferentialPrivacy('none' if model_type in TREE_MODELS else privacy)
+    releases = PROTOTYPE_RELEASES if model_type == 'knn' else 1
+    metrics['dp_epsilon'], metrics['dp_delta'] = dp.calculate_privacy_budget(metrics['stopped_round'], releases)
+    metrics['dp_noise_multiplier'] = dp.effective_noise_multiplier
+    if EXPORT_CONFIG['enabled'] and strategy.final_parameters is not None:
+        metrics['model_dir'] = export_federated_model(
+            model_type, strategy.final_parameters, run_id, model_params, metrics)
+    strategy.metrics_logger.log('run_end', metrics=metrics)
+    save_last_metrics(metrics)
@@ -2,31 +2,64 @@
 Cliente para aprendizaje federado
 """
 import flwr as fl
-import pandas as pd
 import numpy as np
+from sklearn.model_selection import train_test_split
 from typing import Dict, List, Tuple
+from collections import deque
 import os
+import contextlib
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from federated.models.base_model import BaseModel
+from federated.models.tree_ensemble import is_forest_payload
+from federated.models.knn_prototypes import is_prototype_payload
+from federated.models.personalization import PERSONALIZATION_MODES, Personalizer, personalization_enabled
+from federated.models.local_solvers import LocalSolver, compatible, init_parameters, uses_local_solver
+from federated.aggregation.scaffold import (client_control_update, control_state_dir, is_scaffold_payload,
+                                            scaffold_payload, split_scaffold_payload)
 from federated.privacy.differential_privacy import DifferentialPrivacy
-from config import PROCESSED_DATA_DIR
+from federated.privacy.secure_aggregation import (PairwiseMasker, decode_public_keys, encode_public_keys,
+                                                  generate_keypair)
+from federated.utils.tracing import get_tracer, span
+from federated.utils.memory import MB, memory_profiling_enabled, profile_memory
+from federated.utils.precision import get_dtype
+from federated.utils.client_state import ClientStateStore
+from federated.utils.columnar import client_data_path, read_client_frame
+from config import (PROCESSED_DATA_DIR, METRICS_LOG_CONFIG, PERSONALIZATION_CONFIG,
+                    SECURE_AGGREGATION_CONFIG, KNN_FEDERATION_CONFIG)
 
 class CreditScoringClient(fl.client.NumPyClient):
     """Cliente de aprendizaje federado para predicción de score crediticio"""
 
-    def __init__(self, client_id: int, model_type: str = 'ridge', privacy_technique: str = 'none'):
+    def __init__(self, client_id: int, model_type: str = 'ridge', privacy_technique: str = 'none',
+                 model_params: Dict = None, data_dir: str = None):
         print(f"[CREANDO CLIENTE {client_id}] modelo={model_type}, privacidad={privacy_technique}", flush=True)
         self.client_id = client_id
         self.model_type = model_type
         self.privacy_technique = privacy_technique
+        self.data_dir = data_dir or PROCESSED_DATA_DIR
 
         try:
-            self.model = BaseModel(model_type)
-            self.privacy = DifferentialPrivacy(privacy_technique)
-            self.X_train, self.y_train, self.X_test, self.y_test = self._load_client_data()
-            self.metrics_history = []
+            with span('client_init', client=client_id, model=model_type):
+                self.model = BaseModel(model_type, **(model_params or {}))
+                self.privacy = DifferentialPrivacy(privacy_technique, client_id=client_id)
+                self.X_train, self.y_train, self.X_test, self.y_test = self._load_client_data()
+                # Personalización: estado propio entre rondas y datos reservados para ajustarla
+                self.personalizer = None
+                if personalization_enabled() and model_type in PERSONALIZATION_MODES:
+                    self.personalizer = Personalizer(
+                        model_type, activation=getattr(self.model.model, 'activation', 'relu'))
+                    self.state_store = ClientStateStore(model_type)
+                    self.X_train, self.X_personal, self.y_train, self.y_personal = train_test_split(
+                        self.X_train, self.y_train,
+                        test_size=PERSONALIZATION_CONFIG['validation_fraction'], random_state=42)
+                # Variables de control de SCAFFOLD del cliente
+                self.control_store = ClientStateStore(model_type, control_state_dir())
+                # Clave DH privada de la ronda de agregación segura (nunca sale del cliente)
+                self.key_store = ClientStateStore('secagg', SECURE_AGGREGATION_CONFIG['key_dir'])
+                # Historial acotado: el registro completo está en el log del servidor
+                self.metrics_history = deque(maxlen=METRICS_LOG_CONFIG['history_size'])
         except Exception as e:
             print(f"[ERROR] Cliente {client_id} no pudo inicializarse: {e}", flush=True)
             import traceback
@@ -36,23 +69,24 @@ class CreditScoringClient(fl.client.NumPyClient):
     def _load_client_data(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """Cargar datos del cliente específico"""
         try:
-            filename = f"banco{self.client_id}.csv"
-            filepath = os.path.abspath(os.path.join(PROCESSED_DATA_DIR, filename))
+            # Formato columnar si el preprocesamiento en streaming lo generó, si no CSV
+            filepath = os.path.abspath(client_data_path(self.data_dir, self.client_id))
 
             print(f"[DEBUG] Intentando cargar archivo: {filepath}", flush=True)
-            print(f"[DEBUG] Archivos en {PROCESSED_DATA_DIR}: {os.listdir(PROCESSED_DATA_DIR)}", flush=True)
+            print(f"[DEBUG] Archivos en {self.data_dir}: {os.listdir(self.data_dir)}", flush=True)
 
             if not os.path.exists(filepath):
                 raise FileNotFoundError(f"No se encontró el archivo: {filepath}")
 
-            df = pd.read_csv(filepath)
+            with span('load_data', client=self.client_id):
+                # Los datos procesados son numéricos: se leen directamente en la precisión activa
+                df = read_client_frame(filepath, dtype=get_dtype())
 
             # Separar características y etiquetas
             X = df.drop('Score', axis=1).values
             y = df['Score'].values
 
             # Dividir en entrenamiento y prueba
-            from sklearn.model_selection import train_test_split
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
             print(f"[CLIENTE {self.client_id}] {len(X_train)} muestras de entrenamiento, {len(X_test)} de prueba", flush=True)
@@ -64,28 +98,135 @@ class CreditScoringClient(fl.client.NumPyClient):
             traceback.print_exc()
             raise e
 
+    def get_properties(self, config: Dict) -> Dict:
+        """Fases de la agregación segura fuera del entrenamiento: anuncio de claves y recuperación"""
+        server_round = int(config.get('server_round', 0))
+        phase = config.get('secagg')
+        with span('secagg_' + str(phase), client=self.client_id, round=server_round):
+            if phase == 'advertise':
+                return self._advertise_key(server_round)
+            if phase == 'reveal':
+                dropped = [int(c) for c in str(config.get('dropped', '')).split(',') if c]
+                return self._reveal_seeds(server_round, dropped)
+        return {}
+
+    def _advertise_key(self, server_round: int) -> Dict:
+        """Nuevo par de claves de la ronda: se guarda la privada y se publica la pública"""
+        private_key, public_key = generate_keypair()
+        self.key_store.save(self.client_id, {'round': np.array(server_round),
+                                             'private_key': np.array(format(private_key, 'x')),
+                                             'public_keys': np.array('')})
+        return {'public_key': format(public_key, 'x')}
+
+    def _load_key(self, server_round: int) -> Dict:
+        state = self.key_store.load(self.client_id)
+        if state is None or int(state['round']) != server_round:
+            raise ValueError(f"El cliente {self.client_id} no tiene clave para la ronda {server_round}")
+        return state
+
+    def _masker(self, config: Dict, server_round: int) -> PairwiseMasker:
+        """Enmascarador con la clave privada de la ronda y las públicas de los vecinos"""
+        state = self._load_key(server_round)
+        public_keys = decode_public_keys(config.get('secagg_keys', ''))
+        # Las claves de los vecinos se conservan para la fase de recuperación
+        state['public_keys'] = np.array(encode_public_keys(public_keys))
+        self.key_store.save(self.client_id, state)
+        return PairwiseMasker(self.client_id, int(str(state['private_key']), 16), public_keys)
+
+    def _reveal_seeds(self, server_round: int, dropped: List[int]) -> Dict:
+        """Semillas compartidas con los vecinos caídos (solo las de esta ronda)"""
+        state = self._load_key(server_round)
+        masker = PairwiseMasker(self.client_id, int(str(state['private_key']), 16),
+                                decode_public_keys(str(state['public_keys'])))
+        return {f"seed_{j}": str(masker.reveal_seed(j, server_round)) for j in dropped}
+
     def get_parameters(self, config: Dict) -> List[np.ndarray]:
+        server_round = int(config.get('server_round', 0))
+        with span('get_parameters', client=self.client_id, round=server_round):
+            return self._get_parameters(config, server_round)
+
+    def _get_parameters(self, config: Dict, server_round: int) -> List[np.ndarray]:
         try:
             parameters = self.model.get_parameters()
-            return self.privacy.apply_privacy(parameters)
+            if is_prototype_payload(parameters) and self.privacy.technique != 'none':
+                # Privacidad a nivel de prototipo: registros acotados y ruido por centroide
+                return self.privacy.apply_prototype_privacy(
+                    self.X_train, self.y_train, KNN_FEDERATION_CONFIG['prototypes_per_client'],
+                    server_round, seed=KNN_FEDERATION_CONFIG['seed'])
+            if is_forest_payload(parameters) or is_prototype_payload(parameters):
+                # El clipping y el ruido sobre el vector completo de valores de las hojas
+                # destruyen el modelo y no dan una garantía con sentido: los bosques se
+                # envían sin privacidad
+                if self.privacy.technique != 'none':
+                    print(f"[AVISO] Cliente {self.client_id}: '{self.privacy.technique}' no se aplica "
+                          f"a la carga no paramétrica de {self.model_type}; se envía sin privacidad "
+                          f"diferencial", flush=True)
+                return parameters
+            parameters = self.privacy.apply_privacy(parameters, server_round)
+            if config.get('secagg_participants'):
+                # Contribución ponderada y enmascarada: solo la suma es recuperable
+                participants = [int(c) for c in str(config['secagg_participants']).split(',')]
+                with span('secagg_mask', client=self.client_id, round=server_round):
+                    return self._masker(config, server_round).mask(
+                        parameters, len(self.X_train), participants, server_round)
+            return parameters
         except Exception as e:
             print(f"[ERROR] get_parameters cliente {self.client_id}: {e}", flush=True)
             return [np.array([1.0])]
 
     def set_parameters(self, parameters: List[np.ndarray]) -> None:
         try:
-            self.model.set_parameters(parameters)
+            with span('set_parameters', client=self.client_id):
+                self.model.set_parameters(parameters)
         except Exception as e:
             print(f"[ERROR] set_parameters cliente {self.client_id}: {e}", flush=True)
 
     def fit(self, parameters: List[np.ndarray], config: Dict) -> Tuple[List[np.ndarray], int, Dict]:
+        server_round = config.get('server_round')
+        memory = profile_memory() if memory_profiling_enabled() else contextlib.nullcontext({})
+        try:
+            with span('client_fit', client=self.client_id, round=server_round), memory as usage:
+                parameters, num_samples, metrics = self._fit(parameters, config, server_round)
+            if usage:
+                # Memoria de la ronda (entrenamiento, métricas y copias de privacidad)
+                # y tamaño de la partición local que el cliente mantiene en memoria
+                metrics.update(usage)
+                metrics['mem_data_mb'] = sum(
+                    a.nbytes for a in (self.X_train, self.y_train, self.X_test, self.y_test)) / MB
+            return parameters, num_samples, metrics
+        finally:
+            # Los actores de Ray pueden terminar sin atexit: volcar tras cada ronda
+            get_tracer().flush()
+
+    def _fit(self, parameters: List[np.ndarray], config: Dict,
+             server_round) -> Tuple[List[np.ndarray], int, Dict]:
         try:
             print(f"[CLIENTE {self.client_id}] Iniciando entrenamiento...", flush=True)
-            self.set_parameters(parameters)
-            self.model.fit(self.X_train, self.y_train)
+            server_control = None
+            if is_scaffold_payload(parameters):
+                parameters, server_control = split_scaffold_payload(parameters)
+            control_delta = None
+            with span('local_train', client=self.client_id, round=server_round, model=self.model_type):
+                if uses_local_solver(self.model_type, config.get('aggregation')):
+                    # Parte del modelo global solo si encaja con la arquitectura local
+                    control_delta = self._fit_local(parameters, config, server_control, server_round)
+                else:
+                    self.set_parameters(parameters)
+                    self.model.fit(self.X_train, self.y_train)
 
-            train_metrics = self.model.evaluate(self.X_train, self.y_train)
-            test_metrics = self.model.evaluate(self.X_test, self.y_test)
+            if self.personalizer:
+                # Se guarda el modelo local para interpolarlo con los globales siguientes
+                self._personalize(parameters, server_round, local_params=self.model.get_parameters())
+
+            with span('metrics', client=self.client_id, round=server_round):
+                train_metrics = self.model.evaluate(self.X_train, self.y_train)
+                test_metrics = self.model.evaluate(self.X_test, self.y_test)
+
+            # Tiempos medidos: entrenamiento local e inferencia sobre la partición de prueba
+            train_metrics.pop("inference_time")
+            training_time = train_metrics.pop("training_time")
+            test_metrics.pop("training_time")
+            inference_time = test_metrics.pop("inference_time")
 
             metrics = {
                 f"train_{k}": v for k, v in train_metrics.items()
@@ -93,12 +234,16 @@ class CreditScoringClient(fl.client.NumPyClient):
             metrics.update(
                 {
                     **{f"test_{k}": v for k, v in test_metrics.items()},
+                    "training_time": training_time,
+                    "inference_time": inference_time,
                     "client_id": self.client_id,
                     "num_samples": len(self.X_train)
                 }
             )
 
             self.metrics_history.append(metrics)
+            if control_delta is not None:
+                return scaffold_payload(self.get_parameters(config), control_delta), len(self.X_train), metrics
             return self.get_parameters(config), len(self.X_train), metrics
 
         except Exception as e:
@@ -107,26 +252,79 @@ class CreditScoringClient(fl.client.NumPyClient):
             traceback.print_exc()
             return [np.array([1.0])], 1, {"error": str(e)}
 
+    def _fit_local(self, global_params: List[np.ndarray], config: Dict, server_control,
+                   server_round) -> List[np.ndarray]:
+        """SGD local desde el modelo global con la corrección de deriva de la estrategia
+
+        Devuelve el incremento del control del cliente con SCAFFOLD y None en otro caso.
+        """
+        estimator = self.model.model
+        activation = getattr(estimator, 'activation', 'relu')
+        solver = LocalSolver(self.model_type, alpha=estimator.alpha, activation=activation)
+        start = init_parameters(self.model_type, self.X_train.shape[1],
+                                getattr(estimator, 'hidden_layer_sizes', ()), activation, seed=solver.seed)
+        # Sin modelo global válido (primera ronda) todos parten de la misma inicialización,
+        # con el sesgo de salida en la media local del Score
+        if compatible(global_params, start):
+            start = [np.asarray(p, dtype=np.float64) for p in global_params]
+        else:
+            start[-1] = np.full_like(start[-1], float(np.mean(self.y_train)))
+
+        aggregation = config.get('aggregation')
+        mu = float(config.get('proximal_mu', 0.0)) if aggregation == 'fedprox' else 0.0
+        correction = client_control = None
+        if aggregation == 'scaffold':
+            zeros = [np.zeros_like(p) for p in start]
+            state = self.control_store.load(self.client_id)
+            client_control = [state[f"control_{i}"] for i in range(len(start))] \
+                if state and len(state) == len(start) else zeros
+            if not compatible(client_control, start):
+                client_control = zeros
+            if not server_control or not compatible(server_control, start):
+                server_control = zeros
+            server_control = [np.asarray(c, dtype=np.float64) for c in server_control]
+            correction = [c - ci for c, ci in zip(server_control, client_control)]
+
+        # Orden de mini-lotes distinto por cliente y ronda, reproducible
+        local_params, steps = self.model.fit_local(
+            solver, start, self.X_train, self.y_train, mu=mu, correction=correction,
+            seed=self.client_id * 100003 + int(server_round or 0))
+
+        if aggregation != 'scaffold':
+            return None
+        new_control = client_control_update(client_control, server_control, start, local_params,
+                                            steps, solver.learning_rate)
+        self.control_store.save(self.client_id, {f"control_{i}": c for i, c in enumerate(new_control)})
+        return [new - old for new, old in zip(new_control, client_control)]
+
     def evaluate(self, parameters: List[np.ndarray], config: Dict) -> Tuple[float, int, Dict]:
         try:
-            self.set_parameters(parameters)
-            y_pred = self.model.predict(self.X_test)
-            y_true = self.y_test
+            with span('client_evaluate', client=self.client_id, round=config.get('server_round')):
+                return self._evaluate(parameters, config)
+        finally:
+            get_tracer().flush()
 
-            if self.model_type in ["logistic", "neural"]:
-                y_pred = (y_pred >= 0.5).astype(int)
-                y_true = y_true.astype(int)
+    def _evaluate(self, parameters: List[np.ndarray], config: Dict) -> Tuple[float, int, Dict]:
+        try:
+            self.set_parameters(parameters)
+            test_metrics = self.model.evaluate(self.X_test, self.y_test)
 
-            from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, mean_squared_error
+            global_metrics = {}
+            if self.personalizer:
+                # Se evalúa el modelo personal; el global queda como referencia
+                global_metrics = {f"global_test_{k}": test_metrics[k] for k in ('mse', 'mae', 'r2')}
+                state = self._personalize(parameters, config.get('server_round'))
+                self.set_parameters(self.personalizer.apply(parameters, state))
+                test_metrics = self.model.evaluate(self.X_test, self.y_test)
 
-            metrics = {
-                "accuracy": accuracy_score(y_true, y_pred),
-                "precision_macro": precision_score(y_true, y_pred, average="macro", zero_division=0),
-                "recall_macro": recall_score(y_true, y_pred, average="macro", zero_division=0),
-                "f1_macro": f1_score(y_true, y_pred, average="macro", zero_division=0),
-                "loss": mean_squared_error(y_true, y_pred),
-                "inference": 0.001
-            }
+            # Mismas claves que en fit para que el servidor las agregue
+            inference_time = test_metrics.pop("inference_time")
+            test_metrics.pop("training_time")
+            metrics = {f"test_{k}": v for k, v in test_metrics.items()}
+            metrics.update(global_metrics)
+            metrics["inference_time"] = inference_time
+            metrics["client_id"] = self.client_id
+            metrics["loss"] = test_metrics["mse"]
 
             return metrics["loss"], len(self.X_test), metrics
 
@@ -134,9 +332,20 @@ class CreditScoringClient(fl.client.NumPyClient):
             print(f"[ERROR] evaluate cliente {self.client_id}: {e}", flush=True)
             return 1000.0, 1, {"error": str(e)}
 
+    def _personalize(self, global_params: List[np.ndarray], server_round,
+                     local_params: List[np.ndarray] = None) -> Dict:
+        """Actualizar y guardar el estado personal con los datos reservados"""
+        with span('personalize', client=self.client_id, round=server_round):
+            state = self.personalizer.update(
+                global_params, self.state_store.load(self.client_id),
+                self.X_personal, self.y_personal, local_params=local_params)
+            if state:
+                self.state_store.save(self.client_id, state)
+        return state
+
 # ---------------------------------------------
 
-def create_client_fn(model_type: str, privacy_technique: str):
+def create_client_fn(model_type: str, privacy_technique: str, model_params: Dict = None):
     def client_fn(cid: str) -> CreditScoringClient:
         try:
             print(f"[create_client_fn] Recibido cid: {cid}", flush=True)
@@ -145,7 +354,7 @@ def create_client_fn(model_type: str, privacy_technique: str):
             if not match:
                 raise ValueError(f"CID inválido: {cid}")
             cid_int = int(match.group())
-            return CreditScoringClient(cid_int, model_type, privacy_technique)
+            return CreditScoringClient(cid_int, model_type, privacy_technique, model_params)
         except Exception as e:
             print(f"[ERROR] No se pudo crear cliente {cid}: {e}", flush=True)
             import traceback
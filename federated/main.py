@@ -2,20 +2,82 @@ import os
 import subprocess
 import time
 import json
+import sys
 import pandas as pd
 
-from config import RESULTS_DIR, MODELS, AGGREGATION_STRATEGIES, PRIVACY_TECHNIQUES
+from config import (RESULTS_DIR, MODELS, AGGREGATION_STRATEGIES, PRIVACY_TECHNIQUES,
+                    FEDERATED_CONFIG, SEARCH_SPACE, PRECISION_CONFIG, PERSONALIZATION_CONFIG,
+                    SERVER_OPTIMIZER_CONFIG, HIERARCHICAL_CONFIG)
+from federated.utils.scheduler import SuccessiveHalving, expand_search_space
+from federated.models.local_solvers import strategy_applies
+from federated.models.base_model import privacy_applies
+from federated.aggregation.server_optimizers import SERVER_OPTIMIZER_ENV, server_optimizer_name
+from federated.aggregation.hierarchical import HIERARCHICAL_ENV
+from federated.utils.result_cache import ResultCache
+from federated.utils.tracing import tracing_enabled
+from federated.utils.memory import memory_profiling_enabled
+from federated.utils.precision import PRECISION_ENV, compare_precision, get_precision
 
 class FederatedExperiment:
 
-    def __init__(self):
+    def __init__(self, use_cache=True, precision=None):
         self.results = []
+        self.cache = ResultCache() if use_cache else ResultCache(enabled=False)
+        self.precision = get_precision(precision)
+
+    def run_experiment(self, model_type, aggregation_strategy, privacy_technique, num_rounds=FEDERATED_CONFIG['num_rounds'],
+                       model_params=None, checkpoint_path=None, resume_path=None):
+        result = self._run(model_type, aggregation_strategy, privacy_technique, num_rounds,
+                           model_params, checkpoint_path, resume_path, self.precision)
+        if result is None:
+            return None
+
+        # En float32 se registra la diferencia con la misma ejecución en float64
+        # (los escalones reanudados parten de un checkpoint float32 y no tienen referencia)
+        if self.precision != 'float64' and PRECISION_CONFIG['compare_float64'] and not resume_path:
+            reference = self._run(model_type, aggregation_strategy, privacy_technique, num_rounds,
+                                  model_params, None, None, 'float64')
+            if reference is not None:
+                result.update(compare_precision(result, reference))
+
+        self.results.append(result)
+        return result
+
+    def _run(self, model_type, aggregation_strategy, privacy_technique, num_rounds,
+             model_params, checkpoint_path, resume_path, precision):
+        params_label = f" | {model_params}" if model_params else ""
+        print(f"Ejecutando: {model_type} | {aggregation_strategy} | {privacy_technique}{params_label} | {precision}")
+
+        # Los experimentos sin cambios en datos, configuración ni código se sirven de la caché
+        # (salvo con trazas o perfil de memoria, que solo se obtienen ejecutando)
+        cache_key = None
+        if self.cache.enabled and (tracing_enabled() or memory_profiling_enabled()):
+            print("Caché omitida: trazas o perfil de memoria activos")
+        elif self.cache.enabled:
+            cache_key = self.cache.key(model_type, aggregation_strategy, privacy_technique,
+                                       num_rounds, model_params, resume_path, precision)
+            cached = self.cache.get(cache_key, checkpoint_path)
+            if cached is not None:
+                print(f"♻️ Resultado en caché ({cache_key[:12]})")
+                return cached
 
-    def run_experiment(self, model_type, aggregation_strategy, privacy_technique, num_rounds=10):
-        print(f"Ejecutando: {model_type} | {aggregation_strategy} | {privacy_technique}")
         os.environ["MODEL_TYPE"] = model_type
         os.environ["AGGREGATION_STRATEGY"] = aggregation_strategy
         os.environ["PRIVACY_TECHNIQUE"] = privacy_technique
+        os.environ["NUM_ROUNDS"] = str(num_rounds)
+        os.environ["MODEL_PARAMS"] = json.dumps(model_params or {})
+        os.environ[PRECISION_ENV] = precision
+        # Sin valor la variable se elimina para no heredar la del experimento anterior
+        for name, value in (("CHECKPOINT_PATH", checkpoint_path), ("RESUME_CHECKPOINT", resume_path)):
+            if value:
+                os.environ[name] = value
+            else:
+                os.environ.pop(name, None)
+
+        metrics_path = os.path.join(RESULTS_DIR, "last_metrics.json")
+        # Evitar leer las métricas de un experimento anterior si este falla
+        if os.path.exists(metrics_path):
+            os.remove(metrics_path)
 
         try:
             # ⏩ Ejecutar flwr run como subproceso
@@ -24,7 +86,6 @@ class FederatedExperiment:
             ], check=True)
 
             # ⏬ Leer métricas
-            metrics_path = os.path.join(RESULTS_DIR, "last_metrics.json")
             if not os.path.exists(metrics_path):
                 print("⚠️ No se generó last_metrics.json")
                 return None
@@ -39,8 +100,11 @@ class FederatedExperiment:
                 'num_rounds': num_rounds,
                 **metrics
             }
+            if result.get('early_stopped'):
+                print(f"⏹️ Detenido por convergencia en la ronda {result['stopped_round']}/{num_rounds}")
 
-            self.results.append(result)
+            if cache_key is not None:
+                self.cache.put(cache_key, result, checkpoint_path)
             return result
 
         except Exception as e:
@@ -48,21 +112,66 @@ class FederatedExperiment:
             return None
 
     def run_all_experiments(self):
-        total = len(MODELS) * len(AGGREGATION_STRATEGIES) * len(PRIVACY_TECHNIQUES)
-        current = 1
+        # FedProx y SCAFFOLD solo se prueban con los modelos entrenados por gradiente, y
+        # los árboles solo sin privacidad diferencial (sus cargas se envían sin ella)
+        combinations = [(model_type, strategy, privacy) for model_type in MODELS
+                        for strategy in AGGREGATION_STRATEGIES for privacy in PRIVACY_TECHNIQUES
+                        if strategy_applies(model_type, strategy) and privacy_applies(model_type, privacy)]
+        total = len(combinations)
 
-        for model_type in MODELS:
-            for strategy in AGGREGATION_STRATEGIES:
-                for privacy in PRIVACY_TECHNIQUES:
-                    print(f"\nProgreso: {current}/{total}")
-                    self.run_experiment(model_type, strategy, privacy)
-                    current += 1
+        for current, (model_type, strategy, privacy) in enumerate(combinations, 1):
+            print(f"\nProgreso: {current}/{total}")
+            self.run_experiment(model_type, strategy, privacy)
 
         df = pd.DataFrame(self.results)
         df.to_csv(os.path.join(RESULTS_DIR, "resumen_resultados.csv"), index=False)
         print("\n✅ Benchmark generado correctamente.")
 
+    def run_successive_halving(self, search_space=SEARCH_SPACE, **kwargs):
+        """Búsqueda con successive halving sobre modelos, agregación, privacidad e hiperparámetros"""
+        trials = expand_search_space(MODELS, AGGREGATION_STRATEGIES, PRIVACY_TECHNIQUES, search_space,
+                                     applies=strategy_applies, privacy_applies=privacy_applies)
+        print(f"Búsqueda sobre {len(trials)} configuraciones")
+
+        def run_trial(trial, num_rounds, checkpoint_path, resume_path):
+            return self.run_experiment(
+                trial['model_type'], trial['aggregation_strategy'], trial['privacy_technique'],
+                num_rounds=num_rounds, model_params=trial['model_params'],
+                checkpoint_path=checkpoint_path, resume_path=resume_path)
+
+        scheduler = SuccessiveHalving(run_trial, **kwargs)
+        ranking = scheduler.run(trials)
+
+        pd.DataFrame(scheduler.history).to_csv(
+            os.path.join(RESULTS_DIR, "busqueda_escalones.csv"), index=False)
+        df = pd.DataFrame(ranking)
+        df.to_csv(os.path.join(RESULTS_DIR, "resumen_busqueda.csv"), index=False)
+        if ranking:
+            best = ranking[0]
+            print(f"\n🏆 Mejor configuración: {best['model_type']} | {best['aggregation_strategy']} | "
+                  f"{best['privacy_technique']} | {best['model_params']} (pérdida {best.get('loss')})")
+        return ranking
+
 
 if __name__ == "__main__":
-    experiment = FederatedExperiment()
-    experiment.run_all_experiments()
+    if "--personalized" in sys.argv:
+        # También forma parte de la clave de caché (PERSONALIZATION_CONFIG)
+        PERSONALIZATION_CONFIG['enabled'] = True
+        os.environ['FEDERATED_PERSONALIZATION'] = '1'
+    if "--hierarchical" in sys.argv:
+        # Agregación por grupos; entra en la clave de caché (HIERARCHICAL_CONFIG)
+        HIERARCHICAL_CONFIG['enabled'] = True
+        os.environ[HIERARCHICAL_ENV] = '1'
+    # Optimizador del servidor (--server-optimizer o FEDERATED_SERVER_OPTIMIZER); como la
+    # personalización, entra en la clave de caché vía SERVER_OPTIMIZER_CONFIG
+    optimizer = None
+    if "--server-optimizer" in sys.argv:
+        optimizer = sys.argv[sys.argv.index("--server-optimizer") + 1]
+    SERVER_OPTIMIZER_CONFIG['optimizer'] = server_optimizer_name(optimizer)
+    os.environ[SERVER_OPTIMIZER_ENV] = SERVER_OPTIMIZER_CONFIG['optimizer']
+    experiment = FederatedExperiment(use_cache="--no-cache" not in sys.argv,
+                                     precision="float32" if "--float32" in sys.argv else None)
+    if "--halving" in sys.argv:
+        experiment.run_successive_halving()
+    else:
+        experiment.run_all_experiments()
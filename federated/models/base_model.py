@@ -3,80 +3,136 @@ Modelos base para el aprendizaje federado
 """
 import numpy as np
 import time
-from sklearn.linear_model import LinearRegression, Ridge, Lasso, BayesianRidge
+from sklearn.linear_model import LinearRegression, Ridge, Lasso, BayesianRidge, SGDRegressor
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.neural_network import MLPRegressor
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.neighbors import KNeighborsRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.models.tree_ensemble import FlatForest, forest_to_arrays, is_forest_payload
+from federated.models.knn_prototypes import PrototypeIndex, compute_prototypes, is_prototype_payload
+from federated.utils.metrics import regression_metrics
+from federated.utils.precision import cast_parameters, get_dtype
+from config import TREE_FEDERATION_CONFIG, KNN_FEDERATION_CONFIG
+
+# Modelos lineales que se federan promediando coeficientes
+LINEAR_MODELS = ('ols', 'ridge', 'lasso', 'bayesian_ridge', 'sgd')
+# Modelos basados en árboles que se federan como ensambles
+TREE_MODELS = ('decision_tree', 'random_forest')
+# Modelos cuya carga no es un vector de parámetros (árboles y prototipos KNN)
+NON_PARAMETRIC_MODELS = TREE_MODELS + ('knn',)
+
+
+def privacy_applies(model_type: str, privacy: str) -> bool:
+    """Los bosques se envían sin privacidad diferencial: solo se prueban con 'none'"""
+    return privacy == 'none' or model_type not in TREE_MODELS
+
 
 class BaseModel:
     """Clase base para todos los modelos"""
 
-    def __init__(self, model_type='ridge', **kwargs):
+    def __init__(self, model_type='ridge', dtype=None, **kwargs):
         self.model_type = model_type
+        # Precisión de los parámetros enviados y de la inferencia
+        self.dtype = np.dtype(dtype) if dtype is not None else get_dtype()
         self.model = self._create_model(**kwargs)
         self.training_time = 0
         self.inference_time = 0
+        # Modelo global no paramétrico (bosque o prototipos KNN) recibido del servidor
+        self.global_model = None
 
     def _create_model(self, **kwargs):
         """Crear modelo según el tipo especificado"""
         if self.model_type == 'ols':
             return LinearRegression(**kwargs)
         elif self.model_type == 'ridge':
-            return Ridge(alpha=1.0, random_state=42, **kwargs)
+            kwargs.setdefault('alpha', 1.0)
+            kwargs.setdefault('random_state', 42)
+            return Ridge(**kwargs)
         elif self.model_type == 'lasso':
-            return Lasso(alpha=1.0, random_state=42, **kwargs)
+            kwargs.setdefault('alpha', 1.0)
+            kwargs.setdefault('random_state', 42)
+            return Lasso(**kwargs)
         elif self.model_type == 'random_forest':
-            return RandomForestRegressor(n_estimators=100, random_state=42, **kwargs)
+            kwargs.setdefault('n_estimators', 100)
+            kwargs.setdefault('random_state', 42)
+            return RandomForestRegressor(**kwargs)
         elif self.model_type == 'decision_tree':
-            return DecisionTreeRegressor(random_state=42, **kwargs)
+            kwargs.setdefault('random_state', 42)
+            return DecisionTreeRegressor(**kwargs)
         elif self.model_type == 'knn':
+            kwargs.setdefault('n_neighbors', KNN_FEDERATION_CONFIG['n_neighbors'])
             return KNeighborsRegressor(**kwargs)
         elif self.model_type == 'bayesian_ridge':
             return BayesianRidge(**kwargs)
+        elif self.model_type == 'sgd':
+            # En federado se entrena con federated/models/local_solvers.py desde el modelo global
+            kwargs.setdefault('random_state', 42)
+            return SGDRegressor(**kwargs)
         elif self.model_type == 'mlp':
-            return MLPRegressor(hidden_layer_sizes=(100, 50), max_iter=500, random_state=42, **kwargs)
+            kwargs['hidden_layer_sizes'] = tuple(kwargs.get('hidden_layer_sizes', (100, 50)))
+            kwargs.setdefault('max_iter', 500)
+            kwargs.setdefault('random_state', 42)
+            return MLPRegressor(**kwargs)
         else:
             raise ValueError(f"Tipo de modelo no soportado: {self.model_type}")
 
     def fit(self, X, y):
         """Entrenar el modelo"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         self.model.fit(X, y)
-        self.training_time = time.time() - start_time
+        self.training_time = time.perf_counter() - start_time
+        # Tras entrenar localmente se predice con el modelo local
+        self.global_model = None
         return self
 
+    def fit_local(self, solver, parameters, X, y, **kwargs):
+        """Entrenar por SGD local desde `parameters`; devuelve (parámetros, pasos)"""
+        start_time = time.perf_counter()
+        local_params, steps = solver.train(parameters, X, y, **kwargs)
+        self.training_time = time.perf_counter() - start_time
+        self.set_parameters(local_params)
+        self.global_model = None
+        return local_params, steps
+
     def predict(self, X):
         """Hacer predicciones"""
-        start_time = time.time()
-        predictions = self.model.predict(X)
-        self.inference_time = time.time() - start_time
+        start_time = time.perf_counter()
+        # Modelos guardados antes del modo de precisión no tienen dtype
+        X = np.asarray(X, dtype=getattr(self, 'dtype', None))
+        if getattr(self, 'global_model', None) is not None:
+            predictions = self.global_model.predict(X)
+        else:
+            predictions = self.model.predict(X)
+        self.inference_time = time.perf_counter() - start_time
         return predictions
 
     def evaluate(self, X, y):
         """Evaluar el modelo"""
         predictions = self.predict(X)
-        metrics = {
-            'mae': mean_absolute_error(y, predictions),
-            'mse': mean_squared_error(y, predictions),
-            'r2': r2_score(y, predictions),
-            'training_time': self.training_time,
-            'inference_time': self.inference_time
-        }
+        metrics = regression_metrics(y, predictions)
+        metrics['training_time'] = self.training_time
+        metrics['inference_time'] = self.inference_time
         return metrics
 
     def get_parameters(self):
         """Obtener parámetros del modelo para agregación federada"""
+        return cast_parameters(self._get_parameters(), self.dtype)
+
+    def _get_parameters(self):
+        if self.model_type in TREE_MODELS:
+            return self._get_forest_parameters()
+        if self.model_type == 'knn':
+            return self._get_prototype_parameters()
         if hasattr(self.model, 'coef_'):
             # Modelos lineales
             params = [self.model.coef_]
             if hasattr(self.model, 'intercept_'):
-                params.append(np.array([self.model.intercept_]))
+                # SGDRegressor guarda el sesgo como array de un elemento
+                params.append(np.atleast_1d(self.model.intercept_).copy())
             return params
-        elif hasattr(self.model, 'estimators_'):
-            # Random Forest - simplificado
-            return [np.array([1.0])]  # Placeholder
         elif hasattr(self.model, 'coefs_'):
             # MLP
             params = []
@@ -89,17 +145,85 @@ class BaseModel:
             return [np.array([1.0])]  # Fallback
 
     def set_parameters(self, parameters):
-        """Establecer parámetros del modelo desde agregación federada"""
+        """Establecer parámetros del modelo desde agregación federada (False si se ignoran)"""
         try:
-            if hasattr(self.model, 'coef_') and len(parameters) >= 1:
-                # Modelos lineales
+            parameters = cast_parameters(parameters, self.dtype)
+            if is_forest_payload(parameters):
+                # Ensamble global de árboles
+                self.global_model = FlatForest(parameters)
+            elif is_prototype_payload(parameters):
+                # Índice global de prototipos KNN
+                self.global_model = PrototypeIndex(
+                    parameters, n_neighbors=self.model.n_neighbors)
+            elif self.model_type in LINEAR_MODELS and len(parameters) >= 1:
+                # Modelos lineales (también sin entrenar: se materializa el estimador)
                 self.model.coef_ = parameters[0]
-                if len(parameters) > 1 and hasattr(self.model, 'intercept_'):
-                    self.model.intercept_ = parameters[1][0]
-            elif hasattr(self.model, 'coefs_') and len(parameters) >= 2:
-                # MLP
-                num_coefs = len(self.model.coefs_)
-                self.model.coefs_ = parameters[:num_coefs]
-                self.model.intercepts_ = parameters[num_coefs:]
+                self.model.intercept_ = parameters[1][0] if len(parameters) > 1 else 0.0
+                self.model.n_features_in_ = parameters[0].shape[-1]
+            elif self.model_type == 'mlp':
+                # MLP: primero los pesos de cada capa y después los sesgos. Las cargas
+                # que no encajan con la arquitectura local (p. ej. la inicial de la
+                # ronda 1) se ignoran sin tocar el estimador
+                if not self.mlp_compatible(parameters):
+                    return False
+                num_coefs = len(parameters) // 2
+                # Todos los atributos juntos: el estimador nunca queda a medio construir
+                self.model.coefs_ = list(parameters[:num_coefs])
+                self.model.intercepts_ = list(parameters[num_coefs:])
+                self.model.n_layers_ = num_coefs + 1
+                self.model.n_outputs_ = parameters[num_coefs - 1].shape[1]
+                self.model.out_activation_ = 'identity'
+                self.model.n_features_in_ = parameters[0].shape[0]
+            return True
         except Exception as e:
             print(f"Error estableciendo parámetros: {e}")
+            return False
+
+    def mlp_compatible(self, parameters):
+        """Indicar si una carga tiene las capas de la arquitectura del MLP local"""
+        hidden = list(self.model.hidden_layer_sizes)
+        num_coefs = len(parameters) // 2
+        if len(parameters) != 2 * (len(hidden) + 1):
+            return False
+        coefs, intercepts = parameters[:num_coefs], parameters[num_coefs:]
+        if any(np.ndim(c) != 2 for c in coefs):
+            return False
+        # Ya materializado (entrenado o con una carga anterior): mismas variables de entrada
+        n_features = getattr(self.model, 'n_features_in_', None)
+        if n_features is not None and coefs[0].shape[0] != n_features:
+            return False
+        if [c.shape[1] for c in coefs[:-1]] != hidden:
+            return False
+        if any(coefs[i + 1].shape[0] != coefs[i].shape[1] for i in range(num_coefs - 1)):
+            return False
+        return all(np.shape(b) == (c.shape[1],) for c, b in zip(coefs, intercepts))
+
+    def _get_forest_parameters(self):
+        """Serializar los árboles locales respetando el presupuesto por cliente"""
+        if hasattr(self.model, 'estimators_'):
+            estimators = self.model.estimators_
+        elif hasattr(self.model, 'tree_'):
+            estimators = [self.model]
+        elif isinstance(getattr(self, 'global_model', None), FlatForest):
+            return self.global_model.to_arrays()
+        else:
+            return [np.array([1.0])]  # Modelo sin entrenar
+
+        budget = TREE_FEDERATION_CONFIG['trees_per_client']
+        if budget is not None and len(estimators) > budget:
+            # Los árboles de un bosque son intercambiables: se envía una submuestra aleatoria
+            rng = np.random.default_rng(TREE_FEDERATION_CONFIG['seed'])
+            selected = np.sort(rng.choice(len(estimators), size=budget, replace=False))
+            estimators = [estimators[i] for i in selected]
+        return forest_to_arrays(estimators, self.model.n_features_in_)
+
+    def _get_prototype_parameters(self):
+        """Comprimir los datos locales del KNN en prototipos"""
+        if hasattr(self.model, '_fit_X'):
+            return compute_prototypes(self.model._fit_X, self.model._y,
+                                      KNN_FEDERATION_CONFIG['prototypes_per_client'],
+                                      seed=KNN_FEDERATION_CONFIG['seed'])
+        elif isinstance(getattr(self, 'global_model', None), PrototypeIndex):
+            return self.global_model.to_arrays()
+        else:
+            return [np.array([1.0])]  # Modelo sin entrenar
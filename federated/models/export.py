@@ -0,0 +1,213 @@
+"""
+Exportación del modelo global final de un experimento federado
+
+Cada parámetro se guarda como un .npy independiente (se carga con mmap sin
+copiar ni deserializar) junto con el preprocesador en arrays y un manifiesto
+JSON con el tipo de modelo, hiperparámetros, configuración, métricas y hash de
+los datos. Servir el modelo exportado usa exactamente los parámetros agregados
+en la última ronda, sin unpickle.
+
+Estructura de `<dir>/`:
+    manifest.json
+    param_00.npy, param_01.npy, ...
+    scaler_mean.npy, scaler_var.npy, scaler_scale.npy
+"""
+import os
+import json
+import time
+import shutil
+import numpy as np
+from typing import Dict, List, Optional
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.models.base_model import BaseModel
+from config import EXPORT_CONFIG, PROCESSED_DATA_DIR
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+SCALER_ARRAYS = ('mean', 'var', 'scale')
+
+
+def _json_value(value):
+    """Valores de numpy (p. ej. medias de imputación) como tipos nativos de JSON"""
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+
+def is_exported_model(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def read_manifest(model_dir: str) -> Dict:
+    with open(os.path.join(model_dir, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def export_model(model: BaseModel, output_dir: str, preprocessor: Optional[Dict] = None,
+                 metadata: Optional[Dict] = None, model_params: Optional[Dict] = None) -> str:
+    """Escribir un modelo (y su preprocesador) en formato exportado
+
+    Se escribe en un directorio temporal que sustituye al destino al final, de modo
+    que un servicio que lo esté leyendo nunca ve una exportación a medias.
+    """
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    parameters = model.get_parameters()
+    parameter_files = []
+    for i, array in enumerate(parameters):
+        name = f"param_{i:02d}.npy"
+        np.save(os.path.join(tmp_dir, name), np.ascontiguousarray(array))
+        parameter_files.append({'file': name, 'shape': list(array.shape), 'dtype': array.dtype.str})
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'model_type': model.model_type,
+        'model_params': model_params or {},
+        'precision': model.dtype.name,
+        'parameters': parameter_files,
+    }
+
+    if preprocessor is not None:
+        scaler = preprocessor['scaler']
+        for name in SCALER_ARRAYS:
+            np.save(os.path.join(tmp_dir, f"scaler_{name}.npy"), getattr(scaler, f"{name}_"))
+        manifest['preprocessor'] = {
+            'feature_names': [str(c) for c in getattr(scaler, 'feature_names_in_', [])],
+            'n_samples_seen': int(np.max(getattr(scaler, 'n_samples_seen_', 0))),
+            'label_encoders': {col: [str(c) for c in encoder.classes_]
+                               for col, encoder in preprocessor['label_encoders'].items()},
+            'fill_values': {col: _json_value(v) for col, v in preprocessor.get('fill_values', {}).items()},
+        }
+
+    manifest.update(metadata or {})
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, default=_json_value)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return output_dir
+
+
+def load_exported_model(model_dir: str, mmap: bool = True) -> BaseModel:
+    """Reconstruir el estimador desde los parámetros exportados (mmap por defecto)"""
+    manifest = read_manifest(model_dir)
+    mmap_mode = 'r' if mmap else None
+    parameters = [np.load(os.path.join(model_dir, entry['file']), mmap_mode=mmap_mode)
+                  for entry in manifest['parameters']]
+    model = BaseModel(manifest['model_type'], dtype=manifest['precision'], **manifest['model_params'])
+    model.set_parameters(parameters)
+    return model
+
+
+def load_exported_preprocessor(model_dir: str) -> Optional[Dict]:
+    """Preprocesador con la misma interfaz que preprocessor.pkl, sin unpickle"""
+    manifest = read_manifest(model_dir).get('preprocessor')
+    if manifest is None:
+        return None
+
+    label_encoders = {}
+    for col, classes in manifest['label_encoders'].items():
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(classes, dtype=object)
+        label_encoders[col] = encoder
+
+    scaler = StandardScaler()
+    for name in SCALER_ARRAYS:
+        setattr(scaler, f"{name}_", np.load(os.path.join(model_dir, f"scaler_{name}.npy")))
+    scaler.n_samples_seen_ = np.int64(manifest['n_samples_seen'])
+    scaler.n_features_in_ = len(scaler.mean_)
+    if manifest['feature_names']:
+        scaler.feature_names_in_ = np.array(manifest['feature_names'], dtype=object)
+
+    return {
+        'label_encoders': label_encoders,
+        'scaler': scaler,
+        'fill_values': manifest['fill_values'],
+    }
+
+
+def publish_model(model_dir: str, serving_dir: Optional[str] = None) -> str:
+    """Copiar una exportación como modelo de servicio (sustitución atómica)"""
+    serving_dir = serving_dir or EXPORT_CONFIG['serving_dir']
+    tmp_dir = f"{serving_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.copytree(model_dir, tmp_dir)
+    shutil.rmtree(serving_dir, ignore_errors=True)
+    os.replace(tmp_dir, serving_dir)
+    return serving_dir
+
+
+def publish_best_model(results_path: str, metric: str = 'loss') -> Optional[str]:
+    """Publicar la exportación del experimento con menor `metric` de un resumen de resultados"""
+    import pandas as pd
+
+    results = pd.read_csv(results_path)
+    if metric not in results.columns or 'model_dir' not in results.columns:
+        print(f"El resumen {results_path} no tiene las columnas '{metric}' y 'model_dir'")
+        return None
+    candidates = results[results['model_dir'].map(lambda d: isinstance(d, str) and is_exported_model(d))]
+    candidates = candidates.dropna(subset=[metric])
+    if candidates.empty:
+        print("Ningún experimento del resumen tiene un modelo exportado")
+        return None
+    best = candidates.loc[candidates[metric].idxmin()]
+    serving_dir = publish_model(best['model_dir'])
+    print(f"Modelo publicado: {best['model_dir']} ({metric} = {best[metric]:.4f}) -> {serving_dir}")
+    return serving_dir
+
+
+def beats_served_model(metrics: Optional[Dict], metric: str = 'loss',
+                       serving_dir: Optional[str] = None) -> bool:
+    """Indicar si un experimento mejora la `metric` del modelo que se sirve ahora"""
+    value = (metrics or {}).get(metric)
+    if value is None or not np.isfinite(value):
+        return False
+    serving_dir = serving_dir or EXPORT_CONFIG['serving_dir']
+    if not is_exported_model(serving_dir):
+        return True
+    served = read_manifest(serving_dir).get('metrics', {}).get(metric)
+    return served is None or value < served
+
+
+def export_federated_model(model_type: str, parameters: List[np.ndarray], run_id: str,
+                           model_params: Optional[Dict] = None, metrics: Optional[Dict] = None,
+                           data_dir: str = PROCESSED_DATA_DIR) -> Optional[str]:
+    """Exportar el modelo global de un experimento (y publicarlo si mejora al servido)"""
+    import joblib
+    from federated.utils.result_cache import EXPERIMENT_CONFIGS, ResultCache
+
+    try:
+        model = BaseModel(model_type, **(model_params or {}))
+        model.set_parameters(parameters)
+
+        preprocessor_path = os.path.join(data_dir, 'preprocessor.pkl')
+        preprocessor = joblib.load(preprocessor_path) if os.path.exists(preprocessor_path) else None
+        metadata = {
+            'run_id': run_id,
+            'data_hash': ResultCache(data_dir=data_dir).data_fingerprint(),
+            'config': EXPERIMENT_CONFIGS,
+            'metrics': metrics or {},
+        }
+        model_dir = export_model(model, os.path.join(EXPORT_CONFIG['dir'], run_id),
+                                 preprocessor, metadata, model_params)
+
+        print(f"Modelo exportado en {model_dir}")
+        # Con varios experimentos a la vez solo se publica el que mejora al servido;
+        # por defecto se publica al final con publish_best_model
+        if EXPORT_CONFIG['publish'] and beats_served_model(metrics, EXPORT_CONFIG['publish_metric']):
+            print(f"Modelo publicado: {publish_model(model_dir)}")
+        return model_dir
+    except Exception as e:
+        print(f"Error exportando el modelo final: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # python federated/models/export.py <resumen_resultados.csv>: publicar el mejor experimento
+    from config import RESULTS_DIR
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    published = publish_best_model(paths[0] if paths else os.path.join(RESULTS_DIR, 'resumen_resultados.csv'))
+    sys.exit(0 if published else 1)
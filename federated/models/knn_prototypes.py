@@ -0,0 +1,85 @@
+"""
+KNN federado mediante prototipos comprimidos (centroides con objetivo promedio)
+"""
+import numpy as np
+from typing import List, Optional
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.neighbors import KDTree
+
+# Marca que identifica una carga de parámetros con prototipos KNN
+PROTOTYPE_MAGIC = 7302
+# Posición de cada array dentro de la carga
+PROTOTYPE_META, PROTOTYPE_CENTROIDS, PROTOTYPE_TARGETS, PROTOTYPE_COUNTS = range(4)
+
+
+def is_prototype_payload(parameters: List[np.ndarray]) -> bool:
+    """Indicar si la lista de parámetros contiene prototipos KNN"""
+    return (len(parameters) == 4 and parameters[PROTOTYPE_META].ndim == 1 and
+            parameters[PROTOTYPE_META].size == 3 and
+            int(parameters[PROTOTYPE_META][0]) == PROTOTYPE_MAGIC)
+
+
+def _to_arrays(centroids: np.ndarray, targets: np.ndarray, counts: np.ndarray) -> List[np.ndarray]:
+    meta = np.array([PROTOTYPE_MAGIC, len(centroids), centroids.shape[1]], dtype=np.int64)
+    return [meta, centroids, targets, counts]
+
+
+def compute_prototypes(X: np.ndarray, y: np.ndarray, n_prototypes: int,
+                       seed: int = 42) -> List[np.ndarray]:
+    """Resumir los datos locales en centroides k-means con su objetivo promedio"""
+    n_clusters = min(n_prototypes, len(X))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, n_init=3,
+                             batch_size=max(1024, 4 * n_clusters))
+    labels = kmeans.fit_predict(X)
+
+    counts = np.bincount(labels, minlength=n_clusters).astype(np.float64)
+    sums = np.bincount(labels, weights=y, minlength=n_clusters)
+    used = counts > 0
+
+    targets = sums[used] / counts[used]
+    return _to_arrays(kmeans.cluster_centers_[used], targets, counts[used])
+
+
+def merge_prototype_arrays(payloads: List[List[np.ndarray]],
+                           max_prototypes: Optional[int] = None,
+                           seed: int = 42) -> List[np.ndarray]:
+    """Unir los prototipos de todos los clientes en un único índice global"""
+    centroids = np.concatenate([p[PROTOTYPE_CENTROIDS] for p in payloads])
+    targets = np.concatenate([p[PROTOTYPE_TARGETS] for p in payloads])
+    counts = np.concatenate([p[PROTOTYPE_COUNTS] for p in payloads])
+
+    if max_prototypes is not None and len(centroids) > max_prototypes:
+        # Recomprimir con k-means ponderado por el tamaño de cada prototipo
+        kmeans = KMeans(n_clusters=max_prototypes, random_state=seed, n_init=3)
+        labels = kmeans.fit_predict(centroids, sample_weight=counts)
+        merged_counts = np.bincount(labels, weights=counts, minlength=max_prototypes)
+        merged_sums = np.bincount(labels, weights=counts * targets, minlength=max_prototypes)
+        used = merged_counts > 0
+        centroids = kmeans.cluster_centers_[used]
+        targets = merged_sums[used] / merged_counts[used]
+        counts = merged_counts[used]
+
+    return _to_arrays(centroids, targets, counts)
+
+
+class PrototypeIndex:
+    """Índice KD-tree sobre los prototipos globales para inferencia KNN"""
+
+    def __init__(self, parameters: List[np.ndarray], n_neighbors: int = 5):
+        self.centroids = np.asarray(parameters[PROTOTYPE_CENTROIDS], dtype=np.float64)
+        self.targets = np.asarray(parameters[PROTOTYPE_TARGETS], dtype=np.float64)
+        # El ruido de privacidad no debe producir pesos negativos
+        self.counts = np.maximum(np.asarray(parameters[PROTOTYPE_COUNTS], dtype=np.float64), 1.0)
+        self.n_features_in_ = self.centroids.shape[1]
+        self.n_neighbors = min(n_neighbors, len(self.centroids))
+        self.tree = KDTree(self.centroids)
+
+    def to_arrays(self) -> List[np.ndarray]:
+        """Serializar los prototipos para su transferencia"""
+        return _to_arrays(self.centroids, self.targets, self.counts)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Promedio de los k prototipos más cercanos ponderado por su tamaño"""
+        _, neighbors = self.tree.query(np.asarray(X, dtype=np.float64), k=self.n_neighbors)
+        weights = self.counts[neighbors]
+        return (weights * self.targets[neighbors]).sum(axis=1) / weights.sum(axis=1)
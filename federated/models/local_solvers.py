@@ -0,0 +1,171 @@
+"""
+Entrenamiento local por SGD a partir del modelo global (modelos por gradiente)
+
+sklearn reentrena desde cero en cada `fit`, de modo que el modelo global solo
+sirve para evaluar. Aquí el cliente parte de los parámetros globales y da
+`local_epochs` épocas de SGD por mini-lotes, con las correcciones de deriva:
+
+- FedProx: gradiente + mu·(w - w_global)
+- SCAFFOLD: gradiente + (c - c_i), con c y c_i las variables de control del
+  servidor y del cliente
+
+Los parámetros siguen el formato de BaseModel: [coef, intercept] para la
+regresión lineal y [W_1..W_L, b_1..b_L] para el MLP.
+
+El Score no está escalado (300-850): el SGD trabaja con el objetivo
+estandarizado con la media y desviación locales, lo que equivale a
+reparametrizar la capa de salida (W_L/σ, (b_L - μ)/σ). Parámetros, anclas y
+controles entran y salen en las unidades originales.
+"""
+import os
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.models.personalization import ACTIVATIONS
+from config import CLIENT_DRIFT_CONFIG
+
+# Modelos que se entrenan localmente por gradiente
+GRADIENT_MODELS = ('sgd', 'mlp')
+# Estrategias que corrigen la deriva de clientes durante el entrenamiento local
+DRIFT_STRATEGIES = ('fedprox', 'scaffold')
+
+# Derivada de cada activación expresada en función de su salida
+ACTIVATION_DERIVATIVES = {
+    'identity': lambda a: np.ones_like(a),
+    'relu': lambda a: (a > 0).astype(a.dtype),
+    'tanh': lambda a: 1.0 - a ** 2,
+    'logistic': lambda a: a * (1.0 - a),
+}
+
+
+def uses_local_solver(model_type: str, strategy: Optional[str]) -> bool:
+    """sgd siempre entrena por SGD local; el MLP solo con FedProx o SCAFFOLD"""
+    return model_type == 'sgd' or (model_type in GRADIENT_MODELS and strategy in DRIFT_STRATEGIES)
+
+
+def strategy_applies(model_type: str, strategy: str) -> bool:
+    """FedProx y SCAFFOLD solo tienen sentido en modelos entrenados por gradiente"""
+    return strategy not in DRIFT_STRATEGIES or model_type in GRADIENT_MODELS
+
+
+def compatible(parameters: Sequence[np.ndarray], reference: Sequence[np.ndarray]) -> bool:
+    return len(parameters) == len(reference) and \
+        all(p.shape == r.shape for p, r in zip(parameters, reference))
+
+
+def init_parameters(model_type: str, n_features: int, hidden_layer_sizes: Sequence[int] = (),
+                    activation: str = 'relu', seed: int = 42) -> List[np.ndarray]:
+    """Parámetros iniciales comunes a todos los clientes (misma semilla)
+
+    El MLP usa la inicialización de Glorot de sklearn, de modo que todos los
+    clientes promedian redes con las mismas unidades de partida.
+    """
+    if model_type == 'sgd':
+        return [np.zeros(n_features), np.zeros(1)]
+    rng = np.random.default_rng(seed)
+    sizes = [n_features, *hidden_layer_sizes, 1]
+    factor = 2.0 if activation == 'logistic' else 6.0
+    coefs, intercepts = [], []
+    for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+        bound = np.sqrt(factor / (fan_in + fan_out))
+        coefs.append(rng.uniform(-bound, bound, (fan_in, fan_out)))
+        intercepts.append(rng.uniform(-bound, bound, fan_out))
+    return coefs + intercepts
+
+
+def _output_layer(parameters: Sequence[np.ndarray]) -> Tuple[int, int]:
+    """Índices de los pesos y el sesgo de la capa de salida (también [coef, intercept])"""
+    return len(parameters) // 2 - 1, len(parameters) - 1
+
+
+def scale_parameters(parameters: List[np.ndarray], center: float, scale: float) -> List[np.ndarray]:
+    """Parámetros para el objetivo (y - center) / scale"""
+    weights, bias = _output_layer(parameters)
+    scaled = list(parameters)
+    scaled[weights] = parameters[weights] / scale
+    scaled[bias] = (parameters[bias] - center) / scale
+    return scaled
+
+
+def unscale_parameters(parameters: List[np.ndarray], center: float, scale: float) -> List[np.ndarray]:
+    weights, bias = _output_layer(parameters)
+    unscaled = list(parameters)
+    unscaled[weights] = parameters[weights] * scale
+    unscaled[bias] = parameters[bias] * scale + center
+    return unscaled
+
+
+def gradients(model_type: str, parameters: List[np.ndarray], X: np.ndarray, y: np.ndarray,
+              alpha: float = 0.0, activation: str = 'relu') -> List[np.ndarray]:
+    """Gradiente de 1/2·MSE + alpha/2·||W||² (misma pérdida que sklearn) en un mini-lote"""
+    n = len(X)
+    if model_type == 'sgd':
+        coef, intercept = parameters
+        residuals = X @ coef + intercept[0] - y
+        return [X.T @ residuals / n + alpha * coef, np.array([residuals.mean()])]
+
+    num_layers = len(parameters) // 2
+    coefs, intercepts = parameters[:num_layers], parameters[num_layers:]
+    activations = [X]
+    for i, (coef, intercept) in enumerate(zip(coefs, intercepts)):
+        z = activations[-1] @ coef + intercept
+        activations.append(z if i == num_layers - 1 else ACTIVATIONS[activation](z))
+
+    delta = (activations[-1] - y.reshape(-1, 1)) / n
+    coef_grads, intercept_grads = [None] * num_layers, [None] * num_layers
+    for i in range(num_layers - 1, -1, -1):
+        # sklearn regulariza con alpha / n_samples del lote sobre la suma de pesos
+        coef_grads[i] = activations[i].T @ delta + alpha * coefs[i] / n
+        intercept_grads[i] = delta.sum(axis=0)
+        if i > 0:
+            delta = (delta @ coefs[i].T) * ACTIVATION_DERIVATIVES[activation](activations[i])
+    return coef_grads + intercept_grads
+
+
+class LocalSolver:
+    """SGD por mini-lotes desde el modelo global con corrección de deriva opcional"""
+
+    def __init__(self, model_type: str, **kwargs):
+        self.model_type = model_type
+        self.learning_rate = kwargs.get('learning_rate', CLIENT_DRIFT_CONFIG['learning_rate'][model_type])
+        self.batch_size = kwargs.get('batch_size', CLIENT_DRIFT_CONFIG['batch_size'])
+        self.local_epochs = kwargs.get('local_epochs', CLIENT_DRIFT_CONFIG['local_epochs'])
+        self.seed = kwargs.get('seed', CLIENT_DRIFT_CONFIG['seed'])
+        self.alpha = kwargs.get('alpha', 0.0)
+        self.activation = kwargs.get('activation', 'relu')
+
+    def train(self, parameters: List[np.ndarray], X: np.ndarray, y: np.ndarray,
+              mu: float = 0.0, correction: Optional[List[np.ndarray]] = None,
+              seed: int = 0) -> Tuple[List[np.ndarray], int]:
+        """Entrenar desde `parameters`; devuelve los parámetros locales y los pasos dados
+
+        `mu` > 0 añade el término proximal de FedProx respecto a `parameters`;
+        `correction` (c - c_i en SCAFFOLD) se suma a cada gradiente.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # Objetivo estandarizado: con el Score en bruto el MLP diverge en la primera época
+        center = float(y.mean())
+        scale = float(y.std()) or 1.0
+        y = (y - center) / scale
+        anchor = scale_parameters([np.array(p, dtype=np.float64) for p in parameters], center, scale)
+        current = [p.copy() for p in anchor]
+        if correction is not None:
+            # Los controles son incrementos de parámetros: solo cambian de escala
+            correction = scale_parameters([np.asarray(c, dtype=np.float64) for c in correction], 0.0, scale)
+        rng = np.random.default_rng([self.seed, seed])
+        steps = 0
+        for _ in range(self.local_epochs):
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                grads = gradients(self.model_type, current, X[batch], y[batch], self.alpha, self.activation)
+                for i, grad in enumerate(grads):
+                    if mu:
+                        grad = grad + mu * (current[i] - anchor[i])
+                    if correction is not None:
+                        grad = grad + correction[i]
+                    current[i] -= self.learning_rate * grad
+                steps += 1
+        return unscale_parameters(current, center, scale), steps
@@ -0,0 +1,151 @@
+"""
+Personalización por cliente sobre el modelo global
+
+- Modelos lineales: interpolación w·global + (1 - w)·local, con el peso w que
+  minimiza el error sobre la parte reservada de los datos del cliente (solución
+  cerrada). El modelo local y el peso se guardan en el estado del cliente.
+- MLP: las capas ocultas (cuerpo) son las globales y la capa de salida (cabeza)
+  es propia de cada cliente. La cabeza se ajusta por ridge en forma cerrada sobre
+  las activaciones del cuerpo global, regularizada hacia la cabeza anterior, sin
+  reentrenar la red.
+"""
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import PERSONALIZATION_CONFIG
+
+# Modo de personalización de cada tipo de modelo (los demás usan el modelo global)
+PERSONALIZATION_MODES = {
+    'ols': 'interpolation',
+    'ridge': 'interpolation',
+    'lasso': 'interpolation',
+    'sgd': 'interpolation',
+    'bayesian_ridge': 'interpolation',
+    'mlp': 'head',
+}
+
+ACTIVATIONS = {
+    'identity': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0),
+    'tanh': np.tanh,
+    'logistic': lambda z: 1.0 / (1.0 + np.exp(-z)),
+}
+
+
+def personalization_enabled() -> bool:
+    return PERSONALIZATION_CONFIG['enabled'] or os.environ.get('FEDERATED_PERSONALIZATION') == '1'
+
+
+def _pack(prefix: str, arrays: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    return {f"{prefix}_{i}": np.asarray(a) for i, a in enumerate(arrays)}
+
+
+def _unpack(state: Dict[str, np.ndarray], prefix: str) -> List[np.ndarray]:
+    count = sum(1 for name in state if name.startswith(f"{prefix}_"))
+    return [state[f"{prefix}_{i}"] for i in range(count)]
+
+
+def linear_predict(parameters: List[np.ndarray], X: np.ndarray) -> np.ndarray:
+    intercept = parameters[1][0] if len(parameters) > 1 else 0.0
+    return X @ np.ravel(parameters[0]) + intercept
+
+
+def interpolation_weight(pred_global: np.ndarray, pred_local: np.ndarray, y: np.ndarray) -> float:
+    """Peso w en [0, 1] que minimiza ||y - (w·global + (1 - w)·local)||²"""
+    diff = pred_global - pred_local
+    denom = float(diff @ diff)
+    if denom == 0.0:
+        return 1.0
+    return float(np.clip((y - pred_local) @ diff / denom, 0.0, 1.0))
+
+
+def mlp_body(parameters: List[np.ndarray], X: np.ndarray, activation: str = 'relu') -> np.ndarray:
+    """Activaciones de la última capa oculta (pesos primero, sesgos después)"""
+    num_coefs = len(parameters) // 2
+    hidden = X
+    for coef, intercept in zip(parameters[:num_coefs - 1], parameters[num_coefs:-1]):
+        hidden = ACTIVATIONS[activation](hidden @ coef + intercept)
+    return hidden
+
+
+def fit_head(hidden: np.ndarray, y: np.ndarray, alpha: float,
+             prior: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Ridge en forma cerrada de la capa de salida, regularizado hacia `prior`
+
+    Resuelve min ||[H 1]·w - y||² + alpha·||w_H - w_prior||² sin penalizar el sesgo.
+    """
+    hidden = np.asarray(hidden, dtype=np.float64)
+    n_hidden = hidden.shape[1]
+    design = np.hstack([hidden, np.ones((len(hidden), 1))])
+    penalty = np.diag(np.r_[np.full(n_hidden, alpha), 0.0])
+    target = design.T @ np.asarray(y, dtype=np.float64)
+    if prior is not None:
+        target[:n_hidden] += alpha * np.ravel(prior[0])
+    solution = np.linalg.solve(design.T @ design + penalty, target)
+    return solution[:n_hidden].reshape(n_hidden, 1), solution[n_hidden:]
+
+
+def _compatible(global_params: List[np.ndarray], reference: List[np.ndarray]) -> bool:
+    return len(global_params) == len(reference) and \
+        all(g.shape == r.shape for g, r in zip(global_params, reference))
+
+
+class Personalizer:
+    """Parámetros personales de un cliente a partir del modelo global y su estado"""
+
+    def __init__(self, model_type: str, **kwargs):
+        self.model_type = model_type
+        self.mode = PERSONALIZATION_MODES.get(model_type)
+        self.head_alpha = kwargs.get('head_alpha', PERSONALIZATION_CONFIG['head_alpha'])
+        self.activation = kwargs.get('activation', 'relu')
+
+    def update(self, global_params: List[np.ndarray], state: Optional[Dict[str, np.ndarray]],
+               X: np.ndarray, y: np.ndarray,
+               local_params: Optional[List[np.ndarray]] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Actualizar el estado personal con los datos reservados del cliente
+
+        `local_params` (modelo recién entrenado en local) solo se pasa en fit; en
+        evaluate se reutiliza el del estado.
+        """
+        if self.mode == 'interpolation':
+            local = local_params if local_params is not None else (_unpack(state, 'local') if state else None)
+            if not local:
+                return state
+            # Sin modelo global válido (primera ronda) se usa solo el local
+            weight = 0.0
+            if _compatible(global_params, local):
+                weight = interpolation_weight(linear_predict(global_params, X),
+                                              linear_predict(local, X), y)
+            return {**_pack('local', local), 'weight': np.array(weight)}
+
+        if self.mode == 'head':
+            if len(global_params) < 4 or global_params[0].shape[0] != X.shape[1]:
+                return state
+            prior = (state['head_coef'], state['head_intercept']) if state else None
+            hidden = mlp_body(global_params, X, self.activation)
+            if prior is not None and prior[0].shape[0] != hidden.shape[1]:
+                prior = None
+            head_coef, head_intercept = fit_head(hidden, y, self.head_alpha, prior)
+            return {'head_coef': head_coef, 'head_intercept': head_intercept}
+        return state
+
+    def apply(self, global_params: List[np.ndarray],
+              state: Optional[Dict[str, np.ndarray]]) -> List[np.ndarray]:
+        """Parámetros personales (el modelo global si no hay estado aplicable)"""
+        if not state:
+            return global_params
+        if self.mode == 'interpolation':
+            local = _unpack(state, 'local')
+            weight = float(state['weight'])
+            if not _compatible(global_params, local):
+                return local
+            return [weight * g + (1.0 - weight) * l for g, l in zip(global_params, local)]
+        if self.mode == 'head':
+            num_coefs = len(global_params) // 2
+            if num_coefs < 2 or global_params[num_coefs - 1].shape[0] != state['head_coef'].shape[0]:
+                return global_params
+            return (list(global_params[:num_coefs - 1]) + [state['head_coef']] +
+                    list(global_params[num_coefs:-1]) + [state['head_intercept']])
+        return global_params
@@ -0,0 +1,163 @@
+"""
+Representación compacta en arrays de ensambles de árboles para aprendizaje federado
+"""
+import numpy as np
+from typing import List, Optional
+
+# Marca que identifica una carga de parámetros con formato de bosque
+FOREST_MAGIC = 7301
+# Posición de cada array dentro de la carga
+FOREST_META, FOREST_FEATURE, FOREST_THRESHOLD, FOREST_LEFT, FOREST_RIGHT, FOREST_VALUE = range(6)
+
+# Valor de hoja en children_left / children_right (igual que sklearn)
+TREE_LEAF = -1
+
+
+def is_forest_payload(parameters: List[np.ndarray]) -> bool:
+    """Indicar si la lista de parámetros contiene un bosque serializado"""
+    return (len(parameters) == 6 and parameters[FOREST_META].ndim == 1 and
+            parameters[FOREST_META].size >= 3 and
+            int(parameters[FOREST_META][0]) == FOREST_MAGIC)
+
+
+def forest_to_arrays(estimators, n_features: int) -> List[np.ndarray]:
+    """Aplanar árboles de sklearn en arrays de nodos con índices globales"""
+    offsets = [0]
+    features, thresholds, lefts, rights, values = [], [], [], [], []
+
+    for estimator in estimators:
+        tree = estimator.tree_
+        offset = offsets[-1]
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left == TREE_LEAF
+
+        features.append(tree.feature.astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, TREE_LEAF, left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, TREE_LEAF, right + offset).astype(np.int32))
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        offsets.append(offset + tree.node_count)
+
+    meta = np.array([FOREST_MAGIC, len(offsets) - 1, n_features] + offsets, dtype=np.int64)
+    return [
+        meta,
+        np.concatenate(features),
+        np.concatenate(thresholds),
+        np.concatenate(lefts),
+        np.concatenate(rights),
+        np.concatenate(values),
+    ]
+
+
+def merge_forest_arrays(forests: List[List[np.ndarray]],
+                        tree_counts: Optional[List[int]] = None) -> List[np.ndarray]:
+    """Unir varios bosques serializados, opcionalmente tomando solo los primeros árboles de cada uno"""
+    parts = []
+    n_features = int(forests[0][FOREST_META][2])
+
+    for i, forest in enumerate(forests):
+        offsets = forest[FOREST_META][3:]
+        n_trees = len(offsets) - 1
+        keep = n_trees if tree_counts is None else min(n_trees, tree_counts[i])
+        if keep <= 0:
+            continue
+        end = int(offsets[keep])
+        parts.append((forest, end, offsets[:keep + 1]))
+
+    offsets = [0]
+    arrays = {idx: [] for idx in range(FOREST_FEATURE, FOREST_VALUE + 1)}
+    for forest, end, forest_offsets in parts:
+        shift = offsets[-1]
+        for idx in arrays:
+            array = forest[idx][:end]
+            if idx in (FOREST_LEFT, FOREST_RIGHT):
+                array = np.where(array == TREE_LEAF, TREE_LEAF, array + shift).astype(np.int32)
+            arrays[idx].append(array)
+        offsets.extend((forest_offsets[1:] + shift).tolist())
+
+    meta = np.array([FOREST_MAGIC, len(offsets) - 1, n_features] + offsets, dtype=np.int64)
+    return [meta] + [np.concatenate(arrays[idx]) for idx in range(FOREST_FEATURE, FOREST_VALUE + 1)]
+
+
+class FlatForest:
+    """Bosque de regresión en arrays planos con inferencia vectorizada"""
+
+    def __init__(self, parameters: List[np.ndarray], batch_size: int = 65536):
+        meta = parameters[FOREST_META]
+        self.n_trees = int(meta[1])
+        self.n_features_in_ = int(meta[2])
+        self.roots = meta[3:-1].astype(np.int64)
+        self.feature = parameters[FOREST_FEATURE]
+        self.threshold = parameters[FOREST_THRESHOLD]
+        self.children_left = parameters[FOREST_LEFT]
+        self.children_right = parameters[FOREST_RIGHT]
+        self.value = parameters[FOREST_VALUE]
+        self.batch_size = batch_size
+
+        # Las hojas apuntan a sí mismas para recorrer todos los árboles en bloque
+        is_leaf = self.children_left == TREE_LEAF
+        node_ids = np.arange(len(self.feature), dtype=np.int64)
+        self._left = np.where(is_leaf, node_ids, self.children_left).astype(np.int64)
+        self._right = np.where(is_leaf, node_ids, self.children_right).astype(np.int64)
+        self._feature = np.where(is_leaf, 0, self.feature).astype(np.int64)
+        self._is_leaf = is_leaf
+
+    def to_arrays(self) -> List[np.ndarray]:
+        """Serializar el bosque para su transferencia"""
+        meta = np.array([FOREST_MAGIC, self.n_trees, self.n_features_in_] +
+                        self.roots.tolist() + [len(self.feature)], dtype=np.int64)
+        return [meta, self.feature, self.threshold, self.children_left,
+                self.children_right, self.value]
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Índice de la hoja alcanzada por cada muestra en cada árbol"""
+        # sklearn compara en float32; se replica para obtener las mismas hojas
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+
+        active = ~self._is_leaf[nodes]
+        while active.any():
+            go_left = X[rows, self._feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+            active = ~self._is_leaf[nodes]
+        return nodes
+
+    def predict_contributions(self, X: np.ndarray):
+        """Predicción y contribución de cada variable por fila (Saabas)
+
+        Al bajar por cada árbol, el cambio del valor medio del nodo se atribuye a
+        la variable de la división; sesgo + suma de contribuciones = predicción.
+        """
+        X32 = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X32.shape
+        # Pares (fila, árbol) aplanados; solo se siguen los que aún no están en una hoja
+        pair_rows = np.repeat(np.arange(n_rows), self.n_trees)
+        nodes = np.tile(self.roots, n_rows)
+        contributions = np.zeros(n_rows * n_features)
+
+        active = np.flatnonzero(~self._is_leaf[nodes])
+        while len(active):
+            current = nodes[active]
+            rows = pair_rows[active]
+            features = self._feature[current]
+            go_left = X32[rows, features] <= self.threshold[current]
+            children = np.where(go_left, self._left[current], self._right[current])
+            contributions += np.bincount(rows * n_features + features,
+                                         weights=self.value[children] - self.value[current],
+                                         minlength=n_rows * n_features)
+            nodes[active] = children
+            active = active[~self._is_leaf[children]]
+
+        predictions = self.value[nodes].reshape(n_rows, self.n_trees).mean(axis=1)
+        return predictions, contributions.reshape(n_rows, n_features) / self.n_trees
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predicción promedio del ensamble, procesada por lotes de filas"""
+        X = np.asarray(X)
+        predictions = np.empty(X.shape[0], dtype=self.value.dtype)
+        for start in range(0, X.shape[0], self.batch_size):
+            batch = X[start:start + self.batch_size]
+            predictions[start:start + len(batch)] = self.value[self.apply(batch)].mean(axis=1)
+        return predictions
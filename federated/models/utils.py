@@ -1,5 +1,6 @@
 import os
 import json
+import numpy as np
 from config import RESULTS_DIR
 
 def save_federated_metrics(model_type, strategy, privacy, metrics):
@@ -8,3 +9,43 @@ def save_federated_metrics(model_type, strategy, privacy, metrics):
     filepath = os.path.join(RESULTS_DIR, filename)
     with open(filepath, "w") as f:
         json.dump(metrics, f, indent=4)
+
+def save_last_metrics(metrics):
+    """Guardar métricas del último experimento para FederatedExperiment"""
+    filepath = os.path.join(RESULTS_DIR, "last_metrics.json")
+    with open(filepath, "w") as f:
+        json.dump(metrics, f)
+
+def save_checkpoint(path, parameters, server_round, optimizer_state=None, server_control=None):
+    """Guardar los parámetros globales de una ronda para poder reanudar el entrenamiento
+
+    `optimizer_state` (momentos del optimizador del servidor) se guarda con prefijo `opt_`
+    y `server_control` (control del servidor de SCAFFOLD) con prefijo `ctrl_`.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    arrays = {f"param_{i}": p for i, p in enumerate(parameters)}
+    arrays.update({f"opt_{name}": value for name, value in (optimizer_state or {}).items()})
+    arrays.update({f"ctrl_{i}": c for i, c in enumerate(server_control or [])})
+    with open(tmp_path, "wb") as f:
+        np.savez(f, server_round=np.array(server_round), **arrays)
+    # Reemplazo atómico: un lector nunca ve un checkpoint a medio escribir
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """Cargar parámetros globales y ronda de un checkpoint"""
+    with np.load(path) as data:
+        num_params = len([k for k in data.files if k.startswith("param_")])
+        parameters = [data[f"param_{i}"] for i in range(num_params)]
+        return parameters, int(data["server_round"])
+
+def load_optimizer_state(path):
+    """Estado del optimizador del servidor guardado en un checkpoint (vacío si no hay)"""
+    with np.load(path) as data:
+        return {k[len("opt_"):]: data[k] for k in data.files if k.startswith("opt_")}
+
+def load_server_control(path):
+    """Control del servidor de SCAFFOLD guardado en un checkpoint (None si no hay)"""
+    with np.load(path) as data:
+        count = len([k for k in data.files if k.startswith("ctrl_")])
+        return [data[f"ctrl_{i}"] for i in range(count)] or None
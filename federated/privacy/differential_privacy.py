@@ -6,83 +6,150 @@ from typing import List, Tuple
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from config import PRIVACY_CONFIG
+from federated.privacy.accountant import RDPAccountant
+from federated.models.knn_prototypes import (PROTOTYPE_CENTROIDS, PROTOTYPE_COUNTS, PROTOTYPE_TARGETS,
+                                             compute_prototypes)
+from federated.utils.tracing import span
+from config import PRIVACY_CONFIG, KNN_FEDERATION_CONFIG
+
+# Mecanismos gaussianos por ronda de los prototipos KNN (recuentos, centroides y objetivos)
+PROTOTYPE_RELEASES = 3
 
 class DifferentialPrivacy:
     """Clase para aplicar técnicas de privacidad diferencial"""
-    
-    def __init__(self, technique='none', **kwargs):
+
+    def __init__(self, technique='none', client_id=0, **kwargs):
         self.technique = technique
+        self.client_id = client_id
         self.clipping_norm = kwargs.get('clipping_norm', PRIVACY_CONFIG['clipping_norm'])
         self.noise_multiplier = kwargs.get('noise_multiplier', PRIVACY_CONFIG['noise_multiplier'])
         self.epsilon = kwargs.get('epsilon', PRIVACY_CONFIG['epsilon'])
         self.delta = kwargs.get('delta', PRIVACY_CONFIG['delta'])
-        
-    def apply_privacy(self, parameters: List[np.ndarray]) -> List[np.ndarray]:
+        self.seed = kwargs.get('seed', PRIVACY_CONFIG['seed'])
+        self.feature_bound = kwargs.get('feature_bound', KNN_FEDERATION_CONFIG['feature_bound'])
+        self.target_range = kwargs.get('target_range', KNN_FEDERATION_CONFIG['target_range'])
+
+    @property
+    def noise_scale(self) -> float:
+        """Desviación estándar del ruido gaussiano"""
+        return self.noise_multiplier * self.clipping_norm / self.epsilon
+
+    @property
+    def effective_noise_multiplier(self) -> float:
+        """Ruido relativo a la sensibilidad (norma de clipping) para el contador RDP"""
+        return self.noise_scale / self.clipping_norm
+
+    def _generator(self, server_round: int) -> np.random.Generator:
+        """Flujo aleatorio propio de cada cliente y ronda: reproducible e independiente
+        aunque los clientes se ejecuten en paralelo"""
+        return np.random.default_rng(np.random.SeedSequence([self.seed, self.client_id, server_round]))
+
+    def apply_privacy(self, parameters: List[np.ndarray], server_round: int = 0) -> List[np.ndarray]:
         """Aplicar técnica de privacidad diferencial a los parámetros"""
         if self.technique == 'none':
             return parameters
-        elif self.technique == 'clipping':
-            return self._apply_clipping(parameters)
-        elif self.technique == 'noising':
-            return self._apply_noising(parameters)
-        elif self.technique == 'clipping_noising':
-            clipped_params = self._apply_clipping(parameters)
-            return self._apply_noising(clipped_params)
-        else:
+        if self.technique not in ('clipping', 'noising', 'clipping_noising'):
             raise ValueError(f"Técnica de privacidad no soportada: {self.technique}")
-    
-    def _apply_clipping(self, parameters: List[np.ndarray]) -> List[np.ndarray]:
-        """Aplicar gradient clipping"""
-        clipped_params = []
-        
-        for param in parameters:
-            # Calcular norma L2
-            param_norm = np.linalg.norm(param)
-            
-            # Aplicar clipping si es necesario
-            if param_norm > self.clipping_norm:
-                clipped_param = param * (self.clipping_norm / param_norm)
-            else:
-                clipped_param = param.copy()
-                
-            clipped_params.append(clipped_param)
-            
-        return clipped_params
-    
-    def _apply_noising(self, parameters: List[np.ndarray]) -> List[np.ndarray]:
-        """Aplicar ruido gaussiano"""
-        noisy_params = []
-        
-        for param in parameters:
-            # Calcular escala del ruido basada en sensibilidad
-            noise_scale = self.noise_multiplier * self.clipping_norm / self.epsilon
-            
-            # Generar ruido gaussiano
-            noise = np.random.normal(0, noise_scale, param.shape)
-            
-            # Añadir ruido
-            noisy_param = param + noise
-            noisy_params.append(noisy_param)
-            
-        return noisy_params
-    
-    def calculate_privacy_budget(self, num_rounds: int) -> Tuple[float, float]:
-        """Calcular presupuesto de privacidad total"""
-        if self.technique in ['noising', 'clipping_noising']:
-            # Composición simple para múltiples rondas
-            total_epsilon = self.epsilon * num_rounds
-            total_delta = self.delta * num_rounds
-            return total_epsilon, total_delta
+
+        with span('privacy', cat='privacy', client=self.client_id, round=server_round,
+                  technique=self.technique):
+            # Toda la actualización se trata como un único vector
+            flat = self._flatten(parameters)
+            if self.technique in ('clipping', 'clipping_noising'):
+                with span('clipping', cat='privacy', client=self.client_id):
+                    flat = self._apply_clipping(flat)
+            if self.technique in ('noising', 'clipping_noising'):
+                with span('noising', cat='privacy', client=self.client_id):
+                    flat = self._apply_noising(flat, self._generator(server_round))
+            return self._unflatten(flat, parameters)
+
+    def apply_prototype_privacy(self, X: np.ndarray, y: np.ndarray, n_prototypes: int,
+                                server_round: int = 0, seed: int = 42) -> List[np.ndarray]:
+        """Prototipos KNN con privacidad a nivel de prototipo
+
+        El clipping acota cada registro (características a [-B, B], Score a
+        `target_range`) antes de promediar: un registro mueve un centroide de n
+        miembros como mucho 2·B·√d/n en norma L2 y su objetivo (max - min)/n. El
+        ruido perturba recuentos (sensibilidad 1), centroides y objetivos con la
+        misma escala relativa que `noise_scale` aplica a la norma de clipping. La
+        asignación a clusters no se contabiliza: la garantía es aproximada.
+        """
+        low, high = self.target_range
+        clipping = self.technique in ('clipping', 'clipping_noising')
+        with span('privacy', cat='privacy', client=self.client_id, round=server_round,
+                  technique=self.technique):
+            if clipping:
+                X = np.clip(X, -self.feature_bound, self.feature_bound)
+                y = np.clip(y, low, high)
+            parameters = compute_prototypes(X, y, n_prototypes, seed=seed)
+            if self.technique not in ('noising', 'clipping_noising'):
+                return parameters
+
+            rng = self._generator(server_round)
+            relative = self.noise_scale / self.clipping_norm
+            centroids = parameters[PROTOTYPE_CENTROIDS]
+            counts = parameters[PROTOTYPE_COUNTS] + relative * rng.standard_normal(len(centroids))
+            counts = np.maximum(counts, 1.0)
+            feature_sensitivity = 2 * self.feature_bound * np.sqrt(centroids.shape[1]) / counts
+            centroids = centroids + relative * feature_sensitivity[:, None] * rng.standard_normal(centroids.shape)
+            targets = parameters[PROTOTYPE_TARGETS] + \
+                relative * (high - low) / counts * rng.standard_normal(len(counts))
+            if clipping:
+                # Postprocesado: los prototipos ruidosos vuelven al rango de los datos
+                centroids = np.clip(centroids, -self.feature_bound, self.feature_bound)
+                targets = np.clip(targets, low, high)
+            parameters[PROTOTYPE_CENTROIDS] = centroids
+            parameters[PROTOTYPE_TARGETS] = targets
+            parameters[PROTOTYPE_COUNTS] = counts
+            return parameters
+
+    def _flatten(self, parameters: List[np.ndarray]) -> np.ndarray:
+        # Se conserva la precisión de los parámetros (float32 en ese modo)
+        dtype = np.result_type(*parameters)
+        if dtype.kind != 'f':
+            dtype = np.float64
+        return np.concatenate([np.asarray(p, dtype=dtype).ravel() for p in parameters])
+
+    def _unflatten(self, flat: np.ndarray, parameters: List[np.ndarray]) -> List[np.ndarray]:
+        splits = np.cumsum([p.size for p in parameters])[:-1]
+        return [chunk.reshape(p.shape).astype(p.dtype, copy=False)
+                for chunk, p in zip(np.split(flat, splits), parameters)]
+
+    def _apply_clipping(self, flat: np.ndarray) -> np.ndarray:
+        """Limitar la norma L2 de la actualización completa"""
+        norm = np.linalg.norm(flat)
+        if norm > self.clipping_norm:
+            return flat * (self.clipping_norm / norm)
+        return flat
+
+    def _apply_noising(self, flat: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Añadir ruido gaussiano generado en bloque"""
+        noise = rng.standard_normal(flat.size, dtype=flat.dtype)
+        noise *= flat.dtype.type(self.noise_scale)
+        return flat + noise
+
+    def calculate_privacy_budget(self, num_rounds: int, releases: int = 1) -> Tuple[float, float]:
+        """Calcular presupuesto de privacidad total con el contador RDP
+
+        `releases` mecanismos gaussianos por ronda con el mismo ruido relativo
+        componen como uno solo con multiplicador z/√releases.
+        """
+        if self.technique == 'clipping_noising':
+            accountant = RDPAccountant(self.effective_noise_multiplier / np.sqrt(releases), self.delta)
+            return accountant.get_epsilon(num_rounds), self.delta
+        elif self.technique == 'noising':
+            # Sin clipping la sensibilidad no está acotada: no hay garantía formal
+            return float('inf'), self.delta
         else:
             return 0.0, 0.0
-    
+
     def get_privacy_metrics(self) -> dict:
         """Obtener métricas de privacidad"""
         return {
             'technique': self.technique,
             'clipping_norm': self.clipping_norm,
             'noise_multiplier': self.noise_multiplier,
+            'effective_noise_multiplier': self.effective_noise_multiplier,
             'epsilon': self.epsilon,
             'delta': self.delta
         }
@@ -2,25 +2,107 @@
 import flwr as fl
 from typing import Dict, List, Tuple, Optional
 import numpy as np
-from flwr.common import Parameters, FitRes, EvaluateRes
+from flwr.common import Parameters, FitIns, FitRes, EvaluateIns, EvaluateRes, GetPropertiesIns, Code
 from flwr.server.client_proxy import ClientProxy
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from federated.aggregation.strategies import AggregationStrategy
-from config import FEDERATED_CONFIG
+from federated.aggregation.strategies import AggregationStrategy, is_finite_payload
+from federated.utils.early_stopping import EarlyStopping
+from federated.utils.metrics import load_validation_set, regression_metrics
+from federated.utils.metrics_log import MetricsLogger
+from federated.utils.tracing import get_tracer, span
+from federated.utils.precision import cast_parameters, get_dtype
+from federated.utils.memory import current_rss_mb, memory_profiling_enabled, peak_rss_mb, rss_alarm
+from federated.privacy.secure_aggregation import (SecureAggregator, encode_public_keys, is_masked_payload,
+                                                  mask_neighbors, participant_id)
+from federated.models.base_model import NON_PARAMETRIC_MODELS, BaseModel
+from federated.models.local_solvers import GRADIENT_MODELS
+from federated.aggregation.scaffold import scaffold_payload
+from federated.aggregation.server_optimizers import ServerOptimizer
+from federated.aggregation.hierarchical import HierarchicalAggregator, hierarchical_enabled
+from federated.models.utils import load_checkpoint, load_optimizer_state, load_server_control, save_checkpoint
+from config import FEDERATED_CONFIG, SERVER_EVAL_CONFIG, SECURE_AGGREGATION_CONFIG, CLIENT_DRIFT_CONFIG
 
 
 class FlowerStrategy(fl.server.strategy.Strategy):
     """Estrategia personalizada para el servidor de aprendizaje federado"""
 
-    def __init__(self, aggregation_strategy: str = 'fedavg'):
+    def __init__(self, aggregation_strategy: str = 'fedavg', model_type: str = 'ridge',
+                 run_id: Optional[str] = None, model_params: Optional[Dict] = None,
+                 checkpoint_path: Optional[str] = None, resume_path: Optional[str] = None):
         self.aggregation = AggregationStrategy(aggregation_strategy)
+        # Paso del servidor sobre el agregado (momentum, FedAdagrad, FedAdam, FedYogi)
+        self.server_optimizer = ServerOptimizer()
+        self.model_type = model_type
+        self.model_params = model_params or {}
+        self.dtype = get_dtype()
+        self.early_stopping = EarlyStopping()
         self.round_metrics = []
+        self.last_loss = None
+
+        # Registro en streaming de las métricas de cada ronda
+        self.run_id = run_id or f"{model_type}_{aggregation_strategy}_{int(time.time())}"
+        self.metrics_logger = MetricsLogger(self.run_id)
+        self._round_start = {}
+
+        # SCAFFOLD: el control del servidor viaja con el modelo global (solo modelos por gradiente)
+        self.scaffold = aggregation_strategy == 'scaffold' and model_type in GRADIENT_MODELS
+
+        # Agregación segura: participantes anunciados en cada ronda
+        # (las cargas de SCAFFOLD incluyen controles y no se enmascaran)
+        self.secure_aggregation = SECURE_AGGREGATION_CONFIG['enabled'] and not self.scaffold and \
+            model_type not in NON_PARAMETRIC_MODELS
+        self.secure_aggregator = SecureAggregator()
+        self._secagg_participants = {}
+
+        # Agregación jerárquica por grupos de clientes (la suma enmascarada y los
+        # controles de SCAFFOLD necesitan todas las contribuciones en la raíz)
+        self.hierarchical = None
+        if hierarchical_enabled() and not self.secure_aggregation and not self.scaffold:
+            self.hierarchical = HierarchicalAggregator(self.aggregation)
+
+        # Perfil de memoria: picos del experimento y avisos por umbral
+        self.memory_profiling = memory_profiling_enabled()
+        self.memory_peaks = {}
+        self.memory_alarms = 0
+
+        # Checkpoints: las rondas continúan la numeración del checkpoint reanudado
+        self.checkpoint_path = checkpoint_path
+        self.initial_parameters = None
+        self.round_offset = 0
+        if resume_path:
+            self.initial_parameters, self.round_offset = load_checkpoint(resume_path)
+            self.server_optimizer.load_state(load_optimizer_state(resume_path))
+            if self.scaffold:
+                self.aggregation.server_control = load_server_control(resume_path)
+            print(f"Reanudando desde {resume_path} (ronda {self.round_offset})")
+        # Parámetros globales de la última ronda agregada (se exportan al terminar)
+        self.final_parameters = self.initial_parameters
+
+        # Evaluación centralizada: el conjunto reservado se carga una sola vez
+        self.server_eval = SERVER_EVAL_CONFIG['enabled']
+        self.eval_every = SERVER_EVAL_CONFIG['eval_every']
+        self.client_eval_every = SERVER_EVAL_CONFIG['client_eval_every'] if self.server_eval else 1
+        self.server_metrics = {}
+        self.X_val, self.y_val = None, None
+        if self.server_eval:
+            self.X_val, self.y_val = load_validation_set(self.dtype)
+            if self.X_val is None:
+                print("Evaluación en servidor deshabilitada: no hay conjunto de validación")
+                self.server_eval = False
+                self.client_eval_every = 1
+            else:
+                # Mismo conjunto reservado para todos: objetivo de rounds_to_target común
+                self.early_stopping.set_target_variance(np.var(self.y_val))
 
     def initialize_parameters(self, client_manager) -> Optional[Parameters]:
         """Inicializar parámetros globales"""
+        if self.initial_parameters is not None:
+            return fl.common.ndarrays_to_parameters(self.initial_parameters)
         # Parámetros iniciales dummy
         initial_params = [np.random.randn(10), np.array([0.0])]
         return fl.common.ndarrays_to_parameters(initial_params)
@@ -28,22 +110,90 @@ class FlowerStrategy(fl.server.strategy.Strategy):
     def configure_fit(self, server_round: int, parameters: Parameters,
                       client_manager) -> List[Tuple[ClientProxy, Dict]]:
         """Configurar ronda de entrenamiento"""
+        # No lanzar más rondas una vez detectada la convergencia
+        if self.early_stopping.should_stop():
+            return []
+
         # Seleccionar todos los clientes disponibles
-        clients = client_manager.all()
+        with span('configure_fit', round=server_round):
+            clients = list(client_manager.all().values())
+        self._round_start[server_round] = time.time()
 
         # Configuración para cada cliente
         config = {
-            'server_round': server_round,
+            'server_round': server_round + self.round_offset,
             'local_epochs': 1,
+            'aggregation': self.aggregation.strategy,
+            'proximal_mu': CLIENT_DRIFT_CONFIG['proximal_mu'],
         }
-
-        return [(client, config) for client in clients]
+        if self.scaffold:
+            control = self.aggregation.server_control
+            model = fl.common.parameters_to_ndarrays(parameters)
+            parameters = fl.common.ndarrays_to_parameters(
+                scaffold_payload(model, cast_parameters(control, self.dtype) if control else None))
+        if self.secure_aggregation:
+            return self._configure_secure_fit(server_round, parameters, config, clients)
+
+        fit_ins = FitIns(parameters, config)
+        return [(client, fit_ins) for client in clients]
+
+    def _secagg_request(self, client: ClientProxy, server_round: int, config: Dict) -> Optional[Dict]:
+        """Mensaje de una fase de la agregación segura a un cliente (None si no responde)"""
+        ins = GetPropertiesIns({'server_round': server_round + self.round_offset, **config})
+        try:
+            res = client.get_properties(ins, timeout=None, group_id=server_round)
+        except Exception as e:
+            print(f"Agregación segura: el cliente {client.cid} no respondió ({e})")
+            return None
+        return res.properties if res.status.code == Code.OK else None
+
+    def _configure_secure_fit(self, server_round: int, parameters: Parameters, config: Dict,
+                              clients: List[ClientProxy]) -> List[Tuple[ClientProxy, FitIns]]:
+        """Anuncio de claves: cada cliente genera su par DH y el servidor reenvía las públicas"""
+        with span('secagg_advertise', round=server_round, clients=len(clients)):
+            with ThreadPoolExecutor(max_workers=max(1, len(clients))) as executor:
+                responses = list(executor.map(
+                    lambda client: self._secagg_request(client, server_round, {'secagg': 'advertise'}),
+                    clients))
+        public_keys, proxies = {}, {}
+        for client, properties in zip(clients, responses):
+            if properties and 'public_key' in properties:
+                cid = participant_id(client.cid)
+                public_keys[cid] = int(str(properties['public_key']), 16)
+                proxies[cid] = client
+        # Solo participan los clientes que anunciaron su clave
+        participants = sorted(public_keys)
+        self._secagg_participants[server_round] = participants
+        config['secagg_participants'] = ','.join(str(p) for p in participants)
+
+        round_ = server_round + self.round_offset
+        instructions = []
+        for cid in participants:
+            neighbors = mask_neighbors(cid, participants, round_, self.secure_aggregator.degree)
+            client_config = dict(config, secagg_keys=encode_public_keys({j: public_keys[j] for j in neighbors}))
+            instructions.append((proxies[cid], FitIns(parameters, client_config)))
+        return instructions
 
     def aggregate_fit(
             self, server_round: int, results: List[Tuple[ClientProxy, FitRes]],
             failures: List[BaseException]
     ) -> Tuple[Optional[Parameters], Dict]:
         """Agregar resultados de entrenamiento"""
+        round_start = self._round_start.get(server_round)
+        try:
+            with span('aggregate_fit', round=server_round, clients=len(results)):
+                return self._aggregate_fit(server_round, results, failures)
+        finally:
+            tracer = get_tracer()
+            if round_start is not None:
+                # Ronda completa: configuración, clientes (incluida la planificación) y agregación
+                tracer.complete('round', round_start, time.time(), round=server_round)
+            tracer.flush()
+
+    def _aggregate_fit(
+            self, server_round: int, results: List[Tuple[ClientProxy, FitRes]],
+            failures: List[BaseException]
+    ) -> Tuple[Optional[Parameters], Dict]:
         if not results:
             return None, {}
 
@@ -51,47 +201,180 @@ class FlowerStrategy(fl.server.strategy.Strategy):
         parameters_list = []
         num_samples_list = []
         metrics_list = []
+        contributions = []
+
+        payload_bytes = 0
 
         for client_proxy, fit_res in results:
-            parameters_list.append(
-                fl.common.parameters_to_ndarrays(fit_res.parameters))
+            if self.hierarchical:
+                # Cada agregador intermedio deserializa solo las cargas de su grupo
+                # (y descarta las no finitas)
+                contributions.append((participant_id(client_proxy.cid),
+                                      lambda p=fit_res.parameters: fl.common.parameters_to_ndarrays(p),
+                                      fit_res.num_examples))
+            else:
+                with span('deserialize', round=server_round, cid=client_proxy.cid):
+                    parameters = fl.common.parameters_to_ndarrays(fit_res.parameters)
+                if not is_finite_payload(parameters):
+                    # Un cliente divergido no debe contaminar el modelo global
+                    print(f"Descartada la actualización no finita del cliente {client_proxy.cid}")
+                    self.metrics_logger.log('client_rejected', round=server_round,
+                                            cid=client_proxy.cid, reason='non_finite')
+                    continue
+                parameters_list.append(parameters)
             num_samples_list.append(fit_res.num_examples)
             metrics_list.append(fit_res.metrics)
 
+            client_bytes = sum(len(tensor) for tensor in fit_res.parameters.tensors)
+            payload_bytes += client_bytes
+            self.metrics_logger.log('client_fit', round=server_round,
+                                    cid=client_proxy.cid, num_examples=fit_res.num_examples,
+                                    payload_bytes=client_bytes, metrics=dict(fit_res.metrics))
+
+        if not parameters_list and not contributions:
+            return None, {}
+
         # Agregar parámetros
+        aggregation_start = time.time()
+        aggregation_groups = None
         try:
-            aggregated_params = self.aggregation.aggregate(
-                parameters_list, num_samples_list)
-            aggregated_parameters = fl.common.ndarrays_to_parameters(
-                aggregated_params)
+            if self.hierarchical:
+                aggregated_params, aggregation_groups = self.hierarchical.aggregate(contributions)
+            elif parameters_list and all(is_masked_payload(p) for p in parameters_list):
+                aggregated_params = self._secure_aggregate(
+                    server_round, [client_proxy for client_proxy, _ in results],
+                    parameters_list, num_samples_list)
+            else:
+                aggregated_params = self.aggregation.aggregate(
+                    parameters_list, num_samples_list)
         except Exception as e:
             print(f"Error en agregación: {e}")
+            if self.secure_aggregation:
+                # Las cargas enmascaradas no sirven de respaldo: se conserva el modelo global
+                return None, {}
             # Usar primer conjunto de parámetros como fallback
+            aggregated_params = parameters_list[0] if parameters_list else \
+                fl.common.parameters_to_ndarrays(results[0][1].parameters)
+        # La agregación segura y los prototipos se calculan en float64
+        aggregated_params = cast_parameters(aggregated_params, self.dtype)
+        if self.server_optimizer.enabled:
+            with span('server_optimizer', round=server_round, optimizer=self.server_optimizer.name):
+                aggregated_params = self.server_optimizer.step(self.final_parameters, aggregated_params)
+        self.final_parameters = aggregated_params
+        with span('serialize', round=server_round):
             aggregated_parameters = fl.common.ndarrays_to_parameters(
-                parameters_list[0])
+                aggregated_params)
+        aggregation_time = time.time() - aggregation_start
+
+        # Cambio relativo de los parámetros globales para la convergencia
+        param_delta = self.early_stopping.update_parameters(
+            server_round, aggregated_params)
+        if self.checkpoint_path:
+            with span('checkpoint', round=server_round):
+                save_checkpoint(self.checkpoint_path, aggregated_params, server_round + self.round_offset,
+                                self.server_optimizer.state(),
+                                self.aggregation.server_control if self.scaffold else None)
 
         # Agregar métricas
         aggregated_metrics = self._aggregate_metrics(metrics_list,
                                                      num_samples_list)
         aggregated_metrics['round'] = server_round
+        aggregated_metrics['param_delta'] = param_delta
+        aggregated_metrics['aggregation_time'] = aggregation_time
+        aggregated_metrics['payload_bytes'] = payload_bytes
+        if aggregation_groups is not None:
+            aggregated_metrics['aggregation_groups'] = aggregation_groups
+        if self.memory_profiling:
+            aggregated_metrics.update(self._memory_metrics(server_round, results))
+        if server_round in self._round_start:
+            aggregated_metrics['round_time'] = time.time() - self._round_start.pop(server_round)
 
         # Guardar métricas de la ronda
         self.round_metrics.append(aggregated_metrics)
+        self.metrics_logger.log('round_fit', round=server_round,
+                                num_failures=len(failures), metrics=aggregated_metrics)
 
         return aggregated_parameters, aggregated_metrics
 
+    def _memory_metrics(self, server_round: int,
+                        results: List[Tuple[ClientProxy, FitRes]]) -> Dict:
+        """Máximos de memoria de la ronda (clientes y servidor) y avisos por umbral"""
+        memory = {'server_rss_mb': current_rss_mb(), 'server_peak_rss_mb': peak_rss_mb()}
+        for key in ('mem_peak_rss_mb', 'mem_traced_peak_mb', 'mem_data_mb'):
+            values = [fit_res.metrics[key] for _, fit_res in results if key in fit_res.metrics]
+            if values:
+                memory[f"max_client_{key[4:]}"] = max(values)
+
+        for client_proxy, fit_res in results:
+            if rss_alarm(fit_res.metrics.get('mem_peak_rss_mb'), f"cliente {client_proxy.cid}"):
+                self.memory_alarms += 1
+                self.metrics_logger.log('memory_alarm', round=server_round, cid=client_proxy.cid,
+                                        rss_mb=fit_res.metrics['mem_peak_rss_mb'])
+        if rss_alarm(memory['server_peak_rss_mb'], 'servidor'):
+            self.memory_alarms += 1
+            self.metrics_logger.log('memory_alarm', round=server_round, cid='server',
+                                    rss_mb=memory['server_peak_rss_mb'])
+
+        memory = {k: v for k, v in memory.items() if v is not None}
+        for key, value in memory.items():
+            self.memory_peaks[key] = max(value, self.memory_peaks.get(key, value))
+        return memory
+
+    def _secure_aggregate(self, server_round: int, proxies: List[ClientProxy],
+                          parameters_list: List[List[np.ndarray]],
+                          num_samples_list: List[int]) -> List[np.ndarray]:
+        """Promedio ponderado a partir de contribuciones enmascaradas"""
+        if self.aggregation.strategy != 'fedavg':
+            print(f"Agregación segura: '{self.aggregation.strategy}' no es compatible "
+                  f"con la suma enmascarada; se usa el promedio ponderado")
+
+        survivors = [int(p[0][1]) for p in parameters_list]
+        participants = self._secagg_participants.pop(server_round, survivors)
+        round_ = server_round + self.round_offset
+
+        # Recuperación: cada superviviente envía las semillas que compartía con
+        # sus vecinos caídos; el servidor no puede derivarlas por su cuenta
+        revealed_seeds = {}
+        requests = self.secure_aggregator.recovery_requests(participants, survivors, round_)
+        by_id = {participant_id(proxy.cid): proxy for proxy in proxies}
+        with span('secagg_recover', round=server_round, survivors=len(requests)):
+            for survivor, dropped in requests.items():
+                properties = self._secagg_request(
+                    by_id[survivor], server_round,
+                    {'secagg': 'reveal', 'dropped': ','.join(str(j) for j in dropped)}) or {}
+                for j in dropped:
+                    if f"seed_{j}" in properties:
+                        revealed_seeds[(survivor, j)] = int(str(properties[f"seed_{j}"]))
+        return self.secure_aggregator.aggregate(
+            parameters_list, num_samples_list, participants, round_, revealed_seeds)
+
     def configure_evaluate(self, server_round: int, parameters: Parameters,
                            client_manager) -> List[Tuple[ClientProxy, Dict]]:
         """Configurar ronda de evaluación"""
-        clients = client_manager.all()
+        if self.early_stopping.stopped_round is not None and \
+                server_round > self.early_stopping.stopped_round:
+            return []
+        # Con evaluación en servidor, los clientes solo evalúan cada N rondas
+        if server_round % self.client_eval_every != 0:
+            return []
+
+        clients = list(client_manager.all().values())
         config = {'server_round': server_round}
-        return [(client, config) for client in clients]
+        evaluate_ins = EvaluateIns(parameters, config)
+        return [(client, evaluate_ins) for client in clients]
 
     def aggregate_evaluate(
             self, server_round: int, results: List[Tuple[ClientProxy,
                                                          EvaluateRes]],
             failures: List[BaseException]) -> Tuple[Optional[float], Dict]:
         """Agregar resultados de evaluación"""
+        with span('aggregate_evaluate', round=server_round, clients=len(results)):
+            return self._aggregate_evaluate(server_round, results, failures)
+
+    def _aggregate_evaluate(
+            self, server_round: int, results: List[Tuple[ClientProxy,
+                                                         EvaluateRes]],
+            failures: List[BaseException]) -> Tuple[Optional[float], Dict]:
         if not results:
             return None, {}
 
@@ -104,6 +387,10 @@ class FlowerStrategy(fl.server.strategy.Strategy):
             losses.append(evaluate_res.loss)
             num_samples_list.append(evaluate_res.num_examples)
             metrics_list.append(evaluate_res.metrics)
+            self.metrics_logger.log('client_evaluate', round=server_round,
+                                    cid=client_proxy.cid, loss=evaluate_res.loss,
+                                    num_examples=evaluate_res.num_examples,
+                                    metrics=dict(evaluate_res.metrics))
 
         # Calcular pérdida promedio ponderada
         total_samples = sum(num_samples_list)
@@ -115,11 +402,45 @@ class FlowerStrategy(fl.server.strategy.Strategy):
                                                      num_samples_list)
         aggregated_metrics['round'] = server_round
         aggregated_metrics['aggregated_loss'] = weighted_loss
+        self.metrics_logger.log('round_evaluate', round=server_round, metrics=aggregated_metrics)
+
+        # Seguimiento de convergencia sobre la pérdida agregada
+        # (si evalúa el servidor, la convergencia usa su pérdida)
+        if not self.server_eval:
+            self.last_loss = weighted_loss
+            self.early_stopping.update_loss(server_round, weighted_loss)
 
         return weighted_loss, aggregated_metrics
 
     def evaluate(self, server_round: int, parameters: Parameters) -> Optional[Tuple[float, Dict]]:
-       return None
+        """Evaluar los parámetros agregados sobre el conjunto reservado"""
+        if not self.server_eval or server_round == 0 or server_round % self.eval_every != 0:
+            return None
+        if self.early_stopping.stopped_round is not None and \
+                server_round > self.early_stopping.stopped_round:
+            return None
+
+        try:
+            with span('server_evaluate', round=server_round):
+                model = BaseModel(self.model_type, **self.model_params)
+                model.set_parameters(fl.common.parameters_to_ndarrays(parameters))
+                y_pred = model.predict(self.X_val)
+        except Exception as e:
+            print(f"Error en evaluación del servidor: {e}")
+            return None
+        finally:
+            get_tracer().flush()
+
+        metrics = regression_metrics(self.y_val, y_pred)
+        metrics['inference_time'] = model.inference_time / len(self.y_val)
+        metrics['total_samples'] = len(self.y_val)
+        metrics['round'] = server_round
+        mse = metrics['mse']
+        self.server_metrics = metrics
+        self.metrics_logger.log('server_evaluate', round=server_round, metrics=metrics)
+        self.last_loss = mse
+        self.early_stopping.update_loss(server_round, mse)
+        return mse, metrics
 
 
     def _aggregate_metrics(self, metrics_list: List[Dict],
@@ -133,8 +454,11 @@ class FlowerStrategy(fl.server.strategy.Strategy):
 
         # Métricas numéricas para promediar
         numeric_metrics = [
-            'train_mae', 'train_mse', 'train_r2', 'test_mae', 'test_mse',
-            'test_r2', 'training_time', 'inference_time'
+            'train_mae', 'train_mse', 'train_rmse', 'train_r2',
+            'test_mae', 'test_mse', 'test_rmse', 'test_r2',
+            'test_residual_p50', 'test_residual_p90', 'test_residual_p99',
+            'global_test_mae', 'global_test_mse', 'global_test_r2',
+            'training_time', 'inference_time'
         ]
 
         for metric in numeric_metrics:
@@ -159,7 +483,41 @@ class FlowerStrategy(fl.server.strategy.Strategy):
 
         return aggregated
 
-
-def create_strategy(aggregation_strategy: str = 'fedavg') -> FlowerStrategy:
+    def get_summary(self) -> Dict:
+        """Resumen del entrenamiento federado para los resultados"""
+        summary = {'loss': self.last_loss}
+        summary.update(self.early_stopping.get_summary())
+        # Rondas totales del modelo, incluidas las de checkpoints anteriores
+        summary['stopped_round'] += self.round_offset
+        if summary['rounds_to_target'] is not None:
+            summary['rounds_to_target'] += self.round_offset
+        summary['precision'] = self.dtype.name
+        summary['server_optimizer'] = self.server_optimizer.name
+        if self.round_metrics:
+            summary['avg_payload_bytes'] = float(np.mean([m['payload_bytes'] for m in self.round_metrics]))
+        if self.server_metrics:
+            # Métricas globales del modelo federado sobre el conjunto reservado
+            summary.update({
+                'mae': self.server_metrics['mae'],
+                'mse': self.server_metrics['mse'],
+                'r2': self.server_metrics['r2'],
+                'avg_inference_time': self.server_metrics['inference_time'],
+                'total_samples': self.server_metrics['total_samples'],
+            })
+            if self.round_metrics and 'avg_training_time' in self.round_metrics[-1]:
+                summary['avg_training_time'] = self.round_metrics[-1]['avg_training_time']
+        if self.memory_profiling:
+            # Picos del experimento (el RSS actual del servidor no es un pico)
+            summary.update({k.replace('max_', ''): v for k, v in self.memory_peaks.items()
+                            if k != 'server_rss_mb'})
+            summary['memory_alarms'] = self.memory_alarms
+        return summary
+
+
+def create_strategy(aggregation_strategy: str = 'fedavg', model_type: str = 'ridge',
+                    run_id: Optional[str] = None, model_params: Optional[Dict] = None,
+                    checkpoint_path: Optional[str] = None,
+                    resume_path: Optional[str] = None) -> FlowerStrategy:
     """Crear estrategia del servidor"""
-    return FlowerStrategy(aggregation_strategy)
+    return FlowerStrategy(aggregation_strategy, model_type, run_id, model_params,
+                          checkpoint_path, resume_path)
@@ -0,0 +1,43 @@
+"""
+Almacén del estado persistente de cada cliente entre rondas
+
+`client_fn` crea un cliente nuevo en cada ronda (y puede hacerlo en otro actor
+de Ray), así que el estado propio de cada banco se guarda en disco: un .npz por
+cliente en `<state_dir>/<model_type>/`.
+"""
+import os
+import shutil
+import numpy as np
+from typing import Dict, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import PERSONALIZATION_CONFIG
+
+
+class ClientStateStore:
+    """Estado de los clientes de un tipo de modelo"""
+
+    def __init__(self, model_type: str, state_dir: Optional[str] = None):
+        self.model_type = model_type
+        self.state_dir = os.path.join(state_dir or PERSONALIZATION_CONFIG['state_dir'], model_type)
+
+    def path(self, client_id: int) -> str:
+        return os.path.join(self.state_dir, f"banco{client_id}.npz")
+
+    def load(self, client_id: int) -> Optional[Dict[str, np.ndarray]]:
+        path = self.path(client_id)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    def save(self, client_id: int, state: Dict[str, np.ndarray]) -> None:
+        """Escritura atómica: un cliente interrumpido no deja un estado a medias"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = self.path(client_id) + '.tmp.npz'
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, self.path(client_id))
+
+    def clear(self) -> None:
+        """Descartar el estado de un experimento anterior"""
+        shutil.rmtree(self.state_dir, ignore_errors=True)
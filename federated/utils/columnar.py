@@ -0,0 +1,131 @@
+"""
+Formato binario columnar para los datos procesados de cada cliente
+
+Cada banco se guarda en un directorio `bancoN.col/` con un archivo binario por
+columna (valores little-endian contiguos, sin cabecera) y `schema.json` con las
+columnas, el tipo y el número de filas. Escribir es anexar bloques a cada
+columna; leer es mapear los archivos en memoria (np.memmap), sin parsear texto.
+"""
+import os
+import json
+import glob
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+SCHEMA_NAME = 'schema.json'
+COLUMNAR_SUFFIX = '.col'
+FORMAT_VERSION = 1
+
+
+def _column_path(path: str, column: str) -> str:
+    return os.path.join(path, f"{column}.bin")
+
+
+class ColumnarWriter:
+    """Anexa bloques de un DataFrame numérico a un directorio columnar
+
+    Los bloques se acumulan en memoria hasta `buffer_rows` filas y se vuelcan
+    abriendo los archivos solo durante la escritura, de modo que pueden
+    mantenerse abiertos tantos escritores como bancos haya.
+    """
+
+    def __init__(self, path: str, columns: List[str], dtype='float64', buffer_rows: int = 65536):
+        self.path = path
+        self.columns = list(columns)
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self.buffer_rows = buffer_rows
+        self.rows = 0
+        self._buffer = []
+        self._buffered = 0
+        os.makedirs(path, exist_ok=True)
+        # Un directorio existente se sobrescribe
+        for column in self.columns:
+            open(_column_path(path, column), 'wb').close()
+        schema_path = os.path.join(path, SCHEMA_NAME)
+        if os.path.exists(schema_path):
+            os.remove(schema_path)
+
+    def append(self, df: pd.DataFrame) -> None:
+        if len(df) == 0:
+            return
+        self._buffer.append(df[self.columns].to_numpy(dtype=self.dtype))
+        self._buffered += len(df)
+        if self._buffered >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        block = np.concatenate(self._buffer)
+        for i, column in enumerate(self.columns):
+            with open(_column_path(self.path, column), 'ab') as f:
+                f.write(np.ascontiguousarray(block[:, i]).tobytes())
+        self.rows += len(block)
+        self._buffer, self._buffered = [], 0
+
+    def close(self) -> int:
+        """Volcar lo pendiente y escribir el esquema (el directorio queda completo)"""
+        self.flush()
+        with open(os.path.join(self.path, SCHEMA_NAME), 'w') as f:
+            json.dump({'format_version': FORMAT_VERSION, 'columns': self.columns,
+                       'dtype': self.dtype.str, 'rows': self.rows}, f, indent=2)
+        return self.rows
+
+
+def is_columnar(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, SCHEMA_NAME))
+
+
+def read_schema(path: str) -> Dict:
+    with open(os.path.join(path, SCHEMA_NAME)) as f:
+        return json.load(f)
+
+
+def read_columns(path: str, columns: Optional[List[str]] = None, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Columnas como arrays (mapeados en memoria por defecto)"""
+    schema = read_schema(path)
+    dtype = np.dtype(schema['dtype'])
+    arrays = {}
+    for column in columns or schema['columns']:
+        column_path = _column_path(path, column)
+        if schema['rows'] == 0:
+            arrays[column] = np.empty(0, dtype=dtype)
+        elif mmap:
+            arrays[column] = np.memmap(column_path, dtype=dtype, mode='r', shape=(schema['rows'],))
+        else:
+            arrays[column] = np.fromfile(column_path, dtype=dtype, count=schema['rows'])
+    return arrays
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None, dtype=None) -> pd.DataFrame:
+    """DataFrame con las columnas indicadas, opcionalmente convertido a `dtype`"""
+    arrays = read_columns(path, columns)
+    return pd.DataFrame({name: np.asarray(values, dtype=dtype) for name, values in arrays.items()})
+
+
+def client_data_path(data_dir: str, client_id: int) -> str:
+    """Datos procesados del banco: el directorio columnar si existe, si no el CSV"""
+    columnar_path = os.path.join(data_dir, f"banco{client_id}{COLUMNAR_SUFFIX}")
+    if is_columnar(columnar_path):
+        return columnar_path
+    return os.path.join(data_dir, f"banco{client_id}.csv")
+
+
+def read_client_frame(path: str, dtype=None) -> pd.DataFrame:
+    """Leer los datos procesados de un banco en cualquiera de los dos formatos"""
+    if is_columnar(path):
+        return read_frame(path, dtype=dtype)
+    return pd.read_csv(path, dtype=dtype)
+
+
+def client_data_paths(data_dir: str) -> List[str]:
+    """Datos procesados de todos los bancos, ordenados por banco"""
+    paths = {}
+    for path in glob.glob(os.path.join(data_dir, 'banco*.csv')) + \
+            glob.glob(os.path.join(data_dir, f"banco*{COLUMNAR_SUFFIX}")):
+        name = os.path.basename(path)
+        client_id = name[len('banco'):].split('.')[0]
+        if client_id.isdigit():
+            paths.setdefault(int(client_id), client_data_path(data_dir, int(client_id)))
+    return [paths[client_id] for client_id in sorted(paths)]
@@ -0,0 +1,280 @@
+"""
+Validación de CSV grandes en una sola pasada por tramos paralelos
+
+El archivo se divide en tramos de `chunk_bytes` alineados a fin de línea y cada
+worker resume el suyo en un DataProfile: momentos, nulos y conteos exactos de
+categorías (ClientStatistics), distintos por HyperLogLog y cuantiles por
+t-digest. Los perfiles se combinan en el orden del archivo, los IDs duplicados
+se cuentan de forma exacta con SeenKeys y el resultado es un informe JSON.
+
+Si el informe corresponde al mismo archivo (tamaño y fecha de modificación),
+no hay IDs duplicados y ninguna categórica se truncó, sus estadísticos son los
+mismos que calcularía la primera pasada del preprocesamiento en streaming y
+este los reutiliza en lugar de releer el CSV.
+
+Los tramos se cortan por saltos de línea: se asume que ningún campo entre
+comillas contiene saltos de línea.
+"""
+import io
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.utils.preprocessing_stats import ClientStatistics, SeenKeys
+from federated.utils.sketches import HyperLogLog, TDigest, hash_values
+from config import VALIDATION_CONFIG
+
+REPORT_VERSION = 1
+# Filas leídas al inicio del archivo para fijar el tipo de cada columna en todos los tramos
+DTYPE_SAMPLE_ROWS = 10000
+
+
+class DataProfile:
+    """Resumen combinable de un tramo del CSV"""
+
+    def __init__(self, target_column: str = 'Score', id_column: str = 'ID', **kwargs):
+        self.target_column = target_column
+        self.id_column = id_column
+        self.hll_precision = kwargs.get('hll_precision', VALIDATION_CONFIG['hll_precision'])
+        self.compression = kwargs.get('tdigest_compression', VALIDATION_CONFIG['tdigest_compression'])
+        self.max_categories = kwargs.get('max_categories', VALIDATION_CONFIG['max_categories'])
+        self.rows = 0
+        self.target_nulls = 0
+        self.duplicate_ids = 0
+        self.stats = ClientStatistics(target_column=target_column)
+        self.distinct = {}
+        self.digests = {}
+        self.truncated = set()
+
+    def update(self, df: pd.DataFrame) -> Optional[np.ndarray]:
+        """Resumir un bloque de filas con columnas ya renombradas
+
+        Como en el preprocesamiento, se descartan las filas sin objetivo y el ID
+        no forma parte de los estadísticos. Devuelve el hash de los IDs de las
+        filas conservadas para contar duplicados en orden.
+        """
+        self.rows += len(df)
+        if self.target_column in df.columns:
+            has_target = df[self.target_column].notna()
+            self.target_nulls += int((~has_target).sum())
+            df = df[has_target]
+
+        id_hashes = None
+        if self.id_column in df.columns:
+            id_hashes = pd.util.hash_pandas_object(df[self.id_column], index=False).to_numpy()
+            self._distinct(self.id_column).update(id_hashes)
+            df = df.drop(self.id_column, axis=1)
+
+        self.stats.update(df)
+        for col in df.columns:
+            self._distinct(col).update(hash_values(df[col]))
+            if col not in self.stats.categorical_columns:
+                self.digests.setdefault(col, TDigest(self.compression)).update(df[col].to_numpy(dtype=np.float64))
+        self._truncate_categories()
+        return id_hashes
+
+    def _distinct(self, col: str) -> HyperLogLog:
+        if col not in self.distinct:
+            self.distinct[col] = HyperLogLog(self.hll_precision)
+        return self.distinct[col]
+
+    def _truncate_categories(self) -> None:
+        """Las categóricas con demasiados valores se resumen solo con HyperLogLog"""
+        for col, counts in self.stats.category_counts.items():
+            if col in self.truncated or len(counts) > self.max_categories:
+                self.truncated.add(col)
+                counts.clear()
+
+    def merge(self, other: 'DataProfile') -> 'DataProfile':
+        self.rows += other.rows
+        self.target_nulls += other.target_nulls
+        self.duplicate_ids += other.duplicate_ids
+        self.stats.merge(other.stats)
+        for col, sketch in other.distinct.items():
+            self._distinct(col).merge(sketch)
+        for col, digest in other.digests.items():
+            self.digests.setdefault(col, TDigest(self.compression)).merge(digest)
+        self.truncated |= other.truncated
+        self._truncate_categories()
+        return self
+
+    @property
+    def reusable(self) -> bool:
+        """Los estadísticos coinciden con los de la primera pasada del preprocesamiento"""
+        return self.stats.columns is not None and self.duplicate_ids == 0 and not self.truncated
+
+    def medians(self) -> Dict[str, float]:
+        return {col: digest.quantile(0.5) for col, digest in self.digests.items()
+                if col != self.target_column and digest.count > 0}
+
+    def report(self, quantiles: Optional[List[float]] = None) -> Dict:
+        """Informe serializable: resumen por columna y estadísticos reutilizables"""
+        quantiles = quantiles or VALIDATION_CONFIG['quantiles']
+        stats = self.stats
+        columns = {}
+        if self.id_column in self.distinct:
+            columns[self.id_column] = {'kind': 'id', 'distinct': self.distinct[self.id_column].count()}
+        for col in stats.columns or []:
+            summary = {'nulls': stats.nulls[col], 'distinct': self.distinct[col].count()}
+            if col in stats.categorical_columns:
+                counts = stats.category_counts[col]
+                summary.update({
+                    'kind': 'categorical',
+                    'truncated': col in self.truncated,
+                    'top': dict(counts.most_common(5)),
+                })
+                if col not in self.truncated:
+                    summary['distinct'] = len(counts)
+            else:
+                digest = self.digests[col]
+                count = stats.count[col]
+                summary.update({
+                    'kind': 'numeric',
+                    'count': count,
+                    'mean': stats.mean[col] if count else None,
+                    'std': float(np.sqrt(stats.m2[col] / count)) if count else None,
+                    'min': digest.min if count else None,
+                    'max': digest.max if count else None,
+                    'quantiles': digest.quantiles(quantiles) if count else {},
+                })
+            columns[col] = summary
+
+        return {
+            'rows': self.rows,
+            'target_nulls': self.target_nulls,
+            'duplicate_ids': self.duplicate_ids,
+            'columns': columns,
+            'preprocessing': {
+                'reusable': self.reusable,
+                'statistics': stats.to_dict() if stats.columns is not None else None,
+                'medians': self.medians(),
+            },
+        }
+
+
+def _file_stamp(path: str) -> Dict:
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _chunk_ranges(path: str, chunk_bytes: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """Cabecera y tramos [inicio, fin) del archivo que contienen líneas completas"""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def _profile_range(path: str, header: bytes, start: int, end: int, dtypes: Dict,
+                   column_mapping: Dict, profile_kwargs: Dict) -> Tuple[DataProfile, Optional[np.ndarray]]:
+    """Worker: leer un tramo del CSV y resumirlo"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    df = pd.read_csv(io.BytesIO(header + data), dtype=dtypes).rename(columns=column_mapping)
+    profile = DataProfile(**profile_kwargs)
+    id_hashes = profile.update(df)
+    return profile, id_hashes
+
+
+def _column_dtypes(path: str, column_mapping: Dict, id_column: str) -> Dict:
+    """Tipos de columna fijados a partir del inicio del archivo
+
+    Sin ellos, un tramo en el que una categórica solo tiene nulos la leería como
+    numérica y los perfiles no serían combinables.
+    """
+    sample = pd.read_csv(path, nrows=DTYPE_SAMPLE_ROWS)
+    dtypes = {}
+    for col in sample.columns:
+        if column_mapping.get(col, col) == id_column:
+            dtypes[col] = str
+        elif pd.api.types.is_numeric_dtype(sample[col]):
+            dtypes[col] = np.float64
+        else:
+            dtypes[col] = object
+    return dtypes
+
+
+def profile_file(path: str, column_mapping: Optional[Dict] = None, **kwargs) -> Dict:
+    """Validar un CSV en una sola pasada y devolver el informe"""
+    column_mapping = column_mapping or {}
+    chunk_bytes = kwargs.pop('chunk_bytes', VALIDATION_CONFIG['chunk_bytes'])
+    workers = kwargs.pop('workers', VALIDATION_CONFIG['workers']) or os.cpu_count() or 1
+    quantiles = kwargs.pop('quantiles', None)
+    profile_kwargs = kwargs
+    started = time.time()
+
+    dtypes = _column_dtypes(path, column_mapping, kwargs.get('id_column', 'ID'))
+    header, ranges = _chunk_ranges(path, chunk_bytes)
+    tasks = [(path, header, start, end, dtypes, column_mapping, profile_kwargs) for start, end in ranges]
+
+    profile = DataProfile(**profile_kwargs)
+    seen_ids = SeenKeys()
+
+    def combine(results):
+        # Los resultados llegan en el orden del archivo: la primera aparición de un ID no es duplicado
+        for part, id_hashes in results:
+            profile.merge(part)
+            if id_hashes is not None:
+                profile.duplicate_ids += int(np.count_nonzero(~seen_ids.add_new(id_hashes)))
+
+    workers = min(workers, len(tasks)) if tasks else 1
+    if workers <= 1:
+        combine(_profile_range(*task) for task in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            combine(executor.map(_profile_range, *zip(*tasks)))
+
+    report = profile.report(quantiles)
+    report.update({
+        'report_version': REPORT_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'source': _file_stamp(path),
+        'elapsed_seconds': time.time() - started,
+        'chunks': len(tasks),
+        'workers': workers,
+    })
+    return report
+
+
+def report_path(input_path: str, report_dir: Optional[str] = None) -> str:
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(report_dir or VALIDATION_CONFIG['report_dir'], f"{name}.validation.json")
+
+
+def save_report(report: Dict, input_path: str, report_dir: Optional[str] = None) -> str:
+    path = report_path(input_path, report_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_report(input_path: str, report_dir: Optional[str] = None) -> Optional[Dict]:
+    """Informe de validación del archivo, o None si no existe o el archivo cambió"""
+    path = report_path(input_path, report_dir)
+    if not os.path.exists(input_path) or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        report = json.load(f)
+    stamp = _file_stamp(input_path)
+    source = report.get('source', {})
+    if report.get('report_version') != REPORT_VERSION or \
+            source.get('size') != stamp['size'] or source.get('mtime_ns') != stamp['mtime_ns']:
+        return None
+    return report
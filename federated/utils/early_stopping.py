@@ -0,0 +1,110 @@
+"""
+Parada temprana por convergencia para las rondas federadas
+"""
+import numpy as np
+from typing import List, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import EARLY_STOPPING_CONFIG
+
+
+class EarlyStopping:
+    """Seguimiento de la pérdida agregada y del cambio de parámetros entre rondas"""
+
+    def __init__(self, **kwargs):
+        self.enabled = kwargs.get('enabled', EARLY_STOPPING_CONFIG['enabled'])
+        self.min_rounds = kwargs.get('min_rounds', EARLY_STOPPING_CONFIG['min_rounds'])
+        self.patience = kwargs.get('patience', EARLY_STOPPING_CONFIG['patience'])
+        self.tolerance = kwargs.get('tolerance', EARLY_STOPPING_CONFIG['tolerance'])
+        self.param_tolerance = kwargs.get('param_tolerance', EARLY_STOPPING_CONFIG['param_tolerance'])
+        self.target_loss = kwargs.get('target_loss', EARLY_STOPPING_CONFIG['target_loss'])
+        self.target_r2 = kwargs.get('target_r2', EARLY_STOPPING_CONFIG['target_r2'])
+
+        self.loss_history = []
+        self.loss_rounds = []
+        self.param_deltas = []
+        self.best_loss = None
+        self.best_round = None
+        self.rounds_without_improvement = 0
+        self.last_round = 0
+        self.stopped_round = None
+        self.stop_reason = None
+        self._previous_params = None
+
+    def update_parameters(self, server_round: int, parameters: List[np.ndarray]) -> float:
+        """Registrar el cambio relativo de los parámetros globales de la ronda"""
+        self.last_round = max(self.last_round, server_round)
+        delta = np.inf
+
+        previous = self._previous_params
+        if previous is not None and len(previous) == len(parameters) and all(
+                p.shape == q.shape for p, q in zip(previous, parameters)):
+            diff_norm = np.sqrt(sum(float(np.sum((p - q) ** 2)) for p, q in zip(parameters, previous)))
+            prev_norm = np.sqrt(sum(float(np.sum(q ** 2)) for q in previous))
+            delta = diff_norm / (prev_norm + 1e-12)
+
+        self._previous_params = [np.array(p, copy=True) for p in parameters]
+        self.param_deltas.append(delta)
+
+        if server_round >= self.min_rounds and delta < self.param_tolerance:
+            self._stop(server_round, 'parameters')
+        return delta
+
+    def update_loss(self, server_round: int, loss: Optional[float]) -> None:
+        """Registrar la pérdida agregada de la ronda"""
+        if loss is None or not np.isfinite(loss):
+            return
+        self.last_round = max(self.last_round, server_round)
+        self.loss_history.append(loss)
+        self.loss_rounds.append(server_round)
+
+        if self.best_loss is None or loss < self.best_loss * (1 - self.tolerance):
+            self.best_loss = loss
+            self.best_round = server_round
+            self.rounds_without_improvement = 0
+        else:
+            self.rounds_without_improvement += 1
+
+        if server_round >= self.min_rounds and self.rounds_without_improvement >= self.patience:
+            self._stop(server_round, 'loss')
+
+    def _stop(self, server_round: int, reason: str) -> None:
+        if self.enabled and self.stopped_round is None:
+            self.stopped_round = server_round
+            self.stop_reason = reason
+            print(f"[EARLY STOPPING] Convergencia en ronda {server_round} ({reason})", flush=True)
+
+    def should_stop(self) -> bool:
+        """Indicar si ya no deben ejecutarse más rondas"""
+        return self.stopped_round is not None
+
+    def set_target_variance(self, variance: float) -> None:
+        """Objetivo común del R² configurado sobre un conjunto fijo (si no hay pérdida absoluta)"""
+        if self.target_loss is None and self.target_r2 is not None:
+            self.target_loss = (1.0 - self.target_r2) * float(variance)
+
+    def rounds_to_target(self) -> Optional[int]:
+        """Primera ronda con la pérdida objetivo común (None sin objetivo configurado)
+
+        Un objetivo relativo a la mejor pérdida de cada ejecución no permite comparar
+        estrategias entre sí, así que solo se usa el absoluto de la configuración.
+        """
+        if self.target_loss is None:
+            return None
+        for server_round, loss in zip(self.loss_rounds, self.loss_history):
+            if loss <= self.target_loss:
+                return server_round
+        return None
+
+    def get_summary(self) -> dict:
+        """Resumen de la convergencia para los resultados del experimento"""
+        return {
+            'stopped_round': self.stopped_round if self.stopped_round is not None else self.last_round,
+            'early_stopped': self.stopped_round is not None,
+            'stop_reason': self.stop_reason or '',
+            'best_loss': self.best_loss,
+            'best_round': self.best_round,
+            'rounds_to_target': self.rounds_to_target(),
+            'target_loss': self.target_loss,
+        }
@@ -0,0 +1,114 @@
+"""
+Códigos de motivo por predicción calculados en la misma pasada que el score
+
+Contribución de cada variable (escalada) a la predicción de cada fila, por lotes
+y sin explicadores fila a fila:
+
+- Modelos lineales: coeficiente × variable escalada (exacta: sesgo + suma = score)
+- MLP: gradiente × entrada, con el gradiente de la salida obtenido por
+  retropropagación en el mismo lote que la predicción
+- Árboles: descomposición de Saabas sobre el bosque plano (exacta)
+
+Los motivos de una fila son las variables con contribución más negativa, es
+decir, las que más bajan su score. KNN no tiene atribución.
+"""
+import os
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.models.base_model import LINEAR_MODELS, TREE_MODELS
+from federated.models.tree_ensemble import FlatForest, forest_to_arrays
+from federated.models.personalization import ACTIVATIONS
+from federated.models.local_solvers import ACTIVATION_DERIVATIVES
+from config import EXPLANATION_CONFIG
+
+
+def linear_contributions(parameters: List[np.ndarray], X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    coef = np.ravel(parameters[0])
+    intercept = parameters[1][0] if len(parameters) > 1 else 0.0
+    contributions = X * coef
+    return contributions.sum(axis=1) + intercept, contributions
+
+
+def mlp_contributions(parameters: List[np.ndarray], X: np.ndarray,
+                      activation: str = 'relu') -> Tuple[np.ndarray, np.ndarray]:
+    """Predicción y gradiente × entrada de un MLP (pesos primero, sesgos después)"""
+    num_layers = len(parameters) // 2
+    coefs, intercepts = parameters[:num_layers], parameters[num_layers:]
+    activations = [X]
+    for i, (coef, intercept) in enumerate(zip(coefs, intercepts)):
+        z = activations[-1] @ coef + intercept
+        activations.append(z if i == num_layers - 1 else ACTIVATIONS[activation](z))
+
+    gradient = np.ones((len(X), 1), dtype=X.dtype)
+    for i in range(num_layers - 1, -1, -1):
+        gradient = gradient @ coefs[i].T
+        if i > 0:
+            gradient *= ACTIVATION_DERIVATIVES[activation](activations[i])
+    return activations[-1][:, 0], gradient * X
+
+
+def _forest(model) -> Optional[FlatForest]:
+    """Bosque plano del modelo: el global recibido o los árboles locales"""
+    if isinstance(getattr(model, 'global_model', None), FlatForest):
+        return model.global_model
+    estimator = model.model
+    if hasattr(estimator, 'estimators_'):
+        return FlatForest(forest_to_arrays(estimator.estimators_, estimator.n_features_in_))
+    if hasattr(estimator, 'tree_'):
+        return FlatForest(forest_to_arrays([estimator], estimator.n_features_in_))
+    return None
+
+
+def explain(model, X: np.ndarray,
+            batch_size: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Predicciones y contribuciones (filas × variables) de un BaseModel, por lotes
+
+    Devuelve None si el modelo no admite atribución (KNN, estimadores sin BaseModel).
+    """
+    model_type = getattr(model, 'model_type', None)
+    batch_size = batch_size or EXPLANATION_CONFIG['batch_size']
+    if model_type in LINEAR_MODELS or model_type == 'mlp':
+        parameters = [np.asarray(p) for p in model.get_parameters()]
+        if model_type == 'mlp':
+            activation = getattr(model.model, 'activation', 'relu')
+            batch_fn = lambda batch: mlp_contributions(parameters, batch, activation)
+        else:
+            batch_fn = lambda batch: linear_contributions(parameters, batch)
+        X = np.asarray(X, dtype=getattr(model, 'dtype', None))
+    elif model_type in TREE_MODELS:
+        forest = _forest(model)
+        if forest is None:
+            return None
+        batch_fn = forest.predict_contributions
+        X = np.asarray(X)
+    else:
+        return None
+
+    predictions = np.empty(len(X))
+    contributions = np.empty(X.shape)
+    for start in range(0, len(X), batch_size):
+        batch = X[start:start + batch_size]
+        predictions[start:start + len(batch)], contributions[start:start + len(batch)] = batch_fn(batch)
+    return predictions, contributions
+
+
+def top_reasons(contributions: np.ndarray, feature_names: Sequence[str],
+                top_n: Optional[int] = None) -> List[np.ndarray]:
+    """Nombres de las `top_n` variables que más bajan el score de cada fila
+
+    Una columna por posición; '' cuando quedan menos variables con contribución negativa.
+    """
+    top_n = min(top_n or EXPLANATION_CONFIG['top_n'], contributions.shape[1])
+    if top_n <= 0:
+        return []
+    indices = np.argpartition(contributions, top_n - 1, axis=1)[:, :top_n]
+    values = np.take_along_axis(contributions, indices, axis=1)
+    order = np.argsort(values, axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    # La última posición es el motivo vacío
+    names = np.asarray(list(feature_names) + [''], dtype=object)
+    indices = np.where(values < 0, indices, len(names) - 1)
+    return [names[indices[:, j]] for j in range(top_n)]
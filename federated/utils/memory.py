@@ -0,0 +1,113 @@
+"""
+Perfil de memoria de los clientes simulados
+
+Cada cliente mide durante su entrenamiento local el RSS del proceso, el RSS
+pico y, con tracemalloc, el pico de memoria reservada por Python y las líneas
+de código que más reservan. Las medidas viajan en las métricas de fit y el
+servidor las registra por cliente y ronda, junto con su propio RSS.
+
+El RSS pico (ru_maxrss) es del proceso: un actor de Ray que ejecuta varios
+clientes acumula el máximo de todos ellos. El pico de tracemalloc sí es propio
+de cada llamada, porque se reinicia al empezar a medir.
+
+El perfil es opcional: se activa con MEMORY_PROFILING_CONFIG['enabled'] o la
+variable de entorno FEDERATED_MEMORY_PROFILING=1.
+"""
+import os
+import tracemalloc
+import contextlib
+from typing import Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import MEMORY_PROFILING_CONFIG
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+# Reservas propias de la medición que no interesa reportar
+_IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>',
+                  '<frozen importlib._bootstrap_external>')
+
+
+def memory_profiling_enabled() -> bool:
+    return MEMORY_PROFILING_CONFIG['enabled'] or os.environ.get('FEDERATED_MEMORY_PROFILING') == '1'
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS actual del proceso (Linux: /proc/self/statm)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """RSS pico del proceso desde su inicio"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return peak / MB if sys.platform == 'darwin' else peak / 1024
+
+
+def top_allocators(snapshot: tracemalloc.Snapshot, limit: int) -> str:
+    """Líneas con más memoria reservada, como texto ('archivo:línea=MB; ...')
+
+    Se devuelve texto porque las métricas de Flower solo admiten escalares.
+    """
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, name) for name in _IGNORED_FILES])
+    entries = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        entries.append(f"{os.path.basename(frame.filename)}:{frame.lineno}={stat.size / MB:.2f}MB")
+    return '; '.join(entries)
+
+
+@contextlib.contextmanager
+def profile_memory(limit: int = None):
+    """Medir la memoria del bloque; el diccionario devuelto se rellena al salir
+
+    Uso:
+        with profile_memory() as memory:
+            entrenar()
+        metrics.update(memory)
+    """
+    limit = MEMORY_PROFILING_CONFIG['top_allocators'] if limit is None else limit
+    usage = {}
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield usage
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot() if limit else None
+        if started:
+            tracemalloc.stop()
+        usage.update({
+            'mem_rss_mb': current_rss_mb(),
+            'mem_peak_rss_mb': peak_rss_mb(),
+            'mem_traced_mb': current / MB,
+            'mem_traced_peak_mb': peak / MB,
+        })
+        if snapshot is not None:
+            usage['mem_top_allocators'] = top_allocators(snapshot, limit)
+        # Sin /proc ni resource no hay medida de RSS
+        for key in [k for k, v in usage.items() if v is None]:
+            usage.pop(key)
+
+
+def rss_alarm(rss_mb: Optional[float], where: str, alarm_mb: float = None) -> bool:
+    """Avisar si un RSS supera el umbral configurado"""
+    alarm_mb = MEMORY_PROFILING_CONFIG['alarm_rss_mb'] if alarm_mb is None else alarm_mb
+    if rss_mb is None or not alarm_mb or rss_mb <= alarm_mb:
+        return False
+    print(f"⚠️ Memoria: {where} alcanza {rss_mb:.0f} MB de RSS (umbral {alarm_mb:.0f} MB)", flush=True)
+    return True
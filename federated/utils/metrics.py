@@ -1,11 +1,51 @@
 import os
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from config import PROCESSED_DATA_DIR, FEDERATED_CONFIG  
-from federated.models.base_model import BaseModel
+from config import PROCESSED_DATA_DIR, FEDERATED_CONFIG, SERVER_EVAL_CONFIG
+from federated.utils.columnar import client_data_path, read_client_frame
 import time
 
+# Cuantiles del error absoluto incluidos en las métricas
+RESIDUAL_QUANTILES = (0.5, 0.9, 0.99)
+
+def regression_metrics(y_true, y_pred) -> dict:
+    """Métricas de regresión calculadas sobre un único vector de residuos
+
+    Sustituye a las llamadas separadas de sklearn (cada una revalida las
+    entradas y recorre los datos de nuevo).
+    """
+    y_true = np.asarray(y_true, dtype=np.float64).ravel()
+    residuals = np.asarray(y_pred, dtype=np.float64).ravel() - y_true
+    abs_residuals = np.abs(residuals)
+
+    mse = float(np.dot(residuals, residuals)) / len(y_true)
+    centered = y_true - y_true.mean()
+    variance = float(np.dot(centered, centered)) / len(y_true)
+    quantiles = np.quantile(abs_residuals, RESIDUAL_QUANTILES)
+
+    metrics = {
+        'mae': float(abs_residuals.mean()),
+        'mse': mse,
+        'rmse': float(np.sqrt(mse)),
+        'r2': 1.0 - mse / variance if variance > 0 else 0.0,
+    }
+    for q, value in zip(RESIDUAL_QUANTILES, quantiles):
+        metrics[f'residual_p{int(round(q * 100))}'] = float(value)
+    return metrics
+
+def load_validation_set(dtype=None):
+    """Cargar el conjunto reservado para la evaluación en el servidor
+
+    Solo el que escribe el preprocesamiento: sin él devuelve (None, None) en lugar
+    de leer las particiones de los bancos, que no salen de cada cliente.
+    """
+    path = SERVER_EVAL_CONFIG['validation_path']
+    if not os.path.exists(path):
+        print(f"No existe el conjunto reservado {path}: vuelve a ejecutar scripts/preprocess_data.py")
+        return None, None
+    df = pd.read_csv(path, dtype=dtype)
+    return df.drop("Score", axis=1).values, df["Score"].values
+
 def compute_metrics_global(model_type: str):
     """Entrena y evalúa un modelo centralizado para obtener métricas globales"""
 
@@ -13,9 +53,9 @@ def compute_metrics_global(model_type: str):
         # Cargar todos los datos federados
         all_data = []
         for i in range(1, 1 +  FEDERATED_CONFIG["num_clients"]):
-            path = os.path.join(PROCESSED_DATA_DIR, f"banco{i}.csv")
+            path = client_data_path(PROCESSED_DATA_DIR, i)
             if os.path.exists(path):
-                df = pd.read_csv(path)
+                df = read_client_frame(path)
                 all_data.append(df)
 
         if not all_data:
@@ -26,6 +66,7 @@ def compute_metrics_global(model_type: str):
         X = full_df.drop("Score", axis=1).values
         y = full_df["Score"].values
 
+        from federated.models.base_model import BaseModel
         model = BaseModel(model_type)
 
         # Entrenar modelo
@@ -39,14 +80,12 @@ def compute_metrics_global(model_type: str):
         inference_time = (time.time() - t0) / len(y)
 
         # Calcular métricas
-        mae = mean_absolute_error(y, y_pred)
-        mse = mean_squared_error(y, y_pred)
-        r2 = r2_score(y, y_pred)
+        metrics = regression_metrics(y, y_pred)
 
         return {
-            "mae": mae,
-            "mse": mse,
-            "r2": r2,
+            "mae": metrics["mae"],
+            "mse": metrics["mse"],
+            "r2": metrics["r2"],
             "avg_training_time": training_time,
             "avg_inference_time": inference_time,
             "total_samples": len(y)
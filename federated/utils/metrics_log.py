@@ -0,0 +1,104 @@
+"""
+Registro de métricas por ronda en streaming (JSONL de solo anexado)
+"""
+import os
+import json
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import METRICS_LOG_CONFIG
+
+
+def _to_builtin(value):
+    """Convertir tipos de numpy para serializar en JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class MetricsLogger:
+    """Escribe un registro JSON por línea a medida que se producen las métricas"""
+
+    def __init__(self, run_id: str, path: Optional[str] = None, enabled: Optional[bool] = None):
+        self.run_id = run_id
+        self.path = path or METRICS_LOG_CONFIG['path']
+        self.enabled = METRICS_LOG_CONFIG['enabled'] if enabled is None else enabled
+        if self.enabled:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def log(self, event: str, **fields) -> None:
+        """Anexar un registro y volcarlo inmediatamente a disco"""
+        if not self.enabled:
+            return
+        record = {'ts': time.time(), 'run_id': self.run_id, 'event': event, **fields}
+        line = json.dumps(record, default=_to_builtin) + '\n'
+        try:
+            # Una escritura por línea en modo anexado: los lectores nunca ven líneas mezcladas
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+        except OSError as e:
+            print(f"Error escribiendo registro de métricas: {e}")
+
+
+def read_metrics_log(path: Optional[str] = None, offset: int = 0,
+                     run_id: Optional[str] = None, max_records: int = 1000) -> Tuple[List[Dict], int]:
+    """Leer los registros nuevos a partir de un desplazamiento en bytes (modo follow)"""
+    path = path or METRICS_LOG_CONFIG['path']
+    if not os.path.exists(path):
+        return [], 0
+
+    records = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while len(records) < max_records:
+            line = f.readline()
+            # Una línea sin salto final aún se está escribiendo
+            if not line or not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            record = json.loads(line)
+            if run_id is None or record.get('run_id') == run_id:
+                records.append(record)
+    return records, offset
+
+
+def _parse_lines(data: bytes, run_id: Optional[str]) -> List[Dict]:
+    records = [json.loads(line) for line in data.splitlines() if line.strip()]
+    if run_id is not None:
+        records = [r for r in records if r.get('run_id') == run_id]
+    return records
+
+
+def tail_metrics_log(path: Optional[str] = None, n: int = 50,
+                     run_id: Optional[str] = None, block_size: int = 65536) -> Tuple[List[Dict], int]:
+    """Últimos n registros del archivo, leyendo bloques desde el final
+
+    Devuelve también el desplazamiento desde el que continuar con read_metrics_log.
+    """
+    path = path or METRICS_LOG_CONFIG['path']
+    if not os.path.exists(path):
+        return [], 0
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+            # Descartar la primera línea si el bloque empieza a mitad de ella
+            complete = data if position == 0 else data[data.find(b'\n') + 1:]
+            if len(_parse_lines(complete[:complete.rfind(b'\n') + 1], run_id)) >= n:
+                break
+
+    # Ignorar una posible última línea que aún se está escribiendo
+    end = data.rfind(b'\n') + 1
+    complete = data[:end] if position == 0 else data[data.find(b'\n') + 1:end]
+    return _parse_lines(complete, run_id)[-n:], position + end
@@ -0,0 +1,64 @@
+"""
+Modo de precisión (float32 / float64) de datos, parámetros, ruido y agregación
+
+La precisión se elige con PRECISION_CONFIG['dtype'] o la variable de entorno
+FEDERATED_PRECISION, que heredan el servidor y los actores de Ray de los
+clientes. En float32 los datos locales, los parámetros del modelo, el ruido de
+privacidad diferencial y la agregación trabajan en 32 bits, lo que reduce a la
+mitad la memoria y el tamaño de las cargas enviadas.
+"""
+import os
+import numpy as np
+from typing import Dict, List, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from federated.models.tree_ensemble import FOREST_VALUE, is_forest_payload
+from config import PRECISION_CONFIG
+
+PRECISION_ENV = 'FEDERATED_PRECISION'
+SUPPORTED_PRECISIONS = ('float32', 'float64')
+
+# Métricas del resultado que se comparan con la ejecución de referencia en float64
+COMPARED_METRICS = ('loss', 'mse', 'mae', 'r2', 'avg_payload_bytes')
+
+
+def get_precision(precision: Optional[str] = None) -> str:
+    """Precisión indicada, la del entorno o la configurada"""
+    precision = precision or os.environ.get(PRECISION_ENV) or PRECISION_CONFIG['dtype']
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(f"Precisión no soportada: {precision}")
+    return precision
+
+
+def get_dtype(precision: Optional[str] = None) -> np.dtype:
+    return np.dtype(get_precision(precision))
+
+
+def cast_parameters(parameters: List[np.ndarray], dtype) -> List[np.ndarray]:
+    """Convertir los arrays de coma flotante de una carga a la precisión indicada
+
+    Las cabeceras, índices y máscaras enteras no cambian. En los bosques solo se
+    convierten los valores de las hojas: sklearn compara las muestras (float32)
+    con umbrales float64 y redondear los umbrales cambiaría la hoja alcanzada.
+    """
+    dtype = np.dtype(dtype)
+    castable = [FOREST_VALUE] if is_forest_payload(parameters) else range(len(parameters))
+    parameters = list(parameters)
+    for idx in castable:
+        if parameters[idx].dtype.kind == 'f':
+            parameters[idx] = parameters[idx].astype(dtype, copy=False)
+    return parameters
+
+
+def compare_precision(result: Dict, reference: Dict) -> Dict:
+    """Métricas de la ejecución en float64 y diferencias respecto al resultado"""
+    comparison = {}
+    for key in COMPARED_METRICS:
+        value, base = result.get(key), reference.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+            continue
+        comparison[f"float64_{key}"] = base
+        comparison[f"{key}_diff_vs_float64"] = value - base
+    if comparison.get('float64_avg_payload_bytes'):
+        comparison['payload_ratio_vs_float64'] = result['avg_payload_bytes'] / reference['avg_payload_bytes']
+    return comparison
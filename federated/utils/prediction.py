@@ -8,22 +8,60 @@ import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from config import MODELS_DIR, PROCESSED_DATA_DIR
+from config import MODELS_DIR, PROCESSED_DATA_DIR, EXPORT_CONFIG, EXPLANATION_CONFIG
+from federated.models.export import (is_exported_model, load_exported_model,
+                                     load_exported_preprocessor, read_manifest)
+from federated.models.personalization import PERSONALIZATION_MODES, Personalizer
+from federated.utils.client_state import ClientStateStore
+from federated.utils.explanations import explain, top_reasons
 
 class PredictionService:
     """Servicio para realizar predicciones con el modelo federado"""
     
-    def __init__(self):
+    def __init__(self, model_path=None, preprocessor_path=None, client_id=None, client_state_dir=None):
         self.model = None
         self.preprocessor = None
+        self.manifest = None
+        self.model_path = model_path or self.default_model_path()
+        # Un modelo exportado incluye su preprocesador; un preprocessor_path explícito lo sustituye
+        self.explicit_preprocessor = preprocessor_path is not None
+        self.preprocessor_path = preprocessor_path or os.path.join(PROCESSED_DATA_DIR, 'preprocessor.pkl')
         self.load_model()
         self.load_preprocessor()
+        if client_id is not None:
+            self.personalize(client_id, client_state_dir)
+
+    def personalize(self, client_id, client_state_dir=None):
+        """Usar los parámetros personales del banco indicado, si los hay"""
+        model_type = getattr(self.model, 'model_type', None)
+        if model_type not in PERSONALIZATION_MODES:
+            return
+        state = ClientStateStore(model_type, client_state_dir).load(client_id)
+        if state is None:
+            print(f"Sin estado personal para el banco {client_id}: se usa el modelo global")
+            return
+        personal = Personalizer(model_type).apply(self.model.get_parameters(), state)
+        self.model.set_parameters(personal)
+        print(f"Modelo personalizado del banco {client_id}")
     
+    @staticmethod
+    def default_model_path():
+        """Modelo exportado por el último experimento o, si no hay, el pickle clásico"""
+        if is_exported_model(EXPORT_CONFIG['serving_dir']):
+            return EXPORT_CONFIG['serving_dir']
+        return os.path.join(MODELS_DIR, 'modelo_final.pkl')
+
     def load_model(self):
         """Cargar modelo entrenado"""
         try:
-            model_path = os.path.join(MODELS_DIR, 'modelo_final.pkl')
-            if os.path.exists(model_path):
+            model_path = self.model_path
+            if is_exported_model(model_path):
+                # Parámetros mapeados en memoria: sin unpickle ni copia
+                self.model = load_exported_model(model_path)
+                self.preprocessor = load_exported_preprocessor(model_path)
+                self.manifest = read_manifest(model_path)
+                print(f"Modelo exportado cargado ({self.manifest['model_type']}, {self.manifest.get('run_id')})")
+            elif os.path.exists(model_path):
                 self.model = joblib.load(model_path)
                 print("Modelo cargado exitosamente")
             else:
@@ -34,7 +72,9 @@ class PredictionService:
     def load_preprocessor(self):
         """Cargar preprocessor para transformar datos"""
         try:
-            preprocessor_path = os.path.join(PROCESSED_DATA_DIR, 'preprocessor.pkl')
+            if self.preprocessor is not None and not self.explicit_preprocessor:
+                return
+            preprocessor_path = self.preprocessor_path
             if os.path.exists(preprocessor_path):
                 self.preprocessor = joblib.load(preprocessor_path)
                 print("Preprocessor cargado exitosamente")
@@ -87,6 +127,15 @@ class PredictionService:
             print(f"Error en preprocesamiento: {e}")
             return None, None
     
+    def _predict_with_reasons(self, df_processed):
+        """Predicciones y, si el modelo lo admite, motivos por fila en la misma pasada"""
+        X = df_processed.values
+        explanation = explain(self.model, X) if EXPLANATION_CONFIG['enabled'] else None
+        if explanation is None:
+            return self.model.predict(X), []
+        predictions, contributions = explanation
+        return predictions, top_reasons(contributions, df_processed.columns)
+
     def predict_from_csv(self, csv_path):
         """Realizar predicciones desde archivo CSV"""
         try:
@@ -105,8 +154,8 @@ class PredictionService:
             if df_processed is None:
                 return None
             
-            # Realizar predicciones
-            predictions = self.model.predict(df_processed.values)
+            # Realizar predicciones (con los códigos de motivo de cada fila)
+            predictions, reasons = self._predict_with_reasons(df_processed)
             
             # Crear DataFrame de resultados
             results = pd.DataFrame({
@@ -122,6 +171,10 @@ class PredictionService:
             
             # Añadir categoría de riesgo basada en score
             results['Categoria_Riesgo'] = results['Score_Predicho'].apply(self._categorize_risk)
+
+            # Variables que más bajan el score de cada solicitante
+            for position, column in enumerate(reasons, start=1):
+                results[f'Razon_{position}'] = column
             
             print(f"Predicciones completadas: {len(results)} registros")
             return results
@@ -161,11 +214,13 @@ class PredictionService:
                 return None
             
             # Predecir
-            prediction = self.model.predict(df_processed.values)[0]
+            predictions, reasons = self._predict_with_reasons(df_processed)
+            prediction = predictions[0]
             
             return {
                 'score': round(prediction, 2),
-                'risk_category': self._categorize_risk(prediction)
+                'risk_category': self._categorize_risk(prediction),
+                'reasons': [column[0] for column in reasons if column[0]]
             }
             
         except Exception as e:
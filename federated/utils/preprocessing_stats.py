@@ -0,0 +1,276 @@
+"""
+Estadísticos de preprocesamiento calculados localmente por cada cliente y combinados en el servidor
+"""
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, List, Optional
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+
+class ClientStatistics:
+    """Momentos por columna y conteos de categorías, actualizables por bloques y combinables"""
+
+    def __init__(self, target_column: str = 'Score'):
+        self.target_column = target_column
+        self.columns = None
+        self.categorical_columns = []
+        self.n_rows = 0
+        self.count = {}
+        self.mean = {}
+        self.m2 = {}
+        self.nulls = {}
+        self.category_counts = {}
+
+    def _init_columns(self, df: pd.DataFrame) -> None:
+        self.columns = list(df.columns)
+        self.categorical_columns = [
+            col for col in df.columns
+            if not pd.api.types.is_numeric_dtype(df[col]) and col != self.target_column
+        ]
+        for col in self.columns:
+            self.count[col] = 0
+            self.mean[col] = 0.0
+            self.m2[col] = 0.0
+            self.nulls[col] = 0
+        for col in self.categorical_columns:
+            self.category_counts[col] = Counter()
+
+    def update(self, df: pd.DataFrame) -> 'ClientStatistics':
+        """Incorporar un bloque de filas (una sola pasada sobre los datos)"""
+        if self.columns is None:
+            self._init_columns(df)
+
+        self.n_rows += len(df)
+        nulls = df[self.columns].isnull().sum()
+        for col in self.columns:
+            self.nulls[col] += int(nulls[col])
+
+        # Momentos del bloque para todas las columnas numéricas a la vez
+        numeric_columns = [col for col in self.columns if col not in self.categorical_columns]
+        values = df[numeric_columns].to_numpy(dtype=np.float64)
+        counts = np.sum(~np.isnan(values), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.nansum(values, axis=0) / counts
+            m2s = np.nansum((values - means) ** 2, axis=0)
+        for i, col in enumerate(numeric_columns):
+            if counts[i] > 0:
+                self._merge_moments(col, int(counts[i]), float(means[i]), float(m2s[i]))
+
+        for col in self.categorical_columns:
+            self.category_counts[col].update(df[col].dropna().astype(str).value_counts().to_dict())
+        return self
+
+    def _merge_moments(self, col: str, count: int, mean: float, m2: float) -> None:
+        """Combinar momentos con la fórmula paralela de Chan"""
+        total = self.count[col] + count
+        delta = mean - self.mean[col]
+        self.m2[col] += m2 + delta ** 2 * self.count[col] * count / total
+        self.mean[col] += delta * count / total
+        self.count[col] = total
+
+    def merge(self, other: 'ClientStatistics') -> 'ClientStatistics':
+        """Combinar los estadísticos de otro cliente (operación del servidor)"""
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self.categorical_columns = list(other.categorical_columns)
+            for col in self.columns:
+                self.count[col], self.mean[col], self.m2[col], self.nulls[col] = 0, 0.0, 0.0, 0
+            for col in self.categorical_columns:
+                self.category_counts[col] = Counter()
+
+        self.n_rows += other.n_rows
+        for col in self.columns:
+            self.nulls[col] += other.nulls[col]
+            if col not in self.categorical_columns and other.count[col] > 0:
+                self._merge_moments(col, other.count[col], other.mean[col], other.m2[col])
+        for col in self.categorical_columns:
+            self.category_counts[col].update(other.category_counts[col])
+        return self
+
+    def to_dict(self) -> Dict:
+        """Resumen serializable que el cliente envía al servidor"""
+        return {
+            'target_column': self.target_column,
+            'columns': self.columns,
+            'categorical_columns': self.categorical_columns,
+            'n_rows': self.n_rows,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'nulls': self.nulls,
+            'category_counts': {col: dict(c) for col, c in self.category_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ClientStatistics':
+        stats = cls(data['target_column'])
+        stats.columns = data['columns']
+        stats.categorical_columns = data['categorical_columns']
+        stats.n_rows = data['n_rows']
+        stats.count = dict(data['count'])
+        stats.mean = dict(data['mean'])
+        stats.m2 = dict(data['m2'])
+        stats.nulls = dict(data['nulls'])
+        stats.category_counts = {col: Counter(c) for col, c in data['category_counts'].items()}
+        return stats
+
+
+class ReservoirSample:
+    """Muestra uniforme de tamaño fijo de cada columna numérica (algoritmo R por bloques)
+
+    Permite estimar medianas de imputación en una sola pasada con memoria
+    acotada; con menos valores que `size` la mediana es exacta.
+    """
+
+    def __init__(self, size: int = 100000, seed: int = 42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.samples = {}
+        self.seen = {}
+
+    def update(self, df: pd.DataFrame, columns: List[str]) -> 'ReservoirSample':
+        for col in columns:
+            values = df[col].to_numpy(dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if col not in self.samples:
+                self.samples[col] = np.empty(self.size, dtype=np.float64)
+                self.seen[col] = 0
+            sample, seen = self.samples[col], self.seen[col]
+
+            # Los primeros valores llenan la muestra directamente
+            fill = min(len(values), max(self.size - seen, 0))
+            sample[seen:seen + fill] = values[:fill]
+            rest = values[fill:]
+            if len(rest):
+                # El valor t-ésimo sustituye a una posición al azar con probabilidad size/t
+                positions = self.rng.integers(0, seen + fill + np.arange(1, len(rest) + 1))
+                keep = positions < self.size
+                sample[positions[keep]] = rest[keep]
+            self.seen[col] = seen + len(values)
+        return self
+
+    def medians(self) -> Dict[str, float]:
+        return {col: float(np.median(sample[:min(self.seen[col], self.size)]))
+                for col, sample in self.samples.items() if self.seen[col] > 0}
+
+
+class SeenKeys:
+    """Conjunto de claves enteras ya vistas (p. ej. IDs) en arrays ordenados
+
+    Ocupa 8 bytes por clave, frente a decenas en un set de Python. Las claves se
+    guardan en tramos ordenados que se fusionan cuando dos consecutivos tienen
+    tamaño parecido, de modo que añadir y consultar cuestan O(log n) tramos.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def _contains(self, keys: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            found |= run[positions] == keys
+        return found
+
+    def add_new(self, keys: np.ndarray) -> np.ndarray:
+        """Registrar las claves y devolver la máscara de las que no se habían visto
+        (la primera aparición dentro del propio bloque cuenta como nueva)"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        _, first = np.unique(keys, return_index=True)
+        new = np.zeros(len(keys), dtype=bool)
+        new[first] = True
+        new &= ~self._contains(keys)
+        if new.any():
+            self.runs.append(np.sort(keys[new]))
+            while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+                last = self.runs.pop()
+                self.runs[-1] = np.union1d(self.runs[-1], last)
+        return new
+
+
+def merge_client_statistics(client_stats: List[ClientStatistics]) -> ClientStatistics:
+    """Combinar los estadísticos de todos los clientes"""
+    merged = ClientStatistics(client_stats[0].target_column)
+    for stats in client_stats:
+        merged.merge(stats)
+    return merged
+
+
+def build_preprocessor(stats: ClientStatistics, fill_values: Optional[Dict] = None) -> Dict:
+    """Construir el diccionario de categorías, valores de imputación y escalador global
+
+    Los nulos numéricos se imputan con la media global (exacta a partir de los
+    momentos), de modo que el escalador resultante coincide con el que se
+    obtendría ajustándolo sobre los datos imputados. Con ``fill_values`` se
+    pueden indicar otros valores de imputación (p. ej. medianas).
+    """
+    fill_values = dict(fill_values or {})
+    label_encoders = {}
+    feature_columns = [col for col in stats.columns if col != stats.target_column]
+    means, variances = [], []
+
+    for col in feature_columns:
+        if col in stats.categorical_columns:
+            counts = Counter(stats.category_counts[col])
+            # Moda (empate: el menor valor, como pandas.Series.mode)
+            if col not in fill_values:
+                fill_values[col] = min(counts.items(), key=lambda item: (-item[1], item[0]))[0] \
+                    if counts else 'Unknown'
+            counts[fill_values[col]] += stats.nulls[col]
+
+            encoder = LabelEncoder()
+            encoder.classes_ = np.array(sorted(counts.keys()), dtype=object)
+            label_encoders[col] = encoder
+
+            # Momentos de los códigos a partir de los conteos
+            codes = np.arange(len(encoder.classes_), dtype=np.float64)
+            weights = np.array([counts[c] for c in encoder.classes_], dtype=np.float64)
+            mean = np.sum(codes * weights) / weights.sum()
+            means.append(mean)
+            variances.append(np.sum(weights * (codes - mean) ** 2) / weights.sum())
+        else:
+            n, mean, m2 = stats.count[col], stats.mean[col], stats.m2[col]
+            fill = fill_values.setdefault(col, mean)
+            k = stats.n_rows - n
+            # Incorporar los k valores imputados como un grupo de varianza nula
+            total = n + k
+            delta = fill - mean
+            m2 = m2 + delta ** 2 * n * k / total if total else 0.0
+            mean = mean + delta * k / total if total else 0.0
+            means.append(mean)
+            variances.append(m2 / total if total else 0.0)
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(means, dtype=np.float64)
+    scaler.var_ = np.array(variances, dtype=np.float64)
+    scale = np.sqrt(scaler.var_)
+    scaler.scale_ = np.where(scale < 10 * np.finfo(np.float64).eps, 1.0, scale)
+    scaler.n_samples_seen_ = np.int64(stats.n_rows)
+    scaler.n_features_in_ = len(feature_columns)
+    scaler.feature_names_in_ = np.array(feature_columns, dtype=object)
+
+    return {
+        'label_encoders': label_encoders,
+        'scaler': scaler,
+        'fill_values': fill_values,
+    }
+
+
+def transform_chunk(df: pd.DataFrame, preprocessor: Dict, target_column: str = 'Score') -> pd.DataFrame:
+    """Aplicar localmente la imputación, codificación y escalado globales a un bloque"""
+    df = df.copy()
+    fill_values = preprocessor.get('fill_values', {})
+    if fill_values:
+        df = df.fillna({col: val for col, val in fill_values.items() if col in df.columns})
+
+    for col, encoder in preprocessor['label_encoders'].items():
+        mapping = {cls: code for code, cls in enumerate(encoder.classes_)}
+        df[col] = df[col].astype(str).map(mapping).fillna(0).astype(np.int64)
+
+    scaler = preprocessor['scaler']
+    feature_columns = list(scaler.feature_names_in_)
+    df[feature_columns] = scaler.transform(df[feature_columns])
+    return df
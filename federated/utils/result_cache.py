@@ -0,0 +1,171 @@
+"""
+Caché de resultados de experimentos direccionada por contenido
+
+La clave de cada experimento combina el hash de los datos procesados, la
+configuración completa del experimento y el hash del código que lo ejecuta.
+El código de agregación se resume por estrategia, de modo que añadir o
+modificar una estrategia solo invalida los experimentos que la usan.
+"""
+import os
+import glob
+import json
+import shutil
+import hashlib
+import inspect
+from typing import Dict, Iterable, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (BASE_DIR, PROCESSED_DATA_DIR, RESULT_CACHE_CONFIG, FEDERATED_CONFIG,
+                    PRIVACY_CONFIG, EARLY_STOPPING_CONFIG, SERVER_EVAL_CONFIG,
+                    TREE_FEDERATION_CONFIG, KNN_FEDERATION_CONFIG, SECURE_AGGREGATION_CONFIG,
+                    PERSONALIZATION_CONFIG, CLIENT_DRIFT_CONFIG, SERVER_OPTIMIZER_CONFIG,
+                    HIERARCHICAL_CONFIG)
+
+# Configuración global que influye en el resultado de cualquier experimento
+EXPERIMENT_CONFIGS = {
+    'federated': FEDERATED_CONFIG,
+    'privacy': PRIVACY_CONFIG,
+    'early_stopping': EARLY_STOPPING_CONFIG,
+    'server_eval': SERVER_EVAL_CONFIG,
+    'tree_federation': TREE_FEDERATION_CONFIG,
+    'knn_federation': KNN_FEDERATION_CONFIG,
+    'secure_aggregation': SECURE_AGGREGATION_CONFIG,
+    'personalization': PERSONALIZATION_CONFIG,
+    'client_drift': CLIENT_DRIFT_CONFIG,
+    'server_optimizer': SERVER_OPTIMIZER_CONFIG,
+    'hierarchical': HIERARCHICAL_CONFIG,
+}
+
+
+def _hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_json(value) -> str:
+    payload = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def code_fingerprint(patterns: Iterable[str], base_dir: str = BASE_DIR) -> str:
+    """Hash del código fuente de los archivos indicados (patrones glob relativos)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(base_dir, pattern))):
+            digest.update(os.path.relpath(path, base_dir).encode())
+            digest.update(_hash_file(path).encode())
+    return digest.hexdigest()
+
+
+def aggregation_fingerprint(strategy: str) -> str:
+    """Hash del código de agregación que usa una estrategia concreta"""
+    from federated.aggregation.strategies import AggregationStrategy, is_finite_payload
+    method = AggregationStrategy.STRATEGY_METHODS.get(strategy)
+    functions = [is_finite_payload, AggregationStrategy.__init__, AggregationStrategy.aggregate,
+                 AggregationStrategy._aggregate, AggregationStrategy._merge_forests]
+    if method:
+        functions.append(getattr(AggregationStrategy, method))
+    if strategy == 'scaffold':
+        functions.append(AggregationStrategy._scaffold)
+    return _hash_json([inspect.getsource(f) for f in functions])
+
+
+class ResultCache:
+    """Resultados de experimentos guardados por clave de contenido"""
+
+    def __init__(self, **kwargs):
+        self.enabled = kwargs.get('enabled', RESULT_CACHE_CONFIG['enabled'])
+        self.cache_dir = kwargs.get('cache_dir', RESULT_CACHE_CONFIG['dir'])
+        self.data_dir = kwargs.get('data_dir', PROCESSED_DATA_DIR)
+        self.code_paths = kwargs.get('code_paths', RESULT_CACHE_CONFIG['code_paths'])
+        self._data_hash = None
+        self._code_hash = None
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def data_fingerprint(self) -> str:
+        """Hash del contenido de los datos procesados
+
+        El hash de cada archivo se memoriza por (tamaño, mtime) en un índice para
+        no releer datos que no han cambiado.
+        """
+        if self._data_hash is not None:
+            return self._data_hash
+
+        index_path = os.path.join(self.cache_dir, 'data_index.json')
+        index = {}
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+
+        entries = []
+        for root, _, files in os.walk(self.data_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+                cached = index.get(path)
+                if not cached or cached['stamp'] != stamp:
+                    cached = {'stamp': stamp, 'hash': _hash_file(path)}
+                    index[path] = cached
+                entries.append((os.path.relpath(path, self.data_dir), cached['hash']))
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(index_path, 'w') as f:
+            json.dump(index, f)
+        self._data_hash = _hash_json(sorted(entries))
+        return self._data_hash
+
+    def key(self, model_type: str, aggregation_strategy: str, privacy_technique: str,
+            num_rounds: int, model_params: Optional[Dict] = None,
+            resume_path: Optional[str] = None, precision: str = 'float64') -> str:
+        """Clave de un experimento: datos + configuración + código"""
+        if self._code_hash is None:
+            self._code_hash = code_fingerprint(self.code_paths)
+        return _hash_json({
+            'data': self.data_fingerprint(),
+            'code': self._code_hash,
+            'aggregation_code': aggregation_fingerprint(aggregation_strategy),
+            'experiment': {
+                'model_type': model_type,
+                'aggregation_strategy': aggregation_strategy,
+                'privacy_technique': privacy_technique,
+                'num_rounds': num_rounds,
+                'model_params': model_params or {},
+                'precision': precision,
+            },
+            'config': EXPERIMENT_CONFIGS,
+            # Un experimento reanudado depende del checkpoint de partida
+            'resume': _hash_file(resume_path) if resume_path else None,
+        })
+
+    def get(self, key: str, checkpoint_path: Optional[str] = None) -> Optional[Dict]:
+        """Resultado guardado (y su checkpoint, si lo hay) o None"""
+        if not self.enabled:
+            return None
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        cached_checkpoint = os.path.join(self.cache_dir, f"{key}.npz")
+        if checkpoint_path:
+            # Los escalones siguientes de la búsqueda reanudan desde este checkpoint
+            if not os.path.exists(cached_checkpoint):
+                return None
+            os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+            shutil.copyfile(cached_checkpoint, checkpoint_path)
+        with open(path) as f:
+            return json.load(f)
+
+    def put(self, key: str, result: Dict, checkpoint_path: Optional[str] = None) -> None:
+        """Guardar el resultado de un experimento"""
+        if not self.enabled:
+            return
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            shutil.copyfile(checkpoint_path, os.path.join(self.cache_dir, f"{key}.npz"))
+        tmp_path = os.path.join(self.cache_dir, f"{key}.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f, default=str)
+        os.replace(tmp_path, os.path.join(self.cache_dir, f"{key}.json"))
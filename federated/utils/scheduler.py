@@ -0,0 +1,128 @@
+"""
+Planificador de búsqueda por successive halving sobre experimentos federados
+"""
+import os
+import math
+import itertools
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import SCHEDULER_CONFIG
+
+
+def expand_search_space(models: Iterable[str], strategies: Iterable[str],
+                        privacy_techniques: Iterable[str],
+                        search_space: Optional[Dict[str, Dict[str, List]]] = None,
+                        applies: Optional[Callable[[str, str], bool]] = None,
+                        privacy_applies: Optional[Callable[[str, str], bool]] = None) -> List[Dict]:
+    """Todas las combinaciones de modelo, agregación, privacidad e hiperparámetros
+
+    `applies(model_type, strategy)` y `privacy_applies(model_type, privacy)`
+    descartan las combinaciones sin sentido.
+    """
+    search_space = search_space or {}
+    trials = []
+    for model_type, strategy, privacy in itertools.product(models, strategies, privacy_techniques):
+        if applies is not None and not applies(model_type, strategy):
+            continue
+        if privacy_applies is not None and not privacy_applies(model_type, privacy):
+            continue
+        grid = search_space.get(model_type, {})
+        names = sorted(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            trials.append({
+                'trial_id': len(trials),
+                'model_type': model_type,
+                'aggregation_strategy': strategy,
+                'privacy_technique': privacy,
+                'model_params': dict(zip(names, values)),
+            })
+    return trials
+
+
+def halving_schedule(num_trials: int, min_rounds: int, max_rounds: int,
+                     eta: int) -> List[Tuple[int, int]]:
+    """Escalones (configuraciones, rondas acumuladas) hasta llegar a max_rounds"""
+    rungs = []
+    rung = 0
+    while True:
+        rounds = min(min_rounds * eta ** rung, max_rounds)
+        trials = max(math.ceil(num_trials / eta ** rung), 1)
+        rungs.append((trials, rounds))
+        if rounds >= max_rounds or trials == 1:
+            break
+        rung += 1
+    # El último escalón siempre entrena hasta el presupuesto completo
+    rungs[-1] = (rungs[-1][0], max_rounds)
+    return rungs
+
+
+def _ranking_loss(result: Optional[Dict]) -> float:
+    """Pérdida de validación usada para ordenar (menor es mejor)"""
+    if not result:
+        return float('inf')
+    loss = result.get('loss')
+    if loss is None:
+        loss = result.get('mse')
+    if loss is None or loss != loss:
+        return float('inf')
+    return float(loss)
+
+
+class SuccessiveHalving:
+    """Ejecuta todas las configuraciones pocas rondas y continúa solo las mejores
+
+    `run_trial(trial, num_rounds, checkpoint_path, resume_path)` ejecuta
+    `num_rounds` rondas adicionales de una configuración, reanudando desde
+    `resume_path` si existe, y devuelve sus métricas (con 'loss').
+    """
+
+    def __init__(self, run_trial: Callable[[Dict, int, str, Optional[str]], Optional[Dict]], **kwargs):
+        self.run_trial = run_trial
+        self.min_rounds = kwargs.get('min_rounds', SCHEDULER_CONFIG['min_rounds'])
+        self.max_rounds = kwargs.get('max_rounds', SCHEDULER_CONFIG['max_rounds'])
+        self.eta = kwargs.get('eta', SCHEDULER_CONFIG['eta'])
+        self.checkpoint_dir = kwargs.get('checkpoint_dir', SCHEDULER_CONFIG['checkpoint_dir'])
+        self.history = []
+
+    def _checkpoint_path(self, trial: Dict) -> str:
+        return os.path.join(self.checkpoint_dir, f"trial_{trial['trial_id']}.npz")
+
+    def run(self, trials: List[Dict]) -> List[Dict]:
+        """Ejecutar la búsqueda; devuelve el último resultado de cada configuración"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        schedule = halving_schedule(len(trials), self.min_rounds, self.max_rounds, self.eta)
+        rounds_done = {trial['trial_id']: 0 for trial in trials}
+        latest = {}
+        alive = list(trials)
+        total_rounds = 0
+
+        for rung, (num_keep, target_rounds) in enumerate(schedule):
+            alive = sorted(alive, key=lambda t: _ranking_loss(latest.get(t['trial_id'])))[:num_keep]
+            print(f"\n=== Escalón {rung}: {len(alive)} configuraciones hasta {target_rounds} rondas ===")
+
+            for trial in alive:
+                trial_id = trial['trial_id']
+                previous = latest.get(trial_id)
+                # Una configuración que ya convergió no necesita más rondas
+                if previous and previous.get('early_stopped'):
+                    continue
+                extra_rounds = target_rounds - rounds_done[trial_id]
+                if extra_rounds <= 0:
+                    continue
+
+                checkpoint_path = self._checkpoint_path(trial)
+                resume_path = checkpoint_path if rounds_done[trial_id] > 0 and \
+                    os.path.exists(checkpoint_path) else None
+                result = self.run_trial(trial, extra_rounds, checkpoint_path, resume_path)
+                rounds_done[trial_id] = target_rounds
+                total_rounds += extra_rounds
+                if result is None:
+                    result = {'loss': None}
+                result = {**trial, **result, 'rung': rung, 'rounds_done': target_rounds}
+                latest[trial_id] = result
+                self.history.append(result)
+
+        print(f"\nBúsqueda completada: {total_rounds} rondas frente a "
+              f"{len(trials) * self.max_rounds} de la búsqueda completa")
+        return sorted(latest.values(), key=_ranking_loss)
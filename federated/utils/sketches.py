@@ -0,0 +1,122 @@
+"""
+Sketches combinables para resumir columnas en una sola pasada
+
+- HyperLogLog: número aproximado de valores distintos con memoria fija.
+- TDigest: cuantiles aproximados (más precisos en las colas) con un número
+  acotado de centroides.
+
+Ambos se actualizan por bloques con operaciones vectorizadas y se combinan con
+`merge`, de modo que cada bloque puede resumirse en un proceso distinto.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """Hash de 64 bits de los valores no nulos de una columna"""
+    return pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+
+
+class HyperLogLog:
+    """Conteo aproximado de distintos (error relativo ~1.04 / sqrt(2^precision))"""
+
+    def __init__(self, precision: int = 14):
+        # Con precision >= 11 el resto del hash cabe exacto en la mantisa de un float64
+        if not 11 <= precision <= 18:
+            raise ValueError(f"Precisión de HyperLogLog fuera de rango: {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray) -> 'HyperLogLog':
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes) == 0:
+            return self
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = (hashes & np.uint64((1 << rest_bits) - 1)).astype(np.float64)
+        # Posición del primer bit a 1 en los bits restantes
+        with np.errstate(divide='ignore'):
+            rank = np.where(rest > 0, rest_bits - np.floor(np.log2(rest)), rest_bits + 1)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Rango pequeño: conteo lineal sobre los registros vacíos
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class TDigest:
+    """Cuantiles aproximados con centroides de tamaño limitado por la escala k2
+
+    La compresión agrupa centroides consecutivos (ordenados por media) que caen
+    en la misma unidad de k(q) ∝ log(q / (1 - q)): en las colas cada grupo
+    abarca pocos valores y en el centro muchos. Quedan del orden de
+    `compression` centroides.
+    """
+
+    def __init__(self, compression: int = 200):
+        self.compression = compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    def update(self, values: np.ndarray) -> 'TDigest':
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+        q = np.clip((cumulative - weights / 2) / total, np.finfo(np.float64).tiny, 1 - np.finfo(np.float64).eps)
+        normalizer = 4 * np.log(max(total / self.compression, 1.0)) + 24
+        k = 2 * self.compression / normalizer * np.log(q / (1 - q))
+        group = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> float:
+        if len(self.means) == 0:
+            return float('nan')
+        # Cada centroide representa su media en el punto medio de su peso acumulado
+        cumulative = np.cumsum(self.weights)
+        centers = cumulative - self.weights / 2
+        return float(np.interp(q * cumulative[-1],
+                               np.r_[0.0, centers, cumulative[-1]],
+                               np.r_[self.min, self.means, self.max]))
+
+    def quantiles(self, qs: List[float]) -> Dict[str, float]:
+        return {f"p{round(q * 100):02d}": self.quantile(q) for q in qs}
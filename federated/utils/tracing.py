@@ -0,0 +1,198 @@
+"""
+Trazas por etapa de las rondas federadas (formato Chrome trace / Perfetto)
+
+Cada proceso (servidor y actores de Ray de los clientes) acumula spans en
+memoria y los vuelca a `<dir>/<pid>.jsonl`; al terminar el experimento se
+combinan en un único JSON que se abre en chrome://tracing o ui.perfetto.dev,
+con el servidor y cada cliente como procesos separados, y en una tabla resumen
+por etapa.
+
+El trazado es opcional: se activa con TRACING_CONFIG['enabled'] o la variable
+de entorno FEDERATED_TRACING=1. Sin activar, `span` devuelve un contexto vacío.
+"""
+import os
+import glob
+import json
+import time
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import TRACING_CONFIG
+
+# Directorio de trazas del experimento en curso (lo fija app.start y lo heredan los actores)
+TRACE_DIR_ENV = 'FEDERATED_TRACE_DIR'
+
+# Identificador de proceso en la traza: 0 para el servidor, id + 1 para cada cliente
+SERVER_PID = 0
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def tracing_enabled() -> bool:
+    return TRACING_CONFIG['enabled'] or os.environ.get('FEDERATED_TRACING') == '1'
+
+
+class Tracer:
+    """Acumula eventos completos ('X') del proceso actual"""
+
+    def __init__(self, trace_dir: Optional[str]):
+        self.trace_dir = trace_dir
+        self.enabled = bool(trace_dir)
+        self.events = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _span(self, name: str, cat: str, client: Optional[int], args: Dict):
+        start_ts = time.time_ns() // 1000
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter_ns() - start) // 1000
+            self._add(name, cat, start_ts, duration, client, args)
+
+    def span(self, name: str, cat: str = 'federated', client: Optional[int] = None, **args):
+        """Contexto que registra la duración de una etapa"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, cat, client, args)
+
+    def complete(self, name: str, start_time: float, end_time: float, cat: str = 'federated',
+                 client: Optional[int] = None, **args) -> None:
+        """Registrar una etapa delimitada por dos instantes de time.time()"""
+        if self.enabled:
+            self._add(name, cat, int(start_time * 1e6), int((end_time - start_time) * 1e6), client, args)
+
+    def _add(self, name, cat, ts, duration, client, args) -> None:
+        event = {
+            'name': name, 'cat': cat, 'ph': 'X', 'ts': ts, 'dur': duration,
+            'pid': SERVER_PID if client is None else int(client) + 1,
+            'tid': os.getpid(),
+            'args': {k: v for k, v in args.items() if v is not None},
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def flush(self) -> None:
+        """Volcar los eventos acumulados al archivo del proceso"""
+        if not self.enabled or not self.events:
+            return
+        with self._lock:
+            events, self.events = self.events, []
+        os.makedirs(self.trace_dir, exist_ok=True)
+        lines = ''.join(json.dumps(event, default=str) + '\n' for event in events)
+        with open(os.path.join(self.trace_dir, f"{os.getpid()}.jsonl"), 'a') as f:
+            f.write(lines)
+
+
+_tracer = None
+
+
+def get_tracer() -> Tracer:
+    """Tracer del proceso para el experimento indicado en el entorno"""
+    global _tracer
+    trace_dir = os.environ.get(TRACE_DIR_ENV) or None
+    if _tracer is None or _tracer.trace_dir != trace_dir:
+        if _tracer is not None:
+            _tracer.flush()
+        _tracer = Tracer(trace_dir)
+    return _tracer
+
+
+def span(name: str, cat: str = 'federated', client: Optional[int] = None, **args):
+    """Atajo para get_tracer().span(...)"""
+    return get_tracer().span(name, cat, client, **args)
+
+
+def start_tracing(run_id: str) -> Optional[str]:
+    """Activar el trazado del experimento (antes de lanzar la simulación)"""
+    if not tracing_enabled():
+        return None
+    trace_dir = os.path.join(TRACING_CONFIG['dir'], run_id)
+    os.makedirs(trace_dir, exist_ok=True)
+    os.environ[TRACE_DIR_ENV] = trace_dir
+    return trace_dir
+
+
+def load_trace_events(trace_dir: str) -> List[Dict]:
+    events = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, '*.jsonl'))):
+        with open(path) as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    return events
+
+
+def export_chrome_trace(trace_dir: str, output_path: Optional[str] = None) -> str:
+    """Combinar los eventos de todos los procesos en un JSON de Chrome trace"""
+    get_tracer().flush()
+    events = sorted(load_trace_events(trace_dir), key=lambda e: e['ts'])
+    metadata = []
+    for pid in sorted({event['pid'] for event in events}):
+        label = 'servidor' if pid == SERVER_PID else f"cliente {pid - 1}"
+        metadata.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': label}})
+        metadata.append({'name': 'process_sort_index', 'ph': 'M', 'pid': pid, 'args': {'sort_index': pid}})
+
+    output_path = output_path or f"{trace_dir}.json"
+    with open(output_path, 'w') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+    return output_path
+
+
+def _scheduling_overhead(events: List[Dict]) -> List[float]:
+    """Tiempo de cada ronda no cubierto por el cliente más lento (planificación de Ray,
+    creación de clientes y transporte)"""
+    overheads = []
+    rounds = [e for e in events if e['name'] == 'round' and e['pid'] == SERVER_PID]
+    for round_event in rounds:
+        end = round_event['ts'] + round_event['dur']
+        client_fits = [e['dur'] for e in events if e['name'] == 'client_fit'
+                       and round_event['ts'] <= e['ts'] <= end]
+        if client_fits:
+            overheads.append(max(round_event['dur'] - max(client_fits), 0))
+    return overheads
+
+
+def summarize_trace(trace_dir: str) -> pd.DataFrame:
+    """Tabla por etapa: llamadas, tiempo total, percentiles y porcentaje del total"""
+    events = load_trace_events(trace_dir)
+    if not events:
+        return pd.DataFrame()
+
+    durations = {}
+    for event in events:
+        durations.setdefault((event['cat'], event['name']), []).append(event['dur'])
+    overhead = _scheduling_overhead(events)
+    if overhead:
+        durations[('derived', 'scheduling_overhead')] = overhead
+
+    wall = (max(e['ts'] + e['dur'] for e in events) - min(e['ts'] for e in events)) or 1
+    rows = []
+    for (cat, name), values in durations.items():
+        values = np.asarray(values, dtype=np.float64) / 1000.0
+        rows.append({
+            'cat': cat, 'stage': name, 'calls': len(values),
+            'total_ms': values.sum(), 'mean_ms': values.mean(),
+            'p50_ms': np.percentile(values, 50), 'p95_ms': np.percentile(values, 95),
+            'max_ms': values.max(), 'pct_wall': 100 * values.sum() / (wall / 1000.0),
+        })
+    return pd.DataFrame(rows).sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+
+def finish_tracing(trace_dir: Optional[str]) -> Optional[Dict[str, str]]:
+    """Exportar la traza y la tabla resumen del experimento"""
+    if not trace_dir:
+        return None
+    trace_path = export_chrome_trace(trace_dir)
+    summary = summarize_trace(trace_dir)
+    summary_path = f"{trace_dir}_resumen.csv"
+    summary.to_csv(summary_path, index=False)
+    if not summary.empty:
+        print("\n=== Resumen de trazas por etapa ===")
+        print(summary.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"Traza: {trace_path} (abrir en ui.perfetto.dev o chrome://tracing)")
+    os.environ.pop(TRACE_DIR_ENV, None)
+    return {'trace_path': trace_path, 'trace_summary_path': summary_path}
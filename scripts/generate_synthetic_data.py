@@ -0,0 +1,260 @@
+"""
+Generador de datos sintéticos con el esquema de CreditScore_test.csv para pruebas de escala
+
+Produce las 14 columnas que comprueba scripts/validate_data.py (mismas
+categorías, distribuciones numéricas realistas y un Score aprendible) para
+cualquier número de filas y de bancos, con heterogeneidad configurable entre
+bancos. Los datos se escriben directamente en el formato procesado por cliente
+(bancoN.csv codificado y escalado + preprocessor.pkl) en dos pasadas por
+bloques, sin mantener nunca el dataset en memoria:
+
+1. cada banco genera sus bloques y acumula ClientStatistics; el servidor los
+   combina en el preprocesador global (el mismo flujo que --federated);
+2. los bloques se regeneran con las mismas semillas y se transforman y escriben.
+
+Cada bloque usa una semilla derivada de (semilla, banco, bloque): la salida es
+reproducible con los mismos parámetros y las dos pasadas ven exactamente los
+mismos datos.
+
+Uso:
+    python scripts/generate_synthetic_data.py --rows 10000000 --clients 1000 --heterogeneity 0.5
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import PROCESSED_DATA_DIR, FEDERATED_CONFIG, SERVER_EVAL_CONFIG
+from federated.utils.preprocessing_stats import (ClientStatistics, merge_client_statistics,
+                                                 build_preprocessor, transform_chunk)
+
+# Columnas en el orden del CSV original (sin ID)
+SCHEMA_COLUMNS = [
+    'Customer_Age', 'Gender', 'Dependent_count', 'Education_Level', 'Marital_Status',
+    'Income_Category', 'Card_Category', 'Months_on_book', 'Total_Relationship_Count',
+    'Credit_Limit', 'Total_Trans_Amt', 'Total_Trans_Ct', 'Avg_Open_To_Buy', 'Score'
+]
+
+# Niveles y frecuencias de referencia de cada variable categórica
+CATEGORY_LEVELS = {
+    'Gender': (['F', 'M'], [0.53, 0.47]),
+    'Education_Level': (['Uneducated', 'High School', 'College', 'Graduate', 'Post-Graduate',
+                         'Doctorate', 'Unknown'],
+                        [0.15, 0.20, 0.10, 0.31, 0.05, 0.04, 0.15]),
+    'Marital_Status': (['Single', 'Married', 'Divorced', 'Unknown'], [0.39, 0.46, 0.07, 0.08]),
+    'Income_Category': (['Less than $40K', '$40K - $60K', '$60K - $80K', '$80K - $120K',
+                         '$120K +', 'Unknown'],
+                        [0.35, 0.18, 0.14, 0.15, 0.07, 0.11]),
+    'Card_Category': (['Blue', 'Silver', 'Gold', 'Platinum'], [0.93, 0.055, 0.012, 0.003]),
+}
+
+# Efecto de cada nivel sobre el límite de crédito (log) y sobre el Score
+INCOME_LIMIT_EFFECT = np.array([-0.55, -0.2, 0.15, 0.45, 0.75, 0.0])
+CARD_LIMIT_EFFECT = np.array([0.0, 0.6, 0.9, 1.1])
+INCOME_SCORE_EFFECT = np.array([-20.0, -5.0, 5.0, 15.0, 25.0, 0.0])
+CARD_SCORE_EFFECT = np.array([0.0, 10.0, 20.0, 30.0])
+EDUCATION_SCORE_EFFECT = np.array([-10.0, -4.0, 2.0, 6.0, 9.0, 12.0, 0.0])
+
+# Flujos aleatorios reservados (fuera del rango de identificadores de banco)
+SIZES_STREAM = 2 ** 31
+VALIDATION_PROFILE = 2 ** 31 + 1
+
+
+class SyntheticBankProfile:
+    """Parámetros propios de un banco: mezcla de categorías, desplazamientos y sesgo del Score"""
+
+    def __init__(self, client_id: int, heterogeneity: float, seed: int):
+        rng = np.random.default_rng(np.random.SeedSequence([seed, client_id, 0]))
+        self.client_id = client_id
+        self.category_probs = {}
+        for column, (levels, probs) in CATEGORY_LEVELS.items():
+            probs = np.asarray(probs)
+            if heterogeneity > 0:
+                # Mezcla entre la distribución de referencia y una Dirichlet centrada en ella
+                local = rng.dirichlet(probs * 20 + 0.05)
+                probs = (1 - heterogeneity) * probs + heterogeneity * local
+            self.category_probs[column] = probs / probs.sum()
+        self.age_shift = heterogeneity * rng.normal(0, 6)
+        self.limit_shift = heterogeneity * rng.normal(0, 0.25)
+        self.activity_shift = heterogeneity * rng.normal(0, 0.3)
+        # Desplazamiento del Score propio del banco (concept shift)
+        self.score_shift = heterogeneity * rng.normal(0, 15)
+
+
+def generate_chunk(profile: SyntheticBankProfile, n_rows: int, seed: int, chunk_index: int) -> pd.DataFrame:
+    """Generar un bloque de filas crudas de un banco (reproducible por semilla y bloque)"""
+    rng = np.random.default_rng(np.random.SeedSequence([seed, profile.client_id, chunk_index + 1]))
+
+    codes = {column: rng.choice(len(levels), size=n_rows, p=profile.category_probs[column])
+             for column, (levels, _) in CATEGORY_LEVELS.items()}
+
+    age = np.clip(np.round(rng.normal(46 + profile.age_shift, 8, n_rows)), 26, 73)
+    months = np.clip(np.round(36 + 0.6 * (age - 46) + rng.normal(0, 6, n_rows)), 13, 56)
+    dependents = rng.binomial(5, 0.47, n_rows)
+    relationships = rng.integers(1, 7, n_rows)
+
+    log_limit = (8.6 + profile.limit_shift + INCOME_LIMIT_EFFECT[codes['Income_Category']]
+                 + CARD_LIMIT_EFFECT[codes['Card_Category']] + rng.normal(0, 0.55, n_rows))
+    credit_limit = np.round(np.clip(np.exp(log_limit), 1438.3, 34516.0), 1)
+    revolving = np.minimum(rng.uniform(0, 2517, n_rows) * (rng.random(n_rows) > 0.25), credit_limit)
+    open_to_buy = np.round(credit_limit - revolving, 1)
+
+    trans_ct = np.clip(np.round(np.exp(4.1 + profile.activity_shift - 0.08 * (relationships - 3.8)
+                                       + rng.normal(0, 0.3, n_rows))), 10, 139)
+    trans_amt = np.clip(np.round(trans_ct * np.exp(rng.normal(4.0, 0.35, n_rows))), 510, 18484)
+
+    # Score aprendible: efectos lineales, una interacción y no linealidades suaves
+    utilization = revolving / credit_limit
+    score = (640 + profile.score_shift
+             + 30 * (log_limit - 8.6)
+             + 25 * np.tanh((trans_ct - 65) / 25)
+             + 0.8 * (months - 36)
+             - 70 * (utilization - 0.27)
+             - 6 * dependents
+             + 5 * relationships
+             + INCOME_SCORE_EFFECT[codes['Income_Category']]
+             + CARD_SCORE_EFFECT[codes['Card_Category']]
+             + EDUCATION_SCORE_EFFECT[codes['Education_Level']]
+             + 0.002 * (trans_amt - 4400) * (utilization < 0.5)
+             + rng.normal(0, 25, n_rows))
+
+    df = pd.DataFrame({
+        'Customer_Age': age.astype(np.int64),
+        'Dependent_count': dependents.astype(np.int64),
+        'Months_on_book': months.astype(np.int64),
+        'Total_Relationship_Count': relationships.astype(np.int64),
+        'Credit_Limit': credit_limit,
+        'Total_Trans_Amt': trans_amt.astype(np.int64),
+        'Total_Trans_Ct': trans_ct.astype(np.int64),
+        'Avg_Open_To_Buy': open_to_buy,
+        'Score': np.clip(np.round(score), 300, 850),
+    })
+    for column, (levels, _) in CATEGORY_LEVELS.items():
+        df[column] = np.asarray(levels, dtype=object)[codes[column]]
+    return df[SCHEMA_COLUMNS]
+
+
+def client_sizes(total_rows: int, num_clients: int, heterogeneity: float, seed: int) -> np.ndarray:
+    """Filas por banco: iguales sin heterogeneidad y cada vez más desiguales con ella"""
+    if heterogeneity <= 0:
+        weights = np.full(num_clients, 1.0 / num_clients)
+    else:
+        rng = np.random.default_rng(np.random.SeedSequence([seed, SIZES_STREAM]))
+        weights = rng.dirichlet(np.full(num_clients, 1.0 / heterogeneity))
+    sizes = np.floor(weights * total_rows).astype(np.int64)
+    sizes[np.argsort(-weights)[:total_rows - sizes.sum()]] += 1
+    return np.maximum(sizes, 1)
+
+
+class SyntheticDataGenerator:
+    """Genera los datos procesados por banco en dos pasadas por bloques"""
+
+    def __init__(self, rows: int, num_clients: int, heterogeneity: float = 0.0,
+                 seed: int = 42, chunksize: int = 100000, output_dir: str = PROCESSED_DATA_DIR,
+                 raw_dir: str = None):
+        self.rows = rows
+        self.num_clients = num_clients
+        self.heterogeneity = heterogeneity
+        self.seed = seed
+        self.chunksize = chunksize
+        self.output_dir = output_dir
+        # Opcional: copia cruda por banco para probar el preprocesamiento (--federated)
+        self.raw_dir = raw_dir
+        self.sizes = client_sizes(rows, num_clients, heterogeneity, seed)
+        self.profiles = [SyntheticBankProfile(i, heterogeneity, seed) for i in range(num_clients)]
+
+    def _client_chunks(self, client_id: int):
+        """Bloques de un banco; mismas semillas en ambas pasadas"""
+        remaining = int(self.sizes[client_id])
+        chunk_index = 0
+        while remaining > 0:
+            n_rows = min(self.chunksize, remaining)
+            yield generate_chunk(self.profiles[client_id], n_rows, self.seed, chunk_index)
+            remaining -= n_rows
+            chunk_index += 1
+
+    def compute_statistics(self) -> ClientStatistics:
+        """Primera pasada: estadísticos locales de cada banco combinados en el servidor"""
+        client_stats = []
+        for client_id in range(self.num_clients):
+            stats = ClientStatistics(target_column='Score')
+            for chunk in self._client_chunks(client_id):
+                stats.update(chunk)
+            client_stats.append(stats)
+        return merge_client_statistics(client_stats)
+
+    def write_clients(self, preprocessor: dict) -> None:
+        """Segunda pasada: transformar y escribir cada banco en formato procesado"""
+        for client_id in range(self.num_clients):
+            output_path = os.path.join(self.output_dir, f"banco{client_id}.csv")
+            for i, chunk in enumerate(self._client_chunks(client_id)):
+                if self.raw_dir:
+                    chunk.to_csv(os.path.join(self.raw_dir, f"banco{client_id}.csv"),
+                                 mode='w' if i == 0 else 'a', header=i == 0, index=False)
+                processed = transform_chunk(chunk, preprocessor, target_column='Score')
+                processed.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+    def write_validation(self, rows: int, preprocessor: dict) -> str:
+        """Conjunto reservado para la evaluación en servidor (distribución de referencia)"""
+        profile = SyntheticBankProfile(VALIDATION_PROFILE, 0.0, self.seed)
+        output_path = os.path.join(self.output_dir, 'validacion.csv')
+        for i, start in enumerate(range(0, rows, self.chunksize)):
+            chunk = generate_chunk(profile, min(self.chunksize, rows - start), self.seed, i)
+            processed = transform_chunk(chunk, preprocessor, target_column='Score')
+            processed.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        return output_path
+
+    def run(self, validation_rows: int = 0) -> dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.raw_dir:
+            os.makedirs(self.raw_dir, exist_ok=True)
+        start = time.time()
+        print(f"Generando {self.rows} filas en {self.num_clients} bancos "
+              f"(heterogeneidad {self.heterogeneity}, semilla {self.seed})")
+        print(f"Filas por banco: min {self.sizes.min()}, mediana {int(np.median(self.sizes))}, "
+              f"max {self.sizes.max()}")
+
+        preprocessor = build_preprocessor(self.compute_statistics())
+        print(f"Estadísticos combinados en {time.time() - start:.1f}s")
+
+        self.write_clients(preprocessor)
+        if validation_rows:
+            print(f"Guardado: {self.write_validation(validation_rows, preprocessor)}")
+        joblib.dump(preprocessor, os.path.join(self.output_dir, 'preprocessor.pkl'))
+        print(f"Datos procesados en {self.output_dir} ({time.time() - start:.1f}s)")
+        return preprocessor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos por banco")
+    parser.add_argument('--rows', type=int, default=100000, help="filas totales")
+    parser.add_argument('--clients', type=int, default=FEDERATED_CONFIG['num_clients'], help="número de bancos")
+    parser.add_argument('--heterogeneity', type=float, default=0.0,
+                        help="0 = bancos IID, 1 = tamaños, mezclas y Score muy distintos")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--validation-rows', type=int, default=None,
+                        help="filas del conjunto reservado validacion.csv "
+                             "(por defecto SERVER_EVAL_CONFIG['validation_fraction'] de --rows)")
+    parser.add_argument('--output-dir', default=PROCESSED_DATA_DIR)
+    parser.add_argument('--raw-dir', default=None,
+                        help="escribir también los CSV crudos por banco (p. ej. data/raw/clientes)")
+    args = parser.parse_args()
+
+    if not 0.0 <= args.heterogeneity <= 1.0:
+        parser.error("--heterogeneity debe estar entre 0 y 1")
+    if args.rows < args.clients:
+        parser.error("--rows debe ser al menos igual a --clients")
+
+    validation_rows = args.validation_rows
+    if validation_rows is None:
+        validation_rows = int(args.rows * SERVER_EVAL_CONFIG['validation_fraction'])
+    SyntheticDataGenerator(args.rows, args.clients, args.heterogeneity, args.seed,
+                           args.chunksize, args.output_dir, args.raw_dir).run(validation_rows)
+
+
+if __name__ == "__main__":
+    main()
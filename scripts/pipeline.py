@@ -0,0 +1,292 @@
+"""
+Pipeline incremental: CSV crudo → informe de validación → bancos procesados →
+resultados de experimentos → modelo publicado
+
+Cada etapa declara sus entradas, salidas, código y configuración. Una etapa se
+omite si todas sus salidas existen, son más recientes que sus entradas y su
+código, y la configuración de la que depende no ha cambiado desde la última
+ejecución correcta (se guarda un sello con su hash). Así, cambiar por ejemplo
+VALIDATION_CONFIG solo repite la validación y lo que dependa de ella por fecha.
+
+Una dependencia aporta datos a la etapa; un filtro (gate) solo tiene que
+terminar bien antes, sin que su repetición desactualice la etapa. Las etapas
+cuyas dependencias y filtros ya terminaron se ejecutan en paralelo (hasta
+PIPELINE_CONFIG['workers']) y su salida se muestra en vivo con el nombre de la
+etapa como prefijo; también queda en `<state_dir>/logs/<etapa>.log`.
+
+Uso:
+    python scripts/pipeline.py                 # ejecutar lo que esté desactualizado
+    python scripts/pipeline.py --dry-run       # solo mostrar qué se ejecutaría y por qué
+    python scripts/pipeline.py --force preprocess experiments
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (BASE_DIR, PROCESSED_DATA_DIR, RESULTS_DIR, MODELS, AGGREGATION_STRATEGIES,
+                    PRIVACY_TECHNIQUES, SEARCH_SPACE, SCHEDULER_CONFIG, PRECISION_CONFIG, EXPORT_CONFIG,
+                    FEDERATED_CONFIG, STREAMING_PREPROCESSING_CONFIG, VALIDATION_CONFIG, PIPELINE_CONFIG,
+                    SERVER_EVAL_CONFIG)
+
+# Argumentos de preprocess_data.py para cada modo
+PREPROCESSING_MODES = {
+    'memory': [],
+    'streaming': ['--streaming'],
+    'federated': ['--federated'],
+}
+
+_print_lock = threading.Lock()
+
+
+def _log(message: str) -> None:
+    with _print_lock:
+        print(message, flush=True)
+
+
+def _files(patterns: List[str]) -> List[str]:
+    """Archivos que corresponden a rutas, directorios (recursivos) o patrones glob"""
+    files = []
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isdir(path):
+                files.extend(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+            else:
+                files.append(path)
+    return files
+
+
+class Stage:
+    """Etapa del pipeline: un comando con entradas, salidas, código y configuración"""
+
+    def __init__(self, name: str, command: List[str], inputs: List[str], outputs: List[str],
+                 code: List[str], config: Dict, deps: Optional[List[str]] = None,
+                 gates: Optional[List[str]] = None):
+        self.name = name
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+        self.code = [os.path.join(BASE_DIR, path) for path in code]
+        self.config = config
+        self.deps = deps or []
+        # Etapas que deben terminar bien antes, sin aportar datos (p. ej. la validación)
+        self.gates = gates or []
+
+    @property
+    def requires(self) -> List[str]:
+        return self.deps + self.gates
+
+    def config_hash(self) -> str:
+        payload = json.dumps({'command': self.command, 'config': self.config}, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def stale_reason(self, stamp: Optional[Dict]) -> Optional[str]:
+        """Motivo por el que hay que ejecutar la etapa (None si está al día)"""
+        missing = [path for path in self.outputs if not glob.glob(path)]
+        if missing:
+            return f"falta {os.path.relpath(missing[0], BASE_DIR)}"
+        if stamp is None:
+            return "sin ejecución previa registrada"
+        if stamp.get('config_hash') != self.config_hash():
+            return "cambió su configuración"
+
+        oldest_output = min(os.path.getmtime(path) for path in _files(self.outputs))
+        for kind, patterns in (('entrada', self.inputs), ('código', self.code)):
+            newer = [path for path in _files(patterns) if os.path.getmtime(path) > oldest_output]
+            if newer:
+                return f"{kind} más reciente: {os.path.relpath(newer[0], BASE_DIR)}"
+        return None
+
+
+class Pipeline:
+    """Ejecución de un grafo de etapas con comprobación de actualización"""
+
+    def __init__(self, stages: List[Stage], **kwargs):
+        self.stages = {stage.name: stage for stage in stages}
+        self.workers = kwargs.get('workers', PIPELINE_CONFIG['workers'])
+        self.state_dir = kwargs.get('state_dir', PIPELINE_CONFIG['state_dir'])
+        self.stamp_path = os.path.join(self.state_dir, 'stamps.json')
+        self.log_dir = os.path.join(self.state_dir, 'logs')
+        self.stamps = {}
+        if os.path.exists(self.stamp_path):
+            with open(self.stamp_path) as f:
+                self.stamps = json.load(f)
+        for stage in stages:
+            unknown = [dep for dep in stage.requires if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"La etapa {stage.name} depende de etapas inexistentes: {unknown}")
+
+    def _save_stamp(self, stage: Stage, elapsed: float) -> None:
+        self.stamps[stage.name] = {
+            'config_hash': stage.config_hash(),
+            'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'elapsed_seconds': elapsed,
+        }
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{self.stamp_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.stamps, f, indent=2)
+        os.replace(tmp_path, self.stamp_path)
+
+    def _execute(self, stage: Stage) -> bool:
+        """Ejecutar el comando mostrando su salida en vivo y guardándola en el log"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        env = dict(os.environ, PYTHONUNBUFFERED='1',
+                   PYTHONPATH=os.pathsep.join(filter(None, [BASE_DIR, os.environ.get('PYTHONPATH')])))
+        started = time.time()
+        with open(os.path.join(self.log_dir, f"{stage.name}.log"), 'w') as log:
+            process = subprocess.Popen(stage.command, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, text=True, bufsize=1)
+            for line in process.stdout:
+                log.write(line)
+                _log(f"[{stage.name}] {line.rstrip()}")
+            returncode = process.wait()
+
+        elapsed = time.time() - started
+        if returncode != 0:
+            _log(f"✗ {stage.name} falló (código {returncode}) tras {elapsed:.1f}s")
+            return False
+        self._save_stamp(stage, elapsed)
+        _log(f"✓ {stage.name} completada en {elapsed:.1f}s")
+        return True
+
+    def run(self, force: Optional[List[str]] = None, dry_run: bool = False) -> bool:
+        """Ejecutar las etapas desactualizadas respetando las dependencias
+
+        Una etapa se decide cuando terminan sus dependencias, de modo que las
+        fechas de las salidas recién escritas ya cuentan. Con `dry_run` se supone
+        que toda etapa desactualizada obliga a repetir las que dependen de ella
+        (no las que solo la tienen como filtro).
+        """
+        force = set(force or [])
+        pending = dict(self.stages)
+        done, ran, failed = set(), set(), set()
+        running = {}
+
+        def decide(stage: Stage) -> Optional[str]:
+            if stage.name in force or '*' in force:
+                return "forzada"
+            if dry_run and any(dep in ran for dep in stage.deps):
+                return "se ejecuta una dependencia"
+            return stage.stale_reason(self.stamps.get(stage.name))
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if any(dep in failed for dep in stage.requires):
+                        _log(f"- {name}: omitida porque falló una dependencia o un filtro")
+                        failed.add(name)
+                        del pending[name]
+                    elif all(dep in done for dep in stage.requires):
+                        del pending[name]
+                        reason = decide(stage)
+                        if reason is None:
+                            _log(f"= {name}: al día")
+                            done.add(name)
+                        elif dry_run:
+                            _log(f"> {name}: se ejecutaría ({reason})")
+                            done.add(name)
+                            ran.add(name)
+                        else:
+                            _log(f"> {name}: ejecutando ({reason})")
+                            running[executor.submit(self._execute, stage)] = name
+
+                if not running:
+                    if pending and not any(all(dep in done or dep in failed for dep in s.requires)
+                                           for s in pending.values()):
+                        raise ValueError(f"Dependencias circulares entre: {sorted(pending)}")
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.result():
+                        done.add(name)
+                        ran.add(name)
+                    else:
+                        failed.add(name)
+        return not failed
+
+
+def default_stages() -> List[Stage]:
+    """Etapas de validación, preprocesamiento, experimentos y publicación del modelo"""
+    from federated.utils.data_validation import report_path
+    from federated.utils.result_cache import EXPERIMENT_CONFIGS
+    from scripts.preprocess_data import CLIENT_RAW_DIR
+
+    python = sys.executable
+    raw_file = PIPELINE_CONFIG['raw_file']
+    mode = PIPELINE_CONFIG['preprocessing']
+    if mode not in PREPROCESSING_MODES:
+        raise ValueError(f"Modo de preprocesamiento no soportado: {mode}")
+    experiment_args = list(PIPELINE_CONFIG['experiment_args'])
+    summary_name = 'resumen_busqueda.csv' if '--halving' in experiment_args else 'resumen_resultados.csv'
+    summary_path = os.path.join(RESULTS_DIR, summary_name)
+    validation_report = report_path(raw_file)
+    # Solo el modo streaming lee el informe: en los demás la validación es un filtro
+    # paralelo al preprocesamiento que debe superarse antes de los experimentos
+    streaming = mode == 'streaming'
+    preprocess_inputs = [raw_file, validation_report] if streaming else [raw_file]
+    if mode == 'federated':
+        # Datos crudos de cada banco (el CSV original solo se reparte si faltan)
+        preprocess_inputs += [os.path.join(CLIENT_RAW_DIR, f"banco{i}.csv")
+                              for i in range(FEDERATED_CONFIG['num_clients'])]
+
+    return [
+        Stage('validate',
+              [python, 'scripts/validate_data.py', raw_file],
+              inputs=[raw_file],
+              outputs=[validation_report],
+              code=['scripts/validate_data.py', 'federated/utils/data_validation.py',
+                    'federated/utils/sketches.py', 'federated/utils/preprocessing_stats.py'],
+              config={'validation': VALIDATION_CONFIG}),
+        Stage('preprocess',
+              [python, 'scripts/preprocess_data.py', *PREPROCESSING_MODES[mode], raw_file],
+              inputs=preprocess_inputs,
+              outputs=[os.path.join(PROCESSED_DATA_DIR, 'preprocessor.pkl')],
+              code=['scripts/preprocess_data.py', 'federated/utils/preprocessing_stats.py',
+                    'federated/utils/columnar.py'],
+              config={'num_clients': FEDERATED_CONFIG['num_clients'],
+                      'validation_fraction': SERVER_EVAL_CONFIG['validation_fraction'],
+                      'streaming': STREAMING_PREPROCESSING_CONFIG if streaming else None},
+              deps=['validate'] if streaming else []),
+        Stage('experiments',
+              [python, 'federated/main.py', *experiment_args],
+              inputs=[os.path.join(PROCESSED_DATA_DIR, '**')],
+              outputs=[summary_path],
+              code=['federated/**/*.py'],
+              config={'experiments': EXPERIMENT_CONFIGS, 'models': MODELS,
+                      'aggregation': AGGREGATION_STRATEGIES, 'privacy': PRIVACY_TECHNIQUES,
+                      'search_space': SEARCH_SPACE, 'scheduler': SCHEDULER_CONFIG,
+                      'precision': PRECISION_CONFIG, 'export': EXPORT_CONFIG},
+              deps=['preprocess'], gates=[] if streaming else ['validate']),
+        Stage('publish',
+              [python, 'federated/models/export.py', summary_path],
+              inputs=[summary_path],
+              outputs=[os.path.join(EXPORT_CONFIG['serving_dir'], 'manifest.json')],
+              code=['federated/models/export.py'],
+              config={'serving_dir': EXPORT_CONFIG['serving_dir']},
+              deps=['experiments']),
+    ]
+
+
+def main() -> bool:
+    args = sys.argv[1:]
+    force = []
+    if '--force' in args:
+        # --force sin nombres fuerza todas las etapas
+        force = [arg for arg in args[args.index('--force') + 1:] if not arg.startswith('--')] or ['*']
+    pipeline = Pipeline(default_stages())
+    started = time.time()
+    success = pipeline.run(force=force, dry_run='--dry-run' in args)
+    print(f"\nPipeline {'completado' if success else 'con errores'} en {time.time() - started:.1f}s")
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -8,14 +8,46 @@ from sklearn.model_selection import train_test_split
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import PROCESSED_DATA_DIR, RAW_DATA_DIR
+from config import (PROCESSED_DATA_DIR, RAW_DATA_DIR, FEDERATED_CONFIG, STREAMING_PREPROCESSING_CONFIG,
+                    SERVER_EVAL_CONFIG)
+from federated.utils.preprocessing_stats import (ClientStatistics, ReservoirSample, SeenKeys,
+                                                 merge_client_statistics, build_preprocessor,
+                                                 transform_chunk)
+from federated.utils.columnar import COLUMNAR_SUFFIX, ColumnarWriter
+from federated.utils.data_validation import load_report
+
+# Mapeo de columnas anónimas a nombres reales
+COLUMN_MAPPING = {
+    'x001': 'ID',
+    'x002': 'Customer_Age',
+    'x003': 'Gender',
+    'x004': 'Dependent_count',
+    'x005': 'Education_Level',
+    'x006': 'Marital_Status',
+    'x007': 'Income_Category',
+    'x008': 'Card_Category',
+    'x009': 'Months_on_book',
+    'x010': 'Total_Relationship_Count',
+    'x011': 'Credit_Limit',
+    'x012': 'Total_Trans_Amt',
+    'x013': 'Total_Trans_Ct',
+    'x014': 'Avg_Open_To_Buy',
+    'y': 'Score'
+}
+
+# Datos crudos de cada cliente para el preprocesamiento federado
+CLIENT_RAW_DIR = os.path.join(RAW_DATA_DIR, 'clientes')
+# Datos crudos propios del servidor para la evaluación centralizada
+SERVER_RAW_VALIDATION = os.path.join(RAW_DATA_DIR, 'validacion.csv')
 
 class DataPreprocessor:
     """Clase para preprocesar y dividir el dataset"""
     
-    def __init__(self):
+    def __init__(self, output_dir=PROCESSED_DATA_DIR):
         self.label_encoders = {}
         self.scaler = StandardScaler()
+        self.output_dir = output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
         
     def load_data(self, filepath):
         """Cargar dataset original"""
@@ -34,25 +66,8 @@ class DataPreprocessor:
     
         if df.columns[0].startswith("x") and df.columns[-1] == "y":
          print("Detectadas columnas anónimas. Aplicando nombres reales...")
-        # Define el mapeo esperable basado en tu estructura real
-        mapping = {
-            'x001': 'ID',
-            'x002': 'Customer_Age',
-            'x003': 'Gender',
-            'x004': 'Dependent_count',
-            'x005': 'Education_Level',
-            'x006': 'Marital_Status',
-            'x007': 'Income_Category',
-            'x008': 'Card_Category',
-            'x009': 'Months_on_book',
-            'x010': 'Total_Relationship_Count',
-            'x011': 'Credit_Limit',
-            'x012': 'Total_Trans_Amt',
-            'x013': 'Total_Trans_Ct',
-            'x014': 'Avg_Open_To_Buy',
-            'y': 'Score'
-        }
-        df.rename(columns=mapping, inplace=True)
+        # Aplicar el mapeo a los nombres reales
+        df.rename(columns=COLUMN_MAPPING, inplace=True)
      
         # Mostrar información básica del dataset
         print("Columnas encontradas:")
@@ -178,11 +193,33 @@ class DataPreprocessor:
             
         return client_datasets
     
+    def validation_path(self):
+        """Conjunto reservado del servidor junto a los bancos procesados"""
+        return os.path.join(self.output_dir, os.path.basename(SERVER_EVAL_CONFIG['validation_path']))
+
+    def split_validation(self, df):
+        """Reservar para el servidor una parte de los datos que no va a ningún banco"""
+        fraction = SERVER_EVAL_CONFIG['validation_fraction']
+        if not fraction:
+            return df, None
+        return train_test_split(df, test_size=fraction, random_state=42)
+
+    def save_validation(self, validation):
+        """Guardar el conjunto reservado (o retirar uno anterior que ya no corresponde)"""
+        path = self.validation_path()
+        if validation is None:
+            if os.path.exists(path):
+                os.remove(path)
+            print("Sin conjunto reservado: el servidor no evaluará el modelo global")
+            return
+        validation.to_csv(path, index=False)
+        print(f"Guardado: {path} ({len(validation)} muestras reservadas para el servidor)")
+
     def save_client_datasets(self, client_datasets):
         """Guardar datasets de clientes"""
         for i, client_data in enumerate(client_datasets):
             filename = f"banco{i}.csv"
-            filepath = os.path.join(PROCESSED_DATA_DIR, filename)
+            filepath = os.path.join(self.output_dir, filename)
             client_data.to_csv(filepath, index=False)
             print(f"Guardado: {filepath}")
     
@@ -204,26 +241,256 @@ class DataPreprocessor:
         # Escalar características
         df = self.scale_features(df, fit=True)
         
-        # Dividir en clientes
+        # Reservar el conjunto de validación del servidor y dividir el resto en clientes
+        df, validation = self.split_validation(df)
         client_datasets = self.split_into_clients(df)
         
         # Guardar datasets
         self.save_client_datasets(client_datasets)
+        self.save_validation(validation)
         
         # Guardar preprocessor para uso posterior
         import joblib
         joblib.dump({
             'label_encoders': self.label_encoders,
             'scaler': self.scaler
-        }, os.path.join(PROCESSED_DATA_DIR, 'preprocessor.pkl'))
+        }, os.path.join(self.output_dir, 'preprocessor.pkl'))
         
         print("=== Preprocesamiento completado ===")
         return True
 
+class FederatedDataPreprocessor(DataPreprocessor):
+    """Preprocesamiento federado: cada cliente calcula estadísticos locales y
+    el servidor solo combina resúmenes, sin reunir nunca los datos"""
+
+    def __init__(self, chunksize=50000, output_dir=PROCESSED_DATA_DIR):
+        super().__init__(output_dir)
+        self.chunksize = chunksize
+
+    def _read_client_chunks(self, filepath):
+        """Leer el CSV crudo de un cliente por bloques, aplicando la limpieza por filas"""
+        seen_ids = set()
+        for chunk in pd.read_csv(filepath, chunksize=self.chunksize):
+            chunk = chunk.rename(columns=COLUMN_MAPPING)
+            chunk = chunk.dropna(subset=['Score'])
+            if 'ID' in chunk.columns:
+                # Duplicados por ID dentro de los datos del propio cliente
+                chunk = chunk.drop_duplicates(subset=['ID'])
+                chunk = chunk[~chunk['ID'].isin(seen_ids)]
+                seen_ids.update(chunk['ID'].tolist())
+                chunk = chunk.drop('ID', axis=1)
+            yield chunk
+
+    def split_raw_into_clients(self, input_filepath, num_clients=3):
+        """Repartir el CSV original en archivos crudos por banco (solo para simulación)
+
+        La fracción `validation_fraction` no va a ningún banco: queda como datos
+        propios del servidor en SERVER_RAW_VALIDATION.
+        """
+        os.makedirs(CLIENT_RAW_DIR, exist_ok=True)
+        client_files = [os.path.join(CLIENT_RAW_DIR, f"banco{i}.csv") for i in range(num_clients)]
+        # El último archivo es el del servidor
+        output_files = client_files + [SERVER_RAW_VALIDATION]
+        if os.path.exists(SERVER_RAW_VALIDATION):
+            os.remove(SERVER_RAW_VALIDATION)
+        rng = np.random.default_rng(42)
+        header_written = [False] * len(output_files)
+
+        for chunk in pd.read_csv(input_filepath, chunksize=self.chunksize):
+            assignment = rng.integers(num_clients, size=len(chunk))
+            assignment[rng.random(len(chunk)) < SERVER_EVAL_CONFIG['validation_fraction']] = num_clients
+            for i in np.unique(assignment):
+                part = chunk[assignment == i]
+                part.to_csv(output_files[i], mode='w' if not header_written[i] else 'a',
+                            header=not header_written[i], index=False)
+                header_written[i] = True
+        print(f"Datos crudos repartidos en {num_clients} clientes: {CLIENT_RAW_DIR}")
+        return client_files
+
+    def compute_client_statistics(self, filepath):
+        """Fase local: una pasada sobre los datos del cliente"""
+        stats = ClientStatistics(target_column='Score')
+        for chunk in self._read_client_chunks(filepath):
+            stats.update(chunk)
+        return stats
+
+    def apply_client_preprocessing(self, filepath, output_path, preprocessor):
+        """Fase local: aplicar el preprocesador global y guardar el banco procesado"""
+        rows = 0
+        for i, chunk in enumerate(self._read_client_chunks(filepath)):
+            processed = transform_chunk(chunk, preprocessor, target_column='Score')
+            processed.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows += len(processed)
+        print(f"Guardado: {output_path} ({rows} muestras)")
+
+    def process_dataset_federated(self, client_filepaths):
+        """Proceso completo de preprocesamiento federado"""
+        print("=== Iniciando preprocesamiento federado ===")
+
+        # Cada cliente calcula momentos y conteos de categorías localmente
+        client_stats = []
+        for i, filepath in enumerate(client_filepaths):
+            stats = self.compute_client_statistics(filepath)
+            print(f"Cliente {i}: {stats.n_rows} filas resumidas")
+            # Solo el resumen serializable viaja al servidor
+            client_stats.append(ClientStatistics.from_dict(stats.to_dict()))
+
+        # El servidor combina los resúmenes en un preprocesador global
+        merged = merge_client_statistics(client_stats)
+        preprocessor = build_preprocessor(merged)
+        self.label_encoders = preprocessor['label_encoders']
+        self.scaler = preprocessor['scaler']
+
+        # Cada cliente aplica localmente el preprocesador global
+        for i, filepath in enumerate(client_filepaths):
+            output_path = os.path.join(self.output_dir, f"banco{i}.csv")
+            self.apply_client_preprocessing(filepath, output_path, preprocessor)
+
+        # El servidor aplica el mismo preprocesador a sus propios datos reservados
+        if os.path.exists(SERVER_RAW_VALIDATION):
+            self.apply_client_preprocessing(SERVER_RAW_VALIDATION, self.validation_path(), preprocessor)
+        else:
+            self.save_validation(None)
+
+        import joblib
+        joblib.dump(preprocessor, os.path.join(self.output_dir, 'preprocessor.pkl'))
+
+        print("=== Preprocesamiento federado completado ===")
+        return True
+
+class StreamingDataPreprocessor(DataPreprocessor):
+    """Preprocesamiento por bloques de un CSV mayor que la memoria
+
+    Dos pasadas sobre el archivo, cada una con un solo bloque en memoria:
+    1. momentos y conteos de categorías (ClientStatistics) y una muestra por
+       columna para las medianas de imputación;
+    2. imputación, codificación y escalado de cada bloque y escritura en formato
+       columnar del banco que le corresponde.
+
+    Cada fila se asigna a un banco (o al conjunto reservado del servidor) por el
+    hash de su ID (o de su posición si no hay ID), en lugar de mezclar el dataset
+    completo. Los duplicados por ID se
+    detectan con SeenKeys (8 bytes por ID). Si existe un informe vigente de
+    scripts/validate_data.py para el archivo, la primera pasada se omite.
+    """
+
+    def __init__(self, num_clients=None, output_dir=PROCESSED_DATA_DIR, **kwargs):
+        super().__init__(output_dir)
+        self.num_clients = num_clients or FEDERATED_CONFIG['num_clients']
+        self.chunksize = kwargs.get('chunksize', STREAMING_PREPROCESSING_CONFIG['chunksize'])
+        self.reservoir_size = kwargs.get('reservoir_size', STREAMING_PREPROCESSING_CONFIG['reservoir_size'])
+        self.dtype = kwargs.get('dtype', STREAMING_PREPROCESSING_CONFIG['dtype'])
+        self.seed = kwargs.get('seed', STREAMING_PREPROCESSING_CONFIG['seed'])
+
+    def _read_chunks(self, filepath):
+        """Bloques limpios del CSV y la clave de hash de cada fila"""
+        seen_ids = SeenKeys()
+        offset = 0
+        for chunk in pd.read_csv(filepath, chunksize=self.chunksize):
+            chunk = chunk.rename(columns=COLUMN_MAPPING)
+            if 'ID' in chunk.columns:
+                keys = pd.util.hash_pandas_object(chunk['ID'], index=False).to_numpy()
+            else:
+                keys = pd.util.hash_pandas_object(
+                    pd.Series(np.arange(offset, offset + len(chunk))), index=False).to_numpy()
+            offset += len(chunk)
+
+            keep = chunk['Score'].notna().to_numpy()
+            if 'ID' in chunk.columns:
+                keep[keep] = seen_ids.add_new(keys[keep])
+                chunk = chunk.drop('ID', axis=1)
+            yield chunk[keep], keys[keep]
+
+    def assign_clients(self, keys):
+        """Banco de cada fila a partir de su clave (estable entre ejecuciones)
+
+        Las filas reservadas para la validación del servidor reciben -1.
+        """
+        mixed = pd.util.hash_pandas_object(pd.Series(keys ^ np.uint64(self.seed)), index=False).to_numpy()
+        assignment = (mixed % np.uint64(self.num_clients)).astype(np.int64)
+        # Bits altos del hash: la reserva es independiente del banco
+        held_out = (mixed >> np.uint64(32)) % np.uint64(10000) < \
+            np.uint64(round(SERVER_EVAL_CONFIG['validation_fraction'] * 10000))
+        assignment[held_out] = -1
+        return assignment
+
+    def compute_statistics(self, filepath):
+        """Primera pasada: estadísticos globales y muestra para las medianas"""
+        stats = ClientStatistics(target_column='Score')
+        sample = ReservoirSample(self.reservoir_size, seed=self.seed)
+        for chunk, _ in self._read_chunks(filepath):
+            stats.update(chunk)
+            numeric_columns = [col for col in stats.columns
+                               if col not in stats.categorical_columns and col != 'Score']
+            sample.update(chunk, numeric_columns)
+        return stats, sample
+
+    def process_dataset(self, input_filepath):
+        """Proceso completo de preprocesamiento en streaming"""
+        print("=== Iniciando preprocesamiento en streaming ===")
+        if not os.path.exists(input_filepath):
+            print(f"Error cargando dataset: no existe {input_filepath}")
+            return False
+
+        # El informe de scripts/validate_data.py sustituye a la primera pasada si sigue vigente
+        report = load_report(input_filepath)
+        if report is not None and report['preprocessing']['reusable']:
+            stats = ClientStatistics.from_dict(report['preprocessing']['statistics'])
+            medians = report['preprocessing']['medians']
+            print(f"Estadísticos reutilizados del informe de validación: {stats.n_rows} filas")
+        else:
+            stats, sample = self.compute_statistics(input_filepath)
+            medians = sample.medians()
+            print(f"Primera pasada: {stats.n_rows} filas resumidas")
+        if stats.n_rows == 0:
+            print("Error: el dataset no tiene filas con Score")
+            return False
+
+        # Igual que la versión en memoria: mediana para numéricas y moda para categóricas
+        for col, count in stats.nulls.items():
+            if count and col != 'Score':
+                fill = medians.get(col, 'moda')
+                print(f"   {col}: {count} valores nulos, rellenados con {fill}")
+        preprocessor = build_preprocessor(stats, fill_values=medians)
+        self.label_encoders = preprocessor['label_encoders']
+        self.scaler = preprocessor['scaler']
+
+        writers = [ColumnarWriter(os.path.join(self.output_dir, f"banco{i}{COLUMNAR_SUFFIX}"),
+                                  stats.columns, self.dtype,
+                                  buffer_rows=max(1024, 4 * self.chunksize // self.num_clients))
+                   for i in range(self.num_clients)]
+        validation_path = self.validation_path()
+        validation_rows = 0
+        for chunk, keys in self._read_chunks(input_filepath):
+            processed = transform_chunk(chunk, preprocessor, target_column='Score')
+            assignment = self.assign_clients(keys)
+            for i in np.unique(assignment):
+                if i < 0:
+                    held_out = processed[assignment == i]
+                    held_out.to_csv(validation_path, mode='a' if validation_rows else 'w',
+                                    header=not validation_rows, index=False)
+                    validation_rows += len(held_out)
+                else:
+                    writers[i].append(processed[assignment == i])
+
+        for i, writer in enumerate(writers):
+            rows = writer.close()
+            print(f"Guardado: {writer.path} ({rows} muestras)")
+        if validation_rows:
+            print(f"Guardado: {validation_path} ({validation_rows} muestras reservadas para el servidor)")
+        else:
+            self.save_validation(None)
+
+        import joblib
+        joblib.dump(preprocessor, os.path.join(self.output_dir, 'preprocessor.pkl'))
+        print("=== Preprocesamiento en streaming completado ===")
+        return True
+
 def main():
     """Función principal"""
-    # Verificar que existe el archivo de datos real
-    input_file = os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv')
+    # Verificar que existe el archivo de datos real (el indicado como argumento o el original)
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    input_file = paths[0] if paths else os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv')
     
     if not os.path.exists(input_file):
         print(f" Error: No se encontró el archivo {input_file}")
@@ -253,5 +520,41 @@ def main():
     
     return True
 
+def main_federated():
+    """Preprocesamiento federado a partir de los datos crudos de cada cliente"""
+    num_clients = FEDERATED_CONFIG['num_clients']
+    client_files = [os.path.join(CLIENT_RAW_DIR, f"banco{i}.csv") for i in range(num_clients)]
+    preprocessor = FederatedDataPreprocessor()
+
+    if not all(os.path.exists(path) for path in client_files):
+        # Simulación: repartir el CSV original en archivos crudos por banco
+        input_file = os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv')
+        if not os.path.exists(input_file):
+            print(f" Error: No se encontraron datos crudos en {CLIENT_RAW_DIR} ni {input_file}")
+            return False
+        client_files = preprocessor.split_raw_into_clients(input_file, num_clients)
+
+    success = preprocessor.process_dataset_federated(client_files)
+    if success:
+        print(" ¡Preprocesamiento federado exitoso!")
+        print(" Ahora puedes ejecutar: python federated/main.py")
+    return success
+
+def main_streaming():
+    """Preprocesamiento en streaming del CSV original (o del indicado como argumento)"""
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    input_file = paths[0] if paths else os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv')
+    success = StreamingDataPreprocessor().process_dataset(input_file)
+    if success:
+        print(" Ahora puedes ejecutar: python federated/main.py")
+    return success
+
 if __name__ == "__main__":
-    main()
+    if '--federated' in sys.argv:
+        success = main_federated()
+    elif '--streaming' in sys.argv:
+        success = main_streaming()
+    else:
+        success = main()
+    # Código de salida para scripts/pipeline.py
+    sys.exit(0 if success else 1)
@@ -1,41 +1,48 @@
 """
 Script para validar el dataset antes del preprocesamiento
 """
-import pandas as pd
-import numpy as np
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import RAW_DATA_DIR
+from federated.utils.data_validation import profile_file, save_report
 
-def validate_dataset(filepath):
-    """Validar que el dataset tenga el formato correcto"""
+# Renombrar columnas genéricas a nombres reales
+COLUMN_MAPPING = {
+    'x001': 'ID',
+    'x002': 'Customer_Age',
+    'x003': 'Gender',
+    'x004': 'Dependent_count',
+    'x005': 'Education_Level',
+    'x006': 'Marital_Status',
+    'x007': 'Income_Category',
+    'x008': 'Card_Category',
+    'x009': 'Months_on_book',
+    'x010': 'Total_Relationship_Count',
+    'x011': 'Credit_Limit',
+    'x012': 'Total_Trans_Amt',
+    'x013': 'Total_Trans_Ct',
+    'x014': 'Avg_Open_To_Buy',
+    'y': 'Score'
+}
+
+def validate_dataset(filepath, save=True):
+    """Validar que el dataset tenga el formato correcto
+
+    Todos los estadísticos salen de una sola pasada por tramos paralelos
+    (federated/utils/data_validation.py); el informe JSON se guarda para que el
+    preprocesamiento en streaming lo reutilice.
+    """
     print("Validando dataset...")
     
     try:
-        # Cargar dataset
-        df = pd.read_csv(filepath)
-        # Renombrar columnas genéricas a nombres reales
-        mapping = {
-            'x001': 'ID',
-            'x002': 'Customer_Age',
-            'x003': 'Gender',
-            'x004': 'Dependent_count',
-            'x005': 'Education_Level',
-            'x006': 'Marital_Status',
-            'x007': 'Income_Category',
-            'x008': 'Card_Category',
-            'x009': 'Months_on_book',
-            'x010': 'Total_Relationship_Count',
-            'x011': 'Credit_Limit',
-            'x012': 'Total_Trans_Amt',
-            'x013': 'Total_Trans_Ct',
-            'x014': 'Avg_Open_To_Buy',
-            'y': 'Score'
-        }
-        df.rename(columns=mapping, inplace=True)
+        report = profile_file(filepath, COLUMN_MAPPING)
+        columns = report['columns']
+        if save:
+            print(f"Informe guardado en {save_report(report, filepath)}")
 
-        print(f"Archivo cargado: {df.shape[0]} filas, {df.shape[1]} columnas")
+        print(f"Archivo procesado: {report['rows']} filas, {len(columns)} columnas "
+              f"({report['chunks']} tramos, {report['workers']} procesos, {report['elapsed_seconds']:.1f}s)")
         
         # Columnas requeridas
         required_columns = [
@@ -50,7 +57,7 @@ def validate_dataset(filepath):
         present_columns = []
         
         for col in required_columns:
-            if col in df.columns:
+            if col in columns:
                 present_columns.append(col)
             else:
                 missing_columns.append(col)
@@ -69,17 +76,21 @@ def validate_dataset(filepath):
             return False
         
         # Validar datos de Score (variable objetivo)
-        if 'Score' in df.columns:
-            score_stats = df['Score'].describe()
+        score_stats = columns['Score']
+        if score_stats['kind'] == 'numeric' and score_stats['count']:
             print(f"\n Estadísticas de Score:")
             print(f"   • Mínimo: {score_stats['min']:.2f}")
             print(f"   • Máximo: {score_stats['max']:.2f}")
             print(f"   • Promedio: {score_stats['mean']:.2f}")
-            print(f"   • Valores nulos: {df['Score'].isnull().sum()}")
+            print(f"   • Valores nulos: {report['target_nulls']}")
             
             # Verificar rango típico de credit score
             if score_stats['min'] < 300 or score_stats['max'] > 850:
                 print(" Advertencia: Scores fuera del rango típico (300-850)")
+
+        if 'ID' in columns:
+            print(f"\n IDs distintos (aprox.): {columns['ID']['distinct']}")
+            print(f"   • Filas con ID duplicado: {report['duplicate_ids']}")
         
         # Validar variables categóricas
         categorical_columns = ['Gender', 'Education_Level', 'Marital_Status', 
@@ -87,12 +98,11 @@ def validate_dataset(filepath):
         
         print(f"\n  Variables categóricas:")
         for col in categorical_columns:
-            if col in df.columns:
-                unique_vals = df[col].nunique()
+            if col in columns:
+                unique_vals = columns[col]['distinct']
                 print(f"   • {col}: {unique_vals} categorías únicas")
                 if unique_vals <= 10:  # Mostrar categorías si son pocas
-                    categories = df[col].value_counts().head().to_dict()
-                    for cat, count in categories.items():
+                    for cat, count in columns[col].get('top', {}).items():
                         print(f"     - {cat}: {count} registros")
         
         # Validar variables numéricas
@@ -102,24 +112,25 @@ def validate_dataset(filepath):
         
         print(f"\n Variables numéricas:")
         for col in numeric_columns:
-            if col in df.columns:
-                col_stats = df[col].describe()
-                nulls = df[col].isnull().sum()
+            if col in columns and columns[col]['kind'] == 'numeric' and columns[col]['count']:
+                col_stats = columns[col]
                 print(f"   • {col}:")
                 print(f"     - Rango: {col_stats['min']:.2f} - {col_stats['max']:.2f}")
                 print(f"     - Promedio: {col_stats['mean']:.2f}")
-                print(f"     - Nulos: {nulls}")
+                print(f"     - Mediana (aprox.): {col_stats['quantiles']['p50']:.2f}")
+                print(f"     - Nulos: {col_stats['nulls']}")
         
         # Verificar suficientes datos para aprendizaje federado
+        num_rows = report['rows']
         min_total_samples = 3000  # 1000 por cliente
-        if len(df) < min_total_samples:
-            print(f"\n  Advertencia: Dataset pequeño ({len(df)} filas)")
+        if num_rows < min_total_samples:
+            print(f"\n  Advertencia: Dataset pequeño ({num_rows} filas)")
             print(f"   • Recomendado: al menos {min_total_samples} filas")
-            print(f"   • Cada cliente tendrá ~{len(df)//3} muestras")
+            print(f"   • Cada cliente tendrá ~{num_rows//3} muestras")
         else:
             print(f"\n Dataset adecuado para aprendizaje federado")
-            print(f"   • Total: {len(df)} filas")
-            print(f"   • Por cliente: ~{len(df)//3} muestras")
+            print(f"   • Total: {num_rows} filas")
+            print(f"   • Por cliente: ~{num_rows//3} muestras")
         
         return True
         
@@ -129,18 +140,22 @@ def validate_dataset(filepath):
 
 def main():
     """Función principal"""
-    input_file = os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv')
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    input_file = paths[0] if paths else os.path.join(RAW_DATA_DIR, 'CreditScore_test.csv')
     
     if not os.path.exists(input_file):
         print(f" No se encontró el archivo: {input_file}")
         print("Coloca tu archivo 'CreditScore_test.csv' en la carpeta 'data/raw/'")
-        return
+        return False
     
     if validate_dataset(input_file):
         print("\n ¡Dataset válido! Puedes proceder con el preprocesamiento.")
         print("  Ejecuta: python scripts/preprocess_data.py")
+        return True
     else:
         print("\n Dataset inválido. Corrige los problemas antes de continuar.")
+        return False
 
 if __name__ == "__main__":
-    main()
+    # Código de salida para scripts/pipeline.py
+    sys.exit(0 if main() else 1)
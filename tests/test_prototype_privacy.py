@@ -0,0 +1,51 @@
+"""
+Privacidad a nivel de prototipo del KNN federado
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from federated.models.knn_prototypes import (PROTOTYPE_CENTROIDS, PROTOTYPE_TARGETS, compute_prototypes,
+                                             is_prototype_payload)
+from federated.privacy.differential_privacy import DifferentialPrivacy
+
+
+def records(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, 5)) * 2.0
+    y = 575 + 120 * X[:, 0] + rng.normal(0, 20, n)
+    return X, y
+
+
+def test_clipping_bounds_records_before_averaging():
+    X, y = records()
+    X[0], y[0] = 1e6, 1e6
+    dp = DifferentialPrivacy('clipping', feature_bound=3.0, target_range=(300.0, 850.0))
+    parameters = dp.apply_prototype_privacy(X, y, 50)
+    assert is_prototype_payload(parameters)
+    assert np.abs(parameters[PROTOTYPE_CENTROIDS]).max() <= 3.0
+    assert parameters[PROTOTYPE_TARGETS].min() >= 300.0 and parameters[PROTOTYPE_TARGETS].max() <= 850.0
+
+
+def test_noise_is_calibrated_to_prototype_sensitivity():
+    X, y = records()
+    clean = compute_prototypes(np.clip(X, -3.0, 3.0), np.clip(y, 300.0, 850.0), 50)
+    dp = DifferentialPrivacy('clipping_noising', client_id=1, feature_bound=3.0,
+                             target_range=(300.0, 850.0))
+    noisy = dp.apply_prototype_privacy(X, y, 50, server_round=1)
+    # Con z=0.1 el ruido queda muy por debajo de la sensibilidad de un prototipo de
+    # ~40 miembros (un registro mueve su objetivo hasta 550/40 puntos)
+    error = np.abs(noisy[PROTOTYPE_TARGETS] - clean[PROTOTYPE_TARGETS])
+    assert 0 < error.mean() < (850.0 - 300.0) / 40
+    # Mismo cliente y ronda: mismo ruido
+    again = dp.apply_prototype_privacy(X, y, 50, server_round=1)
+    assert np.array_equal(noisy[PROTOTYPE_TARGETS], again[PROTOTYPE_TARGETS])
+
+
+def test_prototype_budget_composes_releases():
+    dp = DifferentialPrivacy('clipping_noising', noise_multiplier=1.0)
+    single, _ = dp.calculate_privacy_budget(10)
+    composed, _ = dp.calculate_privacy_budget(10, releases=3)
+    assert composed > single